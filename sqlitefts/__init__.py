@@ -1,11 +1,38 @@
-from . import ranking, tokenizer
 from .error import Error
-from .fts3 import Tokenizer, make_tokenizer_module, register_tokenizer
+
+_LAZY = {
+    "Tokenizer": "fts3",
+    "make_tokenizer_module": "fts3",
+    "register_tokenizer": "fts3",
+    "install": "autoext",
+    "uninstall": "autoext",
+    "tokenizer": None,
+    "ranking": None,
+}
+"""attributes imported on the first access"""
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+
+        module = importlib.import_module("." + (_LAZY[name] or name), __name__)
+        value = module if _LAZY[name] is None else getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
 
 __all__ = [
     "Tokenizer",
     "make_tokenizer_module",
     "register_tokenizer",
+    "install",
+    "uninstall",
     "tokenizer",
     "ranking",
     "Error",
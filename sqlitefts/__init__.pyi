@@ -1,5 +1,7 @@
 from . import ranking as ranking
 from . import tokenizer as tokenizer
+from .autoext import install as install
+from .autoext import uninstall as uninstall
 from .error import Error as Error
 from .fts3 import Tokenizer as Tokenizer
 from .fts3 import make_tokenizer_module as make_tokenizer_module
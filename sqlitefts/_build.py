@@ -0,0 +1,69 @@
+# coding: utf-8
+"""
+build the compiled backend(cffi out-of-line API mode)
+
+    python -m sqlitefts._build
+
+it makes sqlitefts/_sqlitefts_cffi.*.so(or .pyd), which is imported instead of
+parsing declarations at runtime, and its callbacks are `extern "Python"`
+functions instead of libffi closures.
+a C compiler and Python headers are required. the module doesn't link to
+SQLite, SQLite functions are bound to the library used by sqlite3 module
+at runtime.
+set SQLITEFTS_BACKEND=abi to ignore the compiled module.
+"""
+import os
+import shutil
+import tempfile
+
+from cffi import FFI  # type: ignore
+
+from . import _cdef
+
+ffibuilder = FFI()
+ffibuilder.cdef(
+    _cdef.SQLITE3
+    + """
+typedef struct { sqlite3 *db; ...; } sqlitefts_Connection;
+"""
+    + _cdef.FTS3
+    + _cdef.FTS5_TYPES
+    + _cdef.LIBC
+    + _cdef.function_pointers(_cdef.FUNCTIONS, "extern")
+    + _cdef.CALLBACKS
+    + """
+const char *sqlitefts_cdef_signature(void);
+"""
+)
+ffibuilder.set_source(
+    "sqlitefts._sqlitefts_cffi",
+    "#include <string.h>\n"
+    + _cdef.SQLITE3
+    + """
+typedef struct {
+  PyObject_HEAD
+  sqlite3 *db;
+} sqlitefts_Connection;
+"""
+    + _cdef.FTS3
+    + _cdef.FTS5_TYPES
+    + _cdef.function_pointers(_cdef.FUNCTIONS, "static")
+    + """
+static const char *sqlitefts_cdef_signature(void) { return "%s"; }
+"""
+    % _cdef.signature(),
+)
+
+
+def build(verbose=False):
+    """build the compiled module next to this package, returns its path"""
+    tmpdir = tempfile.mkdtemp()
+    try:
+        built = ffibuilder.compile(tmpdir=tmpdir, verbose=verbose)
+        return shutil.copy(built, os.path.dirname(os.path.abspath(__file__)))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    print(build(verbose=True))
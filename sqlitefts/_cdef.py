@@ -0,0 +1,229 @@
+# coding: utf-8
+"""
+C declarations shared by the ABI mode(cdef at runtime) and
+the compiled module built by sqlitefts._build
+"""
+import hashlib
+import re
+
+_FUNCTION = re.compile(r"\b(sqlite3_\w+)\(")
+
+SQLITE3 = """
+typedef struct sqlite3 sqlite3;
+"""
+
+CONNECTION = """
+typedef struct {
+  size_t ob_refcnt;
+  void *ob_type;
+  sqlite3 *db;
+} sqlitefts_Connection;
+"""
+"""layout of sqlite3.Connection(pysqlite_Connection)"""
+
+CONNECTION_GIL_DISABLED = """
+typedef struct {
+  uintptr_t ob_tid;
+  uint16_t _padding;
+  uint8_t ob_mutex;
+  uint8_t ob_gc_bits;
+  uint32_t ob_ref_local;
+  ssize_t ob_ref_shared;
+  void *ob_type;
+  sqlite3 *db;
+} sqlitefts_Connection;
+"""
+"""layout of sqlite3.Connection for a free-threaded python"""
+
+CONNECTION_TRACE_REFS = """
+typedef struct {
+  union {
+    ssize_t ob_refcnt;
+    uint32_t ob_refcnt_split[2];
+  };
+  void *ob_type;
+  sqlite3 *db;
+} sqlitefts_Connection;
+"""
+"""layout of sqlite3.Connection for a python built with Py_TRACE_REFS"""
+
+FTS3 = """
+typedef struct sqlite3_tokenizer_module sqlite3_tokenizer_module;
+typedef struct sqlite3_tokenizer sqlite3_tokenizer;
+typedef struct sqlite3_tokenizer_cursor sqlite3_tokenizer_cursor;
+struct sqlite3_tokenizer_module {
+  int iVersion;
+  int (*xCreate)(int, const char*const*, sqlite3_tokenizer**);
+  int (*xDestroy)(sqlite3_tokenizer*);
+  int (*xOpen)(
+    sqlite3_tokenizer*, const char*, int, sqlite3_tokenizer_cursor**);
+  int (*xClose)(sqlite3_tokenizer_cursor*);
+  int (*xNext)(
+    sqlite3_tokenizer_cursor*, const char**, int*, int*, int*, int*);
+  int (*xLanguageid)(sqlite3_tokenizer_cursor*, int);
+};
+
+struct sqlite3_tokenizer {
+  const sqlite3_tokenizer_module *pModule;
+  void *t;
+};
+
+struct sqlite3_tokenizer_cursor {
+  sqlite3_tokenizer *pTokenizer;
+  void *tokens;
+  size_t pos;
+  size_t offset;
+};
+"""
+
+FTS5_TYPES = """
+typedef struct sqlite3_context sqlite3_context;
+typedef struct sqlite3_stmt sqlite3_stmt;
+typedef struct Mem sqlite3_value;
+typedef uint64_t sqlite3_int64;
+
+typedef struct fts5_api fts5_api;
+typedef struct fts5_tokenizer fts5_tokenizer;
+typedef struct Fts5Tokenizer Fts5Tokenizer;
+typedef struct Fts5ExtensionApi Fts5ExtensionApi;
+typedef struct Fts5Context Fts5Context;
+typedef struct Fts5PhraseIter Fts5PhraseIter;
+typedef void (*fts5_extension_function)(
+  const Fts5ExtensionApi*, Fts5Context*,
+  sqlite3_context*, int, sqlite3_value**);
+
+struct fts5_api {
+  int iVersion;
+  int (*xCreateTokenizer)(
+    fts5_api*, const char*, void*,
+    fts5_tokenizer*, void (*xDestroy)(void*));
+  int (*xFindTokenizer)(
+    fts5_api*, const char*, void**, fts5_tokenizer*);
+  int (*xCreateFunction)(
+    fts5_api*, const char*, void*,
+    fts5_extension_function, void (*xDestroy)(void*));
+};
+
+struct fts5_tokenizer {
+  int (*xCreate)(void*, const char**, int, Fts5Tokenizer**);
+  void (*xDelete)(Fts5Tokenizer*);
+  int (*xTokenize)(
+    Fts5Tokenizer*, void*, int, const char*, int,
+    int (*xToken)(
+        void*, int, const char*, int, int, int));
+};
+
+struct Fts5ExtensionApi {
+  int iVersion;
+  void *(*xUserData)(Fts5Context*);
+  int (*xColumnCount)(Fts5Context*);
+  int (*xRowCount)(Fts5Context*, sqlite3_int64*);
+  int (*xColumnTotalSize)(Fts5Context*, int, sqlite3_int64*);
+  int (*xTokenize)(
+    Fts5Context*, const char*, int, void*,
+    int (*xToken)(void*, int, const char*, int, int, int));
+  int (*xPhraseCount)(Fts5Context*);
+  int (*xPhraseSize)(Fts5Context*, int);
+  int (*xInstCount)(Fts5Context*, int*);
+  int (*xInst)(Fts5Context*, int, int*, int*, int*);
+  sqlite3_int64 (*xRowid)(Fts5Context*);
+  int (*xColumnText)(Fts5Context*, int, const char**, int*);
+  int (*xColumnSize)(Fts5Context*, int, int*);
+  int (*xQueryPhrase)(Fts5Context*, int, void*,
+    int(*)(const Fts5ExtensionApi*, Fts5Context*, void*)
+  );
+  int (*xSetAuxdata)(Fts5Context*, void*, void(*xDelete)(void*));
+  void *(*xGetAuxdata)(Fts5Context*, int);
+  int (*xPhraseFirst)(Fts5Context*, int, Fts5PhraseIter*, int*, int*);
+  void (*xPhraseNext)(Fts5Context*, Fts5PhraseIter*, int*, int*);
+  int (*xPhraseFirstColumn)(Fts5Context*, int, Fts5PhraseIter*, int*);
+  void (*xPhraseNextColumn)(Fts5Context*, Fts5PhraseIter*, int*);
+};
+"""
+
+FTS5_FUNCTIONS = """
+void sqlite3_result_text(sqlite3_context*, const char*, int, void(*)(void*));
+void sqlite3_result_error_code(sqlite3_context*, int);
+void sqlite3_result_error(sqlite3_context*, const char*, int);
+const unsigned char *sqlite3_value_text(sqlite3_value*);
+int sqlite3_value_int(sqlite3_value*);
+int sqlite3_prepare_v2(sqlite3*, const char*, int, sqlite3_stmt**, const char**);
+int sqlite3_prepare(sqlite3*, const char*, int, sqlite3_stmt**, const char**);
+int sqlite3_bind_pointer(sqlite3_stmt*, int, void*, const char*, void(*)(void*));
+int sqlite3_step(sqlite3_stmt*);
+int sqlite3_finalize(sqlite3_stmt*);
+int sqlite3_errcode(sqlite3 *db);
+int sqlite3_extended_errcode(sqlite3 *db);
+const char *sqlite3_errmsg(sqlite3*);
+const void *sqlite3_errmsg16(sqlite3*);
+const char *sqlite3_errstr(int);
+int sqlite3_libversion_number(void);
+"""
+
+AUTOEXT_FUNCTIONS = """
+int sqlite3_auto_extension(void(*)(void));
+int sqlite3_cancel_auto_extension(void(*)(void));
+int sqlite3_db_config(sqlite3*, int, ...);
+int sqlite3_bind_text(sqlite3_stmt*, int, const char*, int, void(*)(void*));
+int sqlite3_bind_blob(sqlite3_stmt*, int, const void*, int, void(*)(void*));
+"""
+
+PROFILE_FUNCTIONS = """
+int sqlite3_trace_v2(
+  sqlite3*, unsigned int, int(*)(unsigned int, void*, void*, void*), void*);
+const char *sqlite3_sql(sqlite3_stmt*);
+"""
+
+LIBC = """
+size_t strlen(const char *);
+"""
+"""C library functions, they are not bound to SQLite"""
+
+FUNCTIONS = FTS5_FUNCTIONS + AUTOEXT_FUNCTIONS + PROFILE_FUNCTIONS
+"""SQLite functions bound by the compiled module"""
+
+CALLBACKS = """
+extern "Python" int _sqlitefts_fts3_xopen(
+  sqlite3_tokenizer*, const char *, int, sqlite3_tokenizer_cursor **);
+extern "Python" int _sqlitefts_fts3_xnext(
+  sqlite3_tokenizer_cursor*, const char **, int *, int *, int *, int *);
+extern "Python" int _sqlitefts_fts3_xclose(sqlite3_tokenizer_cursor *);
+extern "Python" int _sqlitefts_fts5_xtokenize(
+  Fts5Tokenizer *, void *, int, const char *, int,
+  int(void*, int, const char *, int, int, int));
+extern "Python" void _sqlitefts_fts5_aux_tokenize(
+  const Fts5ExtensionApi*, Fts5Context*, sqlite3_context*, int, sqlite3_value**);
+extern "Python" int _sqlitefts_fts5_aux_token(
+  void*, int, const char*, int, int, int);
+extern "Python" int _sqlitefts_fts5_native_forward(
+  void*, int, const char*, int, int, int);
+extern "Python" int _sqlitefts_fts5_native_collect(
+  void*, int, const char*, int, int, int);
+extern "Python" int _sqlitefts_trace(unsigned int, void *, void *, void *);
+"""
+"""callbacks called for each statement, document or token"""
+
+
+def function_names(decls):
+    """names of SQLite functions declared in decls"""
+    return _FUNCTION.findall(decls)
+
+
+def function_pointers(decls, storage=""):
+    """
+    turn declarations of SQLite functions into function pointers.
+    the compiled module doesn't link to SQLite and calls SQLite through them.
+    """
+    decls = _FUNCTION.sub(r"(*\1)(", decls)
+    if storage:
+        decls = re.sub(r"(?m)^(?=\S)", storage + " ", decls)
+    return decls
+
+
+def signature():
+    """
+    digest of the declarations. the compiled module has the one it was built
+    with, and it is not used if the declarations are changed since then.
+    """
+    decls = (CONNECTION, FTS3, FTS5_TYPES, LIBC, FUNCTIONS, CALLBACKS)
+    return hashlib.sha1("".join(decls).encode("utf-8")).hexdigest()
@@ -0,0 +1,204 @@
+# coding: utf-8
+"""
+register tokenizers to every new SQLite connection
+
+    import sqlitefts as fts
+
+    fts.install(
+        tokenizers={"simple": fts.make_tokenizer_module(SimpleTokenizer())},
+        fts5_tokenizers={"simple": fts5.make_fts5_tokenizer(SimpleFTS5Tokenizer())},
+        aux_functions={"tokenize": fts5_aux.aux_tokenize},
+    )
+    c = sqlite3.connect("fts.db")  # the tokenizers are available
+
+it uses sqlite3_auto_extension, so the tokenizers are registered by SQLite
+while a connection is opened, without a round trip of SQL statements from
+Python. connections of any module using the same SQLite library get them.
+"""
+import struct
+import threading
+
+from . import fts5
+from . import tokenizer as _tokenizer
+from .error import Error
+from .fts3 import SQLITE_DBCONFIG_ENABLE_FTS3_TOKENIZER
+from .tokenizer import SQLITE_ERROR, SQLITE_OK, load_once
+
+SQLITE_ROW = 100
+
+_config = None
+"""tokenizers and auxiliary functions to register, None if not installed"""
+
+_installed = {}
+"""
+installed configs keyed by their id, with the number of auxiliary functions
+registered to connections still open. connections keep pointers to the
+functions, so a config is released when it is no longer installed and no
+connection refers to it. tokenizers are held by their modules.
+"""
+_lock = threading.Lock()
+"""lock for _installed, updated while connections are opened and closed"""
+
+
+def _register_fts3(db, name, tokenizer_module):
+    """the same as `SELECT fts3_tokenizer(name, pointer)`"""
+    # fts3_tokenizer() with 2 arguments may be disabled, enable it temporarily
+    enabled = ffi.new("int *")
+    dll.sqlite3_db_config(
+        db, SQLITE_DBCONFIG_ENABLE_FTS3_TOKENIZER, ffi.cast("int", -1), enabled
+    )
+    if not enabled[0]:
+        dll.sqlite3_db_config(
+            db, SQLITE_DBCONFIG_ENABLE_FTS3_TOKENIZER, ffi.cast("int", 1), ffi.NULL
+        )
+    try:
+        pStmt = ffi.new("sqlite3_stmt **")
+        sql = b"SELECT fts3_tokenizer(?1, ?2)"
+        rc = dll.sqlite3_prepare_v2(db, sql, -1, pStmt, ffi.NULL)
+        if rc != SQLITE_OK:
+            raise Error(ffi.string(dll.sqlite3_errmsg(db)).decode("utf-8"))
+        try:
+            name = name.encode("utf-8")
+            blob = struct.pack("P", int(ffi.cast("uintptr_t", tokenizer_module)))
+            dll.sqlite3_bind_text(pStmt[0], 1, name, len(name), SQLITE_TRANSIENT)
+            dll.sqlite3_bind_blob(pStmt[0], 2, blob, len(blob), SQLITE_TRANSIENT)
+            rc = dll.sqlite3_step(pStmt[0])
+        finally:
+            dll.sqlite3_finalize(pStmt[0])
+        if rc != SQLITE_ROW:
+            raise Error(ffi.string(dll.sqlite3_errmsg(db)).decode("utf-8"))
+    finally:
+        if not enabled[0]:
+            dll.sqlite3_db_config(
+                db, SQLITE_DBCONFIG_ENABLE_FTS3_TOKENIZER, ffi.cast("int", 0), ffi.NULL
+            )
+
+
+def _register_fts5(db, config, entry):
+    _, tokenizers, aux_functions = config
+    key = int(ffi.cast("uintptr_t", db))
+    fts5api = fts5._fts5_api_ptr(db)
+    if fts5api is None:
+        raise Error("unable to get fts5_api")
+    fts5._hold_fts5_api(key, fts5api)
+    for name, tokenizer in tokenizers.items():
+        if not fts5._create_tokenizer(fts5api, name, tokenizer, None, None):
+            raise Error("unable to register a FTS5 tokenizer: {}".format(name))
+    # FTS5 calls _destroy with the id of config when the connection is closed
+    pUserData = ffi.cast("void *", id(config))
+    for name, f in aux_functions.items():
+        r = fts5api.xCreateFunction(
+            fts5api, name.encode("utf-8"), pUserData, f, _destroy
+        )
+        if r != SQLITE_OK:
+            raise Error("unable to register an auxiliary function: {}".format(name))
+        with _lock:
+            entry[1] += 1
+
+
+def _entry_point(db, pzErrMsg, pThunk):
+    with _lock:
+        config = _config
+        if config is None:
+            return SQLITE_OK
+        # keep the config while registering it
+        entry = _installed[id(config)]
+        entry[1] += 1
+    try:
+        tokenizers, fts5_tokenizers, aux_functions = config
+        for name, tokenizer_module in tokenizers.items():
+            _register_fts3(db, name, tokenizer_module)
+        if fts5_tokenizers or aux_functions:
+            _register_fts5(db, config, entry)
+    finally:
+        with _lock:
+            entry[1] -= 1
+            _release(id(config))
+    return SQLITE_OK
+
+
+def _release(key):
+    """drop a config unless it is installed or referred by a connection"""
+    entry = _installed.get(key)
+    if entry is not None and entry[1] == 0 and entry[0] is not _config:
+        del _installed[key]
+
+
+def _xdestroy(pUserData):
+    key = int(ffi.cast("uintptr_t", pUserData))
+    with _lock:
+        _installed[key][1] -= 1
+        _release(key)
+
+
+def _load():
+    global ffi, dll, SQLITE_TRANSIENT, _version, _destroy
+
+    from . import _cdef
+
+    fts5.load()
+    ffi = _tokenizer.load()
+    dll = _tokenizer.dll
+    if _tokenizer.lib is None:
+        ffi.cdef(_cdef.AUTOEXT_FUNCTIONS)
+    SQLITE_TRANSIENT = ffi.cast("void(*)(void*)", -1)
+    n = dll.sqlite3_libversion_number()
+    _version = (n // 1000000, n // 1000 % 1000, n % 1000)
+    # a connection fails to open if it raises an exception
+    entry_point = ffi.callback(
+        "int(sqlite3 *, char **, void *)", _entry_point, error=SQLITE_ERROR
+    )
+    _destroy = ffi.callback("void(void *)", _xdestroy)
+    return (entry_point, ffi.cast("void(*)(void)", entry_point))
+
+
+def install(tokenizers=None, fts5_tokenizers=None, aux_functions=None):
+    """
+    register tokenizers and auxiliary functions to all connections opened
+    after this. the arguments are the same as ConnectionPool, i.e. dicts of
+    name and a FTS3 tokenizer module made by make_tokenizer_module, a FTS5
+    tokenizer made by make_fts5_tokenizer, and a FTS5 auxiliary function.
+    auxiliary functions are kept alive until they are uninstalled and all
+    connections opened with them are closed.
+    calling it again replaces the tokenizers and functions.
+    """
+    global _config
+    _, entry_point = load_once("autoext", _load)
+    config = (
+        dict(tokenizers or {}),
+        dict(fts5_tokenizers or {}),
+        dict(aux_functions or {}),
+    )
+    if (config[1] or config[2]) and _version < (3, 20, 0):
+        raise Error("SQLite 3.20.0 or later is required for FTS5")
+    with _lock:
+        previous, _config = _config, config
+        _installed[id(config)] = [config, 0]
+        if previous is not None:
+            _release(id(previous))
+    rc = dll.sqlite3_auto_extension(entry_point)
+    if rc != SQLITE_OK:
+        with _lock:
+            _config = None
+            _release(id(config))
+        raise Error("unable to install the auto extension. rc={}".format(rc))
+
+
+def uninstall():
+    """
+    stop registering tokenizers to new connections. connections already
+    opened keep them.
+    returns True if it was installed.
+    """
+    global _config
+    if _config is None:
+        return False
+    _, entry_point = load_once("autoext", _load)
+    dll.sqlite3_cancel_auto_extension(entry_point)
+    with _lock:
+        config, _config = _config, None
+        _release(id(config))
+    return True
+
+
+__all__ = ["install", "uninstall"]
@@ -0,0 +1,8 @@
+from typing import Any, Mapping, Optional
+
+def install(
+    tokenizers: Optional[Mapping[str, Any]] = ...,
+    fts5_tokenizers: Optional[Mapping[str, Any]] = ...,
+    aux_functions: Optional[Mapping[str, Any]] = ...,
+) -> None: ...
+def uninstall() -> bool: ...
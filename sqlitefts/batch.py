@@ -0,0 +1,134 @@
+# coding: utf-8
+"""
+batched token emission
+
+a tokenizer can implement tokenize_batch(text, flags) in addition to or
+instead of tokenize(). it returns all tokens of the text at once as a tuple of
+(data, offsets, starts, ends) or (data, offsets, starts, ends, tflags)
+
+- data: UTF-8 encoded tokens concatenated into one bytes-like object
+- offsets: array('i') of len(tokens) + 1 items.
+  token i is data[offsets[i]:offsets[i + 1]]
+- starts, ends: array('i') of start/end positions(in bytes) of each token
+  in the input text
+- tflags: optional array('i') of flags of each token. TOKEN_COLOCATED means
+  the token is colocated with(a synonym of) the previous token.
+
+the tokenizer adaptors walk the arrays instead of resuming a generator and
+encoding each token.
+"""
+from array import array
+from itertools import repeat
+
+from .tokenizer import tokenize_input
+
+TOKEN_COLOCATED = 0x0001
+"""same as FTS5_TOKEN_COLOCATED"""
+
+
+def encode_tokens(tokens):
+    """
+    encode tokens yielded by Tokenizer.tokenize. yields each token(in bytes),
+    start position, end position and flags.
+
+    a token can be either str or UTF-8 encoded bytes, or a list of them to
+    yield colocated tokens. the first one of a list is the primary token and
+    the others are flagged with TOKEN_COLOCATED. empty tokens are skipped.
+    """
+    for normalized, begin, end in tokens:
+        if isinstance(normalized, str):
+            if normalized:
+                yield normalized.encode("utf-8"), begin, end, 0
+        elif isinstance(normalized, (list, tuple)):
+            tflags = 0
+            for n in normalized:
+                if isinstance(n, str):
+                    n = n.encode("utf-8")
+                if n:
+                    yield n, begin, end, tflags
+                    tflags = TOKEN_COLOCATED
+        elif normalized:
+            yield normalized, begin, end, 0
+
+
+def pack_tokens(tokens):
+    """
+    pack tokens yielded by Tokenizer.tokenize into a batch.
+    tokens are encoded as encode_tokens does. tflags is added only if
+    there are colocated tokens.
+    """
+    data = bytearray()
+    offsets = array("i", [0])
+    starts = array("i")
+    ends = array("i")
+    tflags = None
+    for normalized, begin, end, f in encode_tokens(tokens):
+        if f and tflags is None:
+            tflags = array("i", [0]) * len(starts)
+        if tflags is not None:
+            tflags.append(f)
+        data += normalized
+        offsets.append(len(data))
+        starts.append(begin)
+        ends.append(end)
+    if tflags is None:
+        return bytes(data), offsets, starts, ends
+    return bytes(data), offsets, starts, ends, tflags
+
+
+def iter_batch(batch):
+    """
+    iterate over a batch. yields offset of each token in data, end offset of
+    it, start position, end position and flags.
+    """
+    if len(batch) > 4:
+        data, offsets, starts, ends, tflags = batch
+    else:
+        data, offsets, starts, ends = batch
+        tflags = repeat(0)
+    return zip(offsets, offsets[1:], starts, ends, tflags)
+
+
+def tokenize_to_batch(tokenizer, data, *args):
+    """
+    tokenize UTF-8 text(a bytes-like object) and pack tokens into a batch.
+    it supports tokenize_batch, tokenize_bytes and tokenize of a tokenizer.
+    args are passed to the tokenizer as is, e.g. flags for FTS5.
+    """
+    tokenize_batch = getattr(tokenizer, "tokenize_batch", None)
+    if tokenize_batch is not None:
+        return tokenize_batch(str(data, "utf-8"), *args)
+    return pack_tokens(tokenize_input(tokenizer, data, *args))
+
+
+def unpack_tokens(batch):
+    """
+    iterate over a batch. yields each token(in bytes), start position,
+    end position. colocated tokens are yielded as a list with the primary
+    token, so that pack_tokens(unpack_tokens(batch)) makes the same batch.
+    """
+    data = batch[0]
+    token = None
+    for b, e, start, end, tflags in iter_batch(batch):
+        if b == e:
+            continue
+        if tflags & TOKEN_COLOCATED and token is not None:
+            if not isinstance(token[0], list):
+                token = [token[0]], token[1], token[2]
+            token[0].append(data[b:e])
+            continue
+        if token is not None:
+            yield token
+        token = data[b:e], start, end
+    if token is not None:
+        yield token
+
+
+__all__ = [
+    "TOKEN_COLOCATED",
+    "encode_tokens",
+    "iter_batch",
+    "pack_tokens",
+    "tokenize_to_batch",
+    "unpack_tokens",
+]
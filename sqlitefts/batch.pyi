@@ -0,0 +1,19 @@
+from array import array
+from typing import Any, Iterable, Iterator, List, Tuple, Union
+
+TokenBatch = Union[
+    Tuple[bytes, array, array, array], Tuple[bytes, array, array, array, array]
+]
+Token = Union[str, bytes, List[Union[str, bytes]]]
+
+TOKEN_COLOCATED: int
+
+def encode_tokens(
+    tokens: Iterable[Tuple[Token, int, int]]
+) -> Iterator[Tuple[bytes, int, int, int]]: ...
+def pack_tokens(tokens: Iterable[Tuple[Token, int, int]]) -> TokenBatch: ...
+def iter_batch(batch: TokenBatch) -> Iterator[Tuple[int, int, int, int, int]]: ...
+def tokenize_to_batch(tokenizer: Any, data: Any, *args: Any) -> TokenBatch: ...
+def unpack_tokens(
+    batch: TokenBatch,
+) -> Iterator[Tuple[Union[bytes, List[bytes]], int, int]]: ...
@@ -0,0 +1,687 @@
+# coding: utf-8
+"""
+micro benchmarks of this library
+
+    python -m sqlitefts.bench [overhead] [--backend abi|api|all] [--docs N] [--tokens N]
+
+measures the overhead of calls between SQLite and tokenizers.
+a tokenizer returning prepared tokens is used, so that the results show the
+cost of this library rather than a tokenizer.
+- per call: time to tokenize a document without tokens
+- per token: additional time of each token
+
+    python -m sqlitefts.bench import [--backend abi|api|all] [--repeat N]
+
+measures time to import modules and to register a tokenizer first in a new
+process, and shows `python -X importtime` of them.
+
+    python -m sqlitefts.bench threads [--threads 1,2,4] [--docs N] [--queries N]
+        [--per-thread]
+
+measures throughput of indexing and queries with a regular expression
+tokenizer in N threads, each of them uses its own connection. it scales only
+on a free-threaded(Py_GIL_DISABLED) build.
+
+    python -m sqlitefts.bench compare [--sizes 1,10,100,1000] [--budget N]
+
+compares tokenizers written in Python with built-in ones for documents of
+each size(in tokens). an identity tokenizer returning prepared tokens is used
+for Python, so that the difference is the cost of the binding.
+- fts3: make_tokenizer_module and unicode61 with fts3tokenize
+- fts5: make_fts5_tokenizer, unicode61 and trigram with a FTS5 table
+  (detail=none)
+each case tokenizes about budget tokens, and shows us/call(per document) and
+tokens/sec.
+
+    python -m sqlitefts.bench corpus [--docs N] [--script ja|mixed] [--queries N]
+        [--tokenizer MODULE:NAME]
+
+an end-to-end benchmark with Japanese(or mixed-script) documents generated
+by sqlitefts.corpus, so that it needs neither network nor Faker.
+the documents are indexed into a FTS4 and a FTS5 table in files with a Python
+tokenizer(corpus.BigramTokenizer, or a class or an instance given by
+--tokenizer), and a fixed mix of queries is run: MATCH with a term, terms,
+a phrase and a prefix, ranking.bm25 or rank, and auxiliary functions
+including fts5_aux.aux_tokenize. it shows build time, size of the database
+and percentiles of query latency.
+
+--json FILE writes the results of any benchmark as JSON with versions of
+Python, SQLite and this library, to compare them across releases.
+"-" means stdout.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import re
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+from . import corpus, fts3, fts5, tokenizer
+
+
+class _RepeatTokenizer(fts5.FTS5Tokenizer):
+    def __init__(self, n):
+        self.tokens = [("a", 0, 1)] * n
+
+    def tokenize(self, text, flags=None):
+        return self.tokens
+
+
+def _best(f, repeat):
+    t = float("inf")
+    for _ in range(repeat):
+        s = time.perf_counter()
+        f()
+        t = min(t, time.perf_counter() - s)
+    return t
+
+
+def _fts3(ntokens, docs, repeat):
+    c = sqlite3.connect(":memory:")
+    try:
+        tm = fts3.make_tokenizer_module(_RepeatTokenizer(ntokens))
+        fts3.register_tokenizer(c, "repeat", tm)
+        c.execute("CREATE VIRTUAL TABLE tok USING fts3tokenize(repeat)")
+
+        def run():
+            for _ in range(docs):
+                c.execute("SELECT count(*) FROM tok WHERE input='a'").fetchone()
+
+        return _best(run, repeat) / docs
+    finally:
+        c.close()
+
+
+def _fts5(ntokens, docs, repeat):
+    c = sqlite3.connect(":memory:")
+    try:
+        tm = fts5.make_fts5_tokenizer(_RepeatTokenizer(ntokens))
+        fts5.register_tokenizer(c, "repeat", tm)
+        c.execute(
+            "CREATE VIRTUAL TABLE t USING FTS5(w, tokenize=repeat, detail=none)"
+        )
+        rows = [("a",)] * docs
+
+        def run():
+            c.executemany("INSERT INTO t VALUES(?)", rows)
+            c.execute("DELETE FROM t")
+
+        return _best(run, repeat) / docs
+    finally:
+        c.close()
+
+
+def run(docs=2000, tokens=100, repeat=5):
+    """
+    measure the overhead with the active backend.
+    returns a dict of per call/per token time in seconds for FTS3 and FTS5.
+    """
+    results = {"backend": tokenizer.backend}
+    for name, f in (("fts3", _fts3), ("fts5", _fts5)):
+        call = f(0, docs, repeat)
+        token = (f(tokens, docs, repeat) - call) / tokens
+        results[name] = {"call": call, "token": token}
+    return results
+
+
+_IMPORT_STAGES = (
+    ("import sqlitefts", "import sqlitefts"),
+    ("import sqlitefts.fts5", "import sqlitefts.fts5"),
+    (
+        "first FTS3 registration",
+        "import sqlitefts as fts\n"
+        "c = sqlite3.connect(':memory:')\n"
+        "fts.register_tokenizer(c, 't', fts.make_tokenizer_module(fts.Tokenizer()))\n"
+        "c.close()",
+    ),
+    (
+        "first FTS5 registration",
+        "from sqlitefts import fts5\n"
+        "c = sqlite3.connect(':memory:')\n"
+        "tm = fts5.make_fts5_tokenizer(fts5.FTS5Tokenizer())\n"
+        "fts5.register_tokenizer(c, 't', tm)\n"
+        "c.close()",
+    ),
+)
+
+_IMPORT_SCRIPT = """
+import sqlite3
+import time
+s = time.perf_counter()
+{}
+print(time.perf_counter() - s)
+"""
+
+
+def import_time(repeat=5, importtime=False):
+    """
+    measure time of each stage in _IMPORT_STAGES in new processes with the
+    active backend. sqlite3 is imported in advance.
+    returns a dict of the best time in seconds of each stage, and
+    `python -X importtime` output of the last stage if importtime is True.
+    """
+    env = dict(os.environ, SQLITEFTS_BACKEND=tokenizer.backend)
+    results = {"backend": tokenizer.backend}
+    for name, code in _IMPORT_STAGES:
+        cmd = [sys.executable, "-c", _IMPORT_SCRIPT.format(code)]
+        results[name] = min(
+            float(subprocess.check_output(cmd, env=env)) for _ in range(repeat)
+        )
+    if importtime:
+        cmd = [sys.executable, "-X", "importtime", "-c", _IMPORT_SCRIPT.format(code)]
+        p = subprocess.Popen(
+            cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        _, err = p.communicate()
+        results["importtime"] = [
+            line
+            for line in err.decode("utf-8").splitlines()
+            if line.split("|")[-1].strip().startswith(("sqlitefts", "cffi", "ctypes"))
+        ]
+    return results
+
+
+class _RegexTokenizer(fts5.FTS5Tokenizer):
+    _p = re.compile(r"\w+")
+
+    def tokenize(self, text, flags=None):
+        for m in self._p.finditer(text):
+            s, e = m.span()
+            yield text[s:e].lower(), s, e
+
+
+def _documents(n, words=200, seed=0):
+    r = random.Random(seed)
+    vocabulary = ["w{}".format(i) for i in range(5000)]
+    return [" ".join(r.choice(vocabulary) for _ in range(words)) for _ in range(n)]
+
+
+def _thread_worker(tm, docs, queries, barrier, errors):
+    """
+    index docs and run queries between barriers. an error is added to errors
+    and breaks the barrier, so that other threads don't wait forever.
+    """
+    c = None
+    try:
+        c = sqlite3.connect(":memory:")
+        fts5.register_tokenizer(c, "r", tm)
+        c.execute("CREATE VIRTUAL TABLE t USING FTS5(w, tokenize=r)")
+        rows = [(d,) for d in docs]
+        barrier.wait()
+        with c:
+            c.executemany("INSERT INTO t VALUES(?)", rows)
+        barrier.wait()
+        for q in queries:
+            c.execute("SELECT rowid FROM t WHERE t MATCH ?", (q,)).fetchall()
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    except BaseException as e:
+        errors.append(e)
+        barrier.abort()
+    finally:
+        if c is not None:
+            c.close()
+
+
+def threads(nthreads=(1, 2, 4), docs=500, queries=2000, per_thread=False):
+    """
+    measure throughput of indexing docs documents and running queries in
+    each of n threads for n in nthreads. each thread uses its own connection.
+    if per_thread is True, each thread uses its own tokenizer instance.
+    returns a dict with a list of documents and queries per second for
+    each n as "threads". an error in a thread is raised after all threads
+    end.
+    """
+    if per_thread:
+        tm = fts5.make_fts5_tokenizer(
+            lambda ctx, args: _RegexTokenizer(), per_thread=True
+        )
+    else:
+        tm = fts5.make_fts5_tokenizer(_RegexTokenizer())
+    documents = _documents(docs)
+    r = random.Random(1)
+    qs = ["w{}".format(r.randrange(5000)) for _ in range(queries)]
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)
+    results = {"backend": tokenizer.backend, "gil": is_gil_enabled(), "threads": []}
+    for n in nthreads:
+        barrier = threading.Barrier(n + 1)
+        errors = []
+        args = (tm, documents, qs, barrier, errors)
+        workers = [threading.Thread(target=_thread_worker, args=args) for _ in range(n)]
+        for w in workers:
+            w.start()
+        try:
+            barrier.wait()
+            s = time.perf_counter()
+            barrier.wait()
+            m = time.perf_counter()
+            barrier.wait()
+            e = time.perf_counter()
+        except threading.BrokenBarrierError:
+            if not errors:
+                raise
+        finally:
+            for w in workers:
+                w.join()
+        if errors:
+            raise errors[0]
+        results["threads"].append(
+            {"threads": n, "index": n * docs / (m - s), "query": n * queries / (e - m)}
+        )
+    return results
+
+
+_SIZES = (1, 10, 100, 1000)
+
+
+class _IdentityTokenizer(fts5.FTS5Tokenizer):
+    """returns tokens prepared for each document"""
+
+    def __init__(self, docs):
+        self.tokens = {}
+        for d in docs:
+            tokens = []
+            p = 0
+            for w in d.split(" "):
+                tokens.append((w.encode("utf-8"), p, p + len(w)))
+                p += len(w) + 1
+            self.tokens[d] = tokens
+
+    def tokenize(self, text, flags=None):
+        return self.tokens[text]
+
+
+def _compare_fts3(tokenize, docs, repeat):
+    c = sqlite3.connect(":memory:")
+    try:
+        if tokenize == "python":
+            tm = fts3.make_tokenizer_module(_IdentityTokenizer(docs))
+            fts3.register_tokenizer(c, "python", tm)
+        c.execute("CREATE VIRTUAL TABLE tok USING fts3tokenize({})".format(tokenize))
+        sql = "SELECT count(*) FROM tok WHERE input=?"
+
+        def run():
+            for d in docs:
+                c.execute(sql, (d,)).fetchone()
+
+        return _best(run, repeat)
+    finally:
+        c.close()
+
+
+def _compare_fts5(tokenize, docs, repeat):
+    c = sqlite3.connect(":memory:")
+    try:
+        if tokenize == "python":
+            tm = fts5.make_fts5_tokenizer(_IdentityTokenizer(docs))
+            fts5.register_tokenizer(c, "python", tm)
+        create = "CREATE VIRTUAL TABLE t USING FTS5(w, tokenize={}, detail=none)"
+        rows = [(d,) for d in docs]
+        t = float("inf")
+        for _ in range(repeat):
+            c.execute(create.format(tokenize))
+            s = time.perf_counter()
+            c.executemany("INSERT INTO t VALUES(?)", rows)
+            t = min(t, time.perf_counter() - s)
+            c.execute("DROP TABLE t")
+        return t
+    finally:
+        c.close()
+
+
+_COMPARE_CASES = (
+    ("fts3", "python", _compare_fts3),
+    ("fts3", "unicode61", _compare_fts3),
+    ("fts5", "python", _compare_fts5),
+    ("fts5", "unicode61", _compare_fts5),
+    ("fts5", "trigram", _compare_fts5),
+)
+
+
+def compare(sizes=_SIZES, budget=100000, repeat=5):
+    """
+    measure tokenizers for documents of each size(in tokens).
+    returns a list of dicts of module, tokenizer, size, docs, us_per_call and
+    tokens_per_sec. tokenizers not supported by SQLite are skipped.
+    """
+    results = []
+    for size in sizes:
+        r = random.Random(size)
+        ndocs = max(1, budget // size)
+        docs = [
+            " ".join("w{}".format(r.randrange(100000)) for _ in range(size))
+            for _ in range(ndocs)
+        ]
+        for module, tokenize, f in _COMPARE_CASES:
+            try:
+                t = f(tokenize, docs, repeat)
+            except sqlite3.OperationalError:
+                # e.g. trigram requires SQLite 3.34.0
+                continue
+            if tokenize == "trigram":
+                ntokens = sum(max(len(d) - 2, 0) for d in docs)
+            else:
+                ntokens = size * ndocs
+            results.append(
+                {
+                    "module": module,
+                    "tokenizer": tokenize,
+                    "size": size,
+                    "docs": ndocs,
+                    "us_per_call": t / ndocs * 1e6,
+                    "tokens_per_sec": ntokens / t,
+                }
+            )
+    return results
+
+
+_CORPUS_QUERIES = {
+    "fts4": (
+        ("term", "term", "SELECT rowid FROM t WHERE t MATCH ?"),
+        ("and", "and", "SELECT rowid FROM t WHERE t MATCH ?"),
+        ("phrase", "phrase", "SELECT rowid FROM t WHERE t MATCH ?"),
+        ("prefix", "prefix", "SELECT rowid FROM t WHERE t MATCH ?"),
+        (
+            "bm25",
+            "term",
+            "SELECT rowid, bm25(matchinfo(t, 'pcnalx'), 1) AS s FROM t "
+            "WHERE t MATCH ? ORDER BY s DESC LIMIT 10",
+        ),
+        ("snippet", "term", "SELECT snippet(t) FROM t WHERE t MATCH ? LIMIT 10"),
+    ),
+    "fts5": (
+        ("term", "term", "SELECT rowid FROM t WHERE t MATCH ?"),
+        ("and", "and", "SELECT rowid FROM t WHERE t MATCH ?"),
+        ("phrase", "phrase", "SELECT rowid FROM t WHERE t MATCH ?"),
+        ("prefix", "prefix", "SELECT rowid FROM t WHERE t MATCH ?"),
+        ("rank", "term", "SELECT rowid FROM t WHERE t MATCH ? ORDER BY rank LIMIT 10"),
+        (
+            "highlight",
+            "term",
+            "SELECT highlight(t, 1, '[', ']') FROM t WHERE t MATCH ? LIMIT 10",
+        ),
+        ("tokenize", "term", "SELECT tokenize(t, 1) FROM t WHERE t MATCH ? LIMIT 10"),
+    ),
+}
+"""kind, queries and SQL of the query mix for each module"""
+
+
+def _corpus_queries(docs, n, seed):
+    """term, and, phrase and prefix queries, n for each"""
+    r = random.Random(seed)
+    words = corpus.NOUNS + corpus.KATAKANA
+    queries = {"term": [], "and": [], "phrase": [], "prefix": []}
+    for _ in range(n):
+        queries["term"].append('"{}"'.format(r.choice(words)))
+        queries["and"].append('"{}" "{}"'.format(r.choice(words), r.choice(words)))
+        # the beginning of a sentence in a document
+        sentence = r.choice(r.choice(docs)[1].split("。")[:-1])
+        queries["phrase"].append('"{}"'.format(sentence[: r.randrange(3, 7)]))
+        queries["prefix"].append("{}*".format(r.choice(words)[0]))
+    return queries
+
+
+def _percentiles(times):
+    times = sorted(times)
+
+    def p(q):
+        return times[max(0, int(math.ceil(q * len(times))) - 1)] * 1e3
+
+    return {
+        "queries": len(times),
+        "p50_ms": p(0.5),
+        "p90_ms": p(0.9),
+        "p99_ms": p(0.99),
+        "max_ms": times[-1] * 1e3,
+    }
+
+
+def _corpus_table(module, path, tokenize, docs, queries):
+    from . import fts5_aux, ranking
+
+    c = sqlite3.connect(path)
+    try:
+        if module == "fts4":
+            fts3.register_tokenizer(c, "t", fts3.make_tokenizer_module(tokenize))
+            c.create_function("bm25", 2, ranking.bm25)
+        else:
+            fts5.register_tokenizer(c, "t", fts5.make_fts5_tokenizer(tokenize))
+            fts5_aux.register_aux_function(c, "tokenize", fts5_aux.aux_tokenize)
+        c.execute(
+            "CREATE VIRTUAL TABLE t USING {}(title, body, tokenize=t)".format(module)
+        )
+        s = time.perf_counter()
+        with c:
+            c.executemany("INSERT INTO t VALUES(?, ?)", docs)
+        build = time.perf_counter() - s
+        results = {
+            "module": module,
+            "build_seconds": build,
+            "docs_per_sec": len(docs) / build,
+            "size_bytes": os.path.getsize(path),
+            "queries": [],
+        }
+        for kind, name, sql in _CORPUS_QUERIES[module]:
+            times = []
+            hits = 0
+            for q in queries[name]:
+                s = time.perf_counter()
+                hits += len(c.execute(sql, (q,)).fetchall())
+                times.append(time.perf_counter() - s)
+            results["queries"].append(dict(_percentiles(times), kind=kind, hits=hits))
+        return results
+    finally:
+        c.close()
+
+
+def end_to_end(docs=2000, script="ja", queries=100, tokenize=None, seed=0):
+    """
+    index docs documents generated by sqlitefts.corpus into a FTS4 and a FTS5
+    table on disk with tokenize(corpus.BigramTokenizer by default), and run
+    queries queries of each kind of the mix: MATCH with a term, terms(AND),
+    a phrase and a prefix, ranking with ranking.bm25(FTS4) or rank(FTS5),
+    and auxiliary functions(snippet, highlight and fts5_aux.aux_tokenize).
+    returns a dict with build time, database size and latency percentiles
+    of each table as "tables".
+    """
+    import tempfile
+
+    if tokenize is None:
+        tokenize = corpus.BigramTokenizer()
+    documents = corpus.documents(docs, seed=seed, script=script)
+    qs = _corpus_queries(documents, queries, seed + 1)
+    results = {
+        "backend": tokenizer.backend,
+        "docs": docs,
+        "script": script,
+        "bytes": sum(len((t + b).encode("utf-8")) for t, b in documents),
+        "tokenizer": type(tokenize).__name__,
+        "tables": [],
+    }
+    with tempfile.TemporaryDirectory() as d:
+        for module in ("fts4", "fts5"):
+            path = os.path.join(d, module + ".db")
+            table = _corpus_table(module, path, tokenize, documents, qs)
+            results["tables"].append(table)
+    return results
+
+
+def _load_tokenizer(spec):
+    """a tokenizer instance from "module:name" of a class or an instance"""
+    import importlib
+
+    module, _, name = spec.partition(":")
+    t = getattr(importlib.import_module(module), name)
+    return t() if isinstance(t, type) else t
+
+
+def _report_corpus(results):
+    print(
+        "backend: {backend} docs: {docs} ({bytes} bytes, {script}) "
+        "tokenizer: {tokenizer}".format(**results)
+    )
+    for t in results["tables"]:
+        print(
+            "  {module}: build {build_seconds:8.3f} s {docs_per_sec:10.1f} docs/s "
+            "size {size_bytes:12d} bytes".format(**t)
+        )
+        for q in t["queries"]:
+            print(
+                "    {kind:10s} p50 {p50_ms:8.3f} p90 {p90_ms:8.3f} "
+                "p99 {p99_ms:8.3f} max {max_ms:8.3f} ms ({hits} hits)".format(**q)
+            )
+
+
+def _report_compare(results):
+    print("backend: {}".format(tokenizer.backend))
+    for r in results:
+        print(
+            "  {module}/{tokenizer:10s} {size:5d} tokens/doc: "
+            "{us_per_call:10.2f} us/call {tokens_per_sec:12.0f} tokens/s".format(**r)
+        )
+
+
+def environment():
+    """versions of Python, SQLite and this library, and the backend"""
+    try:
+        from importlib.metadata import version
+
+        sqlitefts_version = version("sqlitefts")
+    except Exception:
+        sqlitefts_version = None
+    return {
+        "sqlitefts": sqlitefts_version,
+        "backend": tokenizer.backend,
+        "python": sys.version,
+        "implementation": platform.python_implementation(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def _report_threads(results):
+    print("backend: {} gil: {}".format(results["backend"], results["gil"]))
+    for r in results["threads"]:
+        print(
+            "  {threads:3d} threads: {index:10.1f} docs/s "
+            "{query:10.1f} queries/s".format(**r)
+        )
+
+
+def _report_import(results):
+    print("backend: {}".format(results["backend"]))
+    for name, _ in _IMPORT_STAGES:
+        print("  {:28s} {:8.2f} ms".format(name, results[name] * 1e3))
+    for line in results.get("importtime", []):
+        print("  " + line)
+
+
+def _report(results):
+    print("backend: {}".format(results["backend"]))
+    for name in ("fts3", "fts5"):
+        r = results[name]
+        print(
+            "  {}: {:8.3f} us/call {:8.3f} us/token".format(
+                name, r["call"] * 1e6, r["token"] * 1e6
+            )
+        )
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m sqlitefts.bench")
+    p.add_argument(
+        "what",
+        nargs="?",
+        choices=("overhead", "import", "threads", "compare", "corpus"),
+    )
+    p.add_argument("--backend", choices=("abi", "api", "all"))
+    p.add_argument("--docs", type=int, default=2000)
+    p.add_argument("--tokens", type=int, default=100)
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--threads", default="1,2,4")
+    p.add_argument("--per-thread", action="store_true")
+    p.add_argument("--sizes", default=",".join(str(n) for n in _SIZES))
+    p.add_argument("--budget", type=int, default=100000)
+    p.add_argument("--script", choices=("ja", "mixed"), default="ja")
+    p.add_argument("--queries", type=int)
+    p.add_argument("--tokenizer", metavar="MODULE:NAME")
+    p.add_argument("--json", metavar="FILE")
+    args = p.parse_args(argv)
+    what = args.what or "overhead"
+    if args.backend == "all" or (
+        args.backend and args.backend != tokenizer.backend
+    ):
+        # the backend is selected on import, run in another process
+        backends = ("abi", "api") if args.backend == "all" else (args.backend,)
+        runs = []
+        for backend in backends:
+            cmd = [sys.executable, "-m", "sqlitefts.bench", what]
+            cmd += ["--backend", backend, "--docs", str(args.docs)]
+            cmd += ["--tokens", str(args.tokens), "--repeat", str(args.repeat)]
+            cmd += ["--threads", args.threads, "--sizes", args.sizes]
+            cmd += ["--budget", str(args.budget), "--script", args.script]
+            cmd += ["--queries", str(args.queries)] if args.queries else []
+            cmd += ["--tokenizer", args.tokenizer] if args.tokenizer else []
+            cmd += ["--per-thread"] if args.per_thread else []
+            env = dict(os.environ, SQLITEFTS_BACKEND=backend)
+            if args.json:
+                cmd += ["--json", "-"]
+                p = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE)
+                out, _ = p.communicate()
+                if p.returncode:
+                    return p.returncode
+                runs.extend(json.loads(out.decode("utf-8"))["runs"])
+            else:
+                r = subprocess.call(cmd, env=env)
+                if r:
+                    return r
+        if args.json:
+            _write_json(args.json, runs)
+        return 0
+    if what == "import":
+        results = import_time(args.repeat, importtime=True)
+        report = _report_import
+    elif what == "threads":
+        nthreads = [int(n) for n in args.threads.split(",")]
+        results = threads(
+            nthreads, args.docs, args.queries or 2000, per_thread=args.per_thread
+        )
+        report = _report_threads
+    elif what == "compare":
+        sizes = [int(n) for n in args.sizes.split(",")]
+        results = compare(sizes, args.budget, args.repeat)
+        report = _report_compare
+    elif what == "corpus":
+        tokenize = _load_tokenizer(args.tokenizer) if args.tokenizer else None
+        queries = args.queries or 100
+        results = end_to_end(args.docs, args.script, queries, tokenize)
+        report = _report_corpus
+    else:
+        results = run(args.docs, args.tokens, args.repeat)
+        report = _report
+    if args.json:
+        _write_json(args.json, [dict(environment(), benchmark=what, results=results)])
+    else:
+        report(results)
+    return 0
+
+
+def _write_json(path, runs):
+    data = json.dumps({"runs": runs}, indent=2, sort_keys=True)
+    if path == "-":
+        print(data)
+    else:
+        with open(path, "w") as f:
+            f.write(data + "\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
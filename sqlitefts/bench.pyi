@@ -0,0 +1,22 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+def run(docs: int = ..., tokens: int = ..., repeat: int = ...) -> Dict[str, Any]: ...
+def import_time(repeat: int = ..., importtime: bool = ...) -> Dict[str, Any]: ...
+def threads(
+    nthreads: Iterable[int] = ...,
+    docs: int = ...,
+    queries: int = ...,
+    per_thread: bool = ...,
+) -> Dict[str, Any]: ...
+def compare(
+    sizes: Iterable[int] = ..., budget: int = ..., repeat: int = ...
+) -> List[Dict[str, Any]]: ...
+def end_to_end(
+    docs: int = ...,
+    script: str = ...,
+    queries: int = ...,
+    tokenize: Optional[Any] = ...,
+    seed: int = ...,
+) -> Dict[str, Any]: ...
+def environment() -> Dict[str, Any]: ...
+def main(argv: Optional[List[str]] = ...) -> int: ...
@@ -0,0 +1,438 @@
+# coding: utf-8
+"""
+bulk indexing
+
+load inserts many rows into a FTS table in batches of transactions. merging
+segments is deferred while loading, and the index is optimized at the end.
+
+    with open("docs.tsv") as f:
+        stats = bulk.load(c, "docs", (line.split("\t") for line in f))
+    print(stats["rows_per_sec"], stats["bytes_per_sec"])
+
+tokenizing documents in Python often limits the speed of indexing, since
+SQLite calls a tokenizer in the thread writing to the database.
+index_parallel tokenizes documents in worker processes, and SQLite gets the
+tokens from a ReplayTokenizer instead of running the tokenizer again.
+
+    tk = bulk.ReplayTokenizer(JapaneseTokenizer())
+    fts5.register_tokenizer(c, "ja", fts5.make_fts5_tokenizer(tk))
+    c.execute("CREATE VIRTUAL TABLE docs USING FTS5(title, body, tokenize=ja)")
+    with c:
+        bulk.index_parallel(c, "docs", rows, tk, workers=4)
+
+the tokenizer is sent to worker processes, so it must be picklable.
+a class can be given instead of an instance, and each worker makes one.
+"""
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from .batch import tokenize_to_batch, unpack_tokens
+from .error import Error
+from .fts5 import FTS5_TOKENIZE_DOCUMENT, FTS5Tokenizer
+
+FTS5_LOAD_SETTINGS = {"automerge": 0, "crisismerge": 64}
+"""FTS5 configuration used by load() by default"""
+
+_FTS5_DEFAULTS = {"automerge": 4, "crisismerge": 16, "pgsz": 4050, "usermerge": 4}
+
+_ABSENT = object()
+"""a FTS5 configuration option not in %_config"""
+
+
+def _is_fts5(tokenizer):
+    if isinstance(tokenizer, type):
+        return issubclass(tokenizer, FTS5Tokenizer)
+    return isinstance(tokenizer, FTS5Tokenizer)
+
+
+def _tokenize(tokenizer, flags, text):
+    args = () if flags is None else (flags,)
+    return tokenize_to_batch(tokenizer, text.encode("utf-8"), *args)
+
+
+class ReplayTokenizer(FTS5Tokenizer):
+    """
+    a tokenizer returning tokens computed in advance.
+
+    tokens of documents are added by add() before they are inserted, and
+    returned as they are when SQLite tokenizes the same text as a document.
+    the tokenizer is called for other text, e.g. queries.
+    it works with both make_fts5_tokenizer and make_tokenizer_module.
+    if fts5 is True, the tokenizer is called with FTS5_TOKENIZE_DOCUMENT on
+    tokenizing in advance, and without flags(a FTS3 tokenizer) if False.
+    it is True if the tokenizer is a FTS5Tokenizer by default.
+    """
+
+    def __init__(self, tokenizer, fts5=None):
+        self.tokenizer = tokenizer
+        if fts5 is None:
+            fts5 = _is_fts5(tokenizer)
+        self.flags = FTS5_TOKENIZE_DOCUMENT if fts5 else None
+        self._local = tokenizer() if isinstance(tokenizer, type) else tokenizer
+        self.hits = 0
+        self.misses = 0
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._batches)
+
+    def add(self, text, batch):
+        """add tokens(a batch, see sqlitefts.batch) of a document"""
+        with self._lock:
+            self._batches[text] = batch
+
+    def clear(self):
+        """remove all tokens added"""
+        with self._lock:
+            self._batches.clear()
+
+    def tokenize_batch(self, text, flags=None):
+        batch = None
+        if flags is None or flags & FTS5_TOKENIZE_DOCUMENT:
+            batch = self._batches.get(text)
+        if batch is not None:
+            self.hits += 1
+            return batch
+        self.misses += 1
+        return _tokenize(self._local, flags, text)
+
+    def tokenize(self, text, flags=None):
+        return unpack_tokens(self.tokenize_batch(text, flags))
+
+
+_worker = None
+"""tokenizer and flags of a worker process"""
+
+
+def _init_worker(tokenizer, flags):
+    global _worker
+    if isinstance(tokenizer, type):
+        tokenizer = tokenizer()
+    _worker = (tokenizer, flags)
+
+
+def _tokenize_texts(texts):
+    tokenizer, flags = _worker
+    return [_tokenize(tokenizer, flags, t) for t in texts]
+
+
+def _chunks(docs, chunk_size):
+    chunk = []
+    for row in docs:
+        chunk.append((row,) if isinstance(row, str) else tuple(row))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _quote(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def index_parallel(
+    conn,
+    table,
+    docs,
+    replay,
+    columns=None,
+    workers=None,
+    chunk_size=64,
+    mp_context=None,
+):
+    """
+    insert docs into a FTS table, tokenizing them in worker processes.
+
+    docs is an iterable of rows(a sequence of column values, or a str for a
+    table with one column). the table must use replay, a ReplayTokenizer,
+    registered to conn. columns is a list of column names to insert into,
+    all columns if None.
+    rows are inserted in order in chunks of chunk_size rows, and at most
+    2 * workers chunks are tokenized ahead. it doesn't commit.
+    returns the number of inserted rows.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    sql = None
+    count = 0
+    cur = conn.cursor()
+    executor = ProcessPoolExecutor(
+        workers,
+        mp_context=mp_context,
+        initializer=_init_worker,
+        initargs=(replay.tokenizer, replay.flags),
+    )
+    try:
+        pending = deque()
+        chunks = _chunks(docs, chunk_size)
+        while True:
+            while len(pending) < 2 * workers:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                texts = list({v for row in chunk for v in row if isinstance(v, str)})
+                pending.append((chunk, texts, executor.submit(_tokenize_texts, texts)))
+            if not pending:
+                break
+            chunk, texts, future = pending.popleft()
+            for text, batch in zip(texts, future.result()):
+                replay.add(text, batch)
+            if sql is None:
+                names = "" if columns is None else "({})".format(
+                    ", ".join(_quote(c) for c in columns)
+                )
+                sql = "INSERT INTO {}{} VALUES({})".format(
+                    _quote(table), names, ", ".join(["?"] * len(chunk[0]))
+                )
+            try:
+                cur.executemany(sql, chunk)
+            finally:
+                replay.clear()
+            count += len(chunk)
+    finally:
+        executor.shutdown(cancel_futures=True)
+        cur.close()
+    return count
+
+
+@contextmanager
+def _transaction(cur):
+    """
+    a transaction begun explicitly, so that sqlite3 doesn't begin one
+    implicitly
+    """
+    cur.execute("BEGIN")
+    try:
+        yield
+    except BaseException:
+        cur.execute("ROLLBACK")
+        raise
+    cur.execute("COMMIT")
+
+
+def _fts_module(cur, table):
+    r = cur.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone()
+    m = r and re.search(r"\busing\s+(fts[345])\b", r[0], re.IGNORECASE)
+    if not m:
+        raise Error("not a FTS table: {}".format(table))
+    return m.group(1).lower()
+
+
+def _has_table(cur, name):
+    r = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ).fetchone()
+    return r is not None
+
+
+def _fts5_settings(cur, table, settings):
+    """
+    set FTS5 configuration, and returns the previous values of them.
+    an option which was not in %_config is _ABSENT, and setting it to _ABSENT
+    deletes it from %_config again.
+    """
+    config_table = _quote(table + "_config")
+    config = dict(cur.execute("SELECT k, v FROM {}".format(config_table)))
+    previous = {k: config.get(k, _ABSENT) for k in settings}
+    sql = "INSERT INTO {0}({0}, rank) VALUES(?, ?)".format(_quote(table))
+    for k, v in settings.items():
+        if v is not _ABSENT:
+            cur.execute(sql, (k, v))
+        elif k in config:
+            if k in _FTS5_DEFAULTS:
+                # FTS5 keeps the value in effect until it is set again
+                cur.execute(sql, (k, _FTS5_DEFAULTS[k]))
+            cur.execute("DELETE FROM {} WHERE k=?".format(config_table), (k,))
+    return previous
+
+
+def _fts4_automerge(cur, table, n):
+    """set automerge of FTS3/4 table, and returns the previous value"""
+    previous = 0
+    if _has_table(cur, table + "_stat"):
+        r = cur.execute(
+            "SELECT value FROM {} WHERE id=2".format(_quote(table + "_stat"))
+        ).fetchone()
+        previous = r[0] if r else 0
+    sql = "INSERT INTO {0}({0}) VALUES(?)".format(_quote(table))
+    cur.execute(sql, ("automerge={}".format(n),))
+    return previous
+
+
+def _size(value):
+    if isinstance(value, str):
+        return len(value) if value.isascii() else len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    return 0
+
+
+def _put(q, item, stop):
+    """put an item unless the consumer stopped. returns False if stopped"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _batches(rows, batch_size):
+    """yield batches of rows with their size"""
+    for chunk in _chunks(rows, batch_size):
+        yield chunk, sum(_size(v) for row in chunk for v in row)
+
+
+def _produce(rows, batch_size, q, stop):
+    """make batches in a background thread, and put them to q"""
+    try:
+        for item in _batches(rows, batch_size):
+            if not _put(q, item, stop):
+                return
+        _put(q, None, stop)
+    except BaseException as e:
+        _put(q, e, stop)
+
+
+def _prefetched(rows, batch_size, stop):
+    """yield batches made in a background thread, and raise its error"""
+    q = queue.Queue(2)
+    producer = threading.Thread(target=_produce, args=(rows, batch_size, q, stop))
+    producer.daemon = True
+    producer.start()
+    while True:
+        item = q.get()
+        if item is None:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def _restore(cur, table, module, previous):
+    with _transaction(cur):
+        if module == "fts5":
+            _fts5_settings(cur, table, previous)
+        else:
+            _fts4_automerge(cur, table, previous)
+
+
+def _finish(cur, table, module, finish, merge_pages):
+    total_changes = "SELECT total_changes()"
+    if finish == "optimize":
+        with _transaction(cur):
+            cur.execute("INSERT INTO {0}({0}) VALUES('optimize')".format(_quote(table)))
+    elif finish == "merge":
+        # merge until no more work is done
+        if module == "fts5":
+            sql = "INSERT INTO {0}({0}, rank) VALUES('merge', {1})"
+        else:
+            sql = "INSERT INTO {0}({0}) VALUES('merge={1},8')"
+        sql = sql.format(_quote(table), merge_pages)
+        while True:
+            before = cur.execute(total_changes).fetchone()[0]
+            with _transaction(cur):
+                cur.execute(sql)
+            if cur.execute(total_changes).fetchone()[0] - before < 2:
+                break
+
+
+def load(
+    conn,
+    table,
+    rows,
+    batch_size=10000,
+    columns=None,
+    settings=None,
+    finish="optimize",
+    merge_pages=500,
+    prefetch=False,
+):
+    """
+    insert rows into a FTS3/4/5 table in transactions of batch_size rows.
+
+    rows is an iterable of rows(a sequence of column values, or a str for a
+    table with one column), e.g. a cursor of the same connection. if prefetch
+    is True, it is consumed in a background thread while SQLite writes the
+    previous batch, so it must not use conn. columns is a list of column
+    names to insert into, all columns if None.
+    merging segments is deferred while loading. settings is a dict of FTS5
+    configuration options(FTS5_LOAD_SETTINGS by default), e.g. pgsz, and they
+    are restored after loading. options which were not in %_config are
+    deleted from it. automerge is disabled for FTS3/4 tables.
+    finish is 'optimize' to merge all segments into one at the end, 'merge'
+    to merge them incrementally by merge_pages pages in each transaction,
+    or None.
+    conn must not be in a transaction.
+    returns a dict of rows, bytes(of text and blob values), batches,
+    seconds, rows_per_sec, bytes_per_sec and finish_seconds.
+    """
+    if finish not in ("optimize", "merge", None):
+        raise ValueError("finish must be 'optimize', 'merge' or None")
+    if getattr(conn, "in_transaction", False):
+        raise Error("the connection is in a transaction")
+    cur = conn.cursor()
+    stop = threading.Event()
+    stats = {"rows": 0, "bytes": 0, "batches": 0}
+    start = time.perf_counter()
+    try:
+        module = _fts_module(cur, table)
+        with _transaction(cur):
+            if module == "fts5":
+                if settings is None:
+                    settings = FTS5_LOAD_SETTINGS
+                previous = _fts5_settings(cur, table, settings)
+            else:
+                previous = _fts4_automerge(cur, table, 0)
+        if prefetch:
+            batches = _prefetched(rows, batch_size, stop)
+        else:
+            batches = _batches(rows, batch_size)
+        sql = None
+        try:
+            for chunk, size in batches:
+                if sql is None:
+                    names = "" if columns is None else "({})".format(
+                        ", ".join(_quote(c) for c in columns)
+                    )
+                    sql = "INSERT INTO {}{} VALUES({})".format(
+                        _quote(table), names, ", ".join(["?"] * len(chunk[0]))
+                    )
+                with _transaction(cur):
+                    cur.executemany(sql, chunk)
+                stats["rows"] += len(chunk)
+                stats["bytes"] += size
+                stats["batches"] += 1
+        except BaseException:
+            try:
+                _restore(cur, table, module, previous)
+            except Exception:
+                # keep the error of loading
+                pass
+            raise
+        _restore(cur, table, module, previous)
+        loaded = time.perf_counter()
+        _finish(cur, table, module, finish, merge_pages)
+    finally:
+        stop.set()
+        cur.close()
+    end = time.perf_counter()
+    stats["seconds"] = loaded - start
+    stats["finish_seconds"] = end - loaded
+    stats["rows_per_sec"] = stats["rows"] / stats["seconds"]
+    stats["bytes_per_sec"] = stats["bytes"] / stats["seconds"]
+    return stats
+
+
+__all__ = ["FTS5_LOAD_SETTINGS", "ReplayTokenizer", "index_parallel", "load"]
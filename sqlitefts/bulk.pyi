@@ -0,0 +1,42 @@
+import sqlite3
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence, Union
+
+import apsw  # type: ignore
+
+from .batch import TokenBatch
+from .fts5 import FTS5Tokenizer
+
+FTS5_LOAD_SETTINGS: Dict[str, int]
+
+class ReplayTokenizer(FTS5Tokenizer):
+    tokenizer: Any
+    flags: Optional[int]
+    hits: int
+    misses: int
+    def __init__(self, tokenizer: Any, fts5: Optional[bool] = ...) -> None: ...
+    def __len__(self) -> int: ...
+    def add(self, text: str, batch: TokenBatch) -> None: ...
+    def clear(self) -> None: ...
+    def tokenize_batch(self, text: str, flags: Optional[int] = ...) -> TokenBatch: ...
+
+def index_parallel(
+    conn: Union[sqlite3.Connection, apsw.Connection],
+    table: str,
+    docs: Iterable[Union[str, Sequence[Any]]],
+    replay: ReplayTokenizer,
+    columns: Optional[Sequence[str]] = ...,
+    workers: Optional[int] = ...,
+    chunk_size: int = ...,
+    mp_context: Any = ...,
+) -> int: ...
+def load(
+    conn: Union[sqlite3.Connection, apsw.Connection],
+    table: str,
+    rows: Iterable[Union[str, Sequence[Any]]],
+    batch_size: int = ...,
+    columns: Optional[Sequence[str]] = ...,
+    settings: Optional[Mapping[str, Any]] = ...,
+    finish: Optional[str] = ...,
+    merge_pages: int = ...,
+    prefetch: bool = ...,
+) -> Dict[str, float]: ...
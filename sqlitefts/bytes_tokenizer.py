@@ -0,0 +1,56 @@
+# coding: utf-8
+"""
+tokenizers working on UTF-8 encoded bytes
+
+a tokenizer which implements tokenize_bytes(data, flags) receives the input
+as a memoryview of the UTF-8 text given by SQLite instead of str, and yields
+tokens as bytes. neither the input nor tokens are decoded/encoded.
+it can be used for both FTS3/4 and FTS5.
+"""
+import re
+
+
+class BytesTokenizer(object):
+    """
+    Tokenizer base class for bytes.
+    """
+
+    def tokenize_bytes(self, data, flags=None):
+        """
+        Tokenize given UTF-8 text(a bytes-like object). Yields each tokenized
+        token(in bytes), start position(in bytes), end positon(in bytes).
+
+        data is valid only while the tokenizer is called, it should not be
+        kept after that.
+        flags will be set only if it is used for FTS5 table.
+        """
+        yield bytes(data), 0, len(data)
+
+
+class RegexTokenizer(BytesTokenizer):
+    """
+    a tokenizer which yields each match of a regular expression for bytes.
+
+    the default pattern matches sequences of ASCII alphanumerics, "_" and
+    non ASCII characters. a pattern should not split a multi-byte character.
+    if lower is True, ASCII characters in tokens are converted to lowercase.
+    """
+
+    default_pattern = re.compile(rb"[0-9A-Za-z_\x80-\xff]+")
+
+    def __init__(self, pattern=None, lower=True):
+        if pattern is None:
+            pattern = self.default_pattern
+        elif not hasattr(pattern, "finditer"):
+            pattern = re.compile(pattern)
+        self.pattern = pattern
+        self.lower = lower
+
+    def tokenize_bytes(self, data, flags=None):
+        lower = self.lower
+        for m in self.pattern.finditer(data):
+            t = m.group()
+            yield t.lower() if lower else t, m.start(), m.end()
+
+
+__all__ = ["BytesTokenizer", "RegexTokenizer"]
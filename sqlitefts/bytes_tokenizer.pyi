@@ -0,0 +1,17 @@
+from typing import Iterator, Optional, Pattern, Tuple, Union
+
+class BytesTokenizer:
+    def tokenize_bytes(
+        self, data: memoryview, flags: Optional[int] = ...
+    ) -> Iterator[Tuple[bytes, int, int]]: ...
+
+class RegexTokenizer(BytesTokenizer):
+    default_pattern: Pattern[bytes]
+    pattern: Pattern[bytes]
+    lower: bool
+    def __init__(
+        self, pattern: Union[bytes, Pattern[bytes], None] = ..., lower: bool = ...
+    ) -> None: ...
+    def tokenize_bytes(
+        self, data: memoryview, flags: Optional[int] = ...
+    ) -> Iterator[Tuple[bytes, int, int]]: ...
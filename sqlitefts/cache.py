@@ -0,0 +1,112 @@
+# coding: utf-8
+"""
+cache of tokenization results
+
+SQLite tokenizes the same text again on some operations, e.g.
+"INSERT INTO t SELECT * FROM t", deleting/updating rows of contentless or
+external content tables, 'rebuild' command and auxiliary functions.
+a TokenCache holds encoded tokens(a batch, see sqlitefts.batch) keyed by
+a digest of input text and flags, so that a tokenizer runs only once for
+each distinct text.
+
+a cache can be shared by tokenizers. keys are scoped by the tokenizer and
+the arguments of tokenize= of a table, so that tables tokenizing the same
+text differently don't get tokens of each other.
+
+a QueryCache is meant to be used only for query strings, which are short and
+repeated many times.
+"""
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict
+
+_registrations = itertools.count()
+"""serial numbers of tokenizers made with a cache, used in scopes of keys"""
+
+
+def _batch_size(batch):
+    return len(batch[0]) + sum(a.itemsize * len(a) for a in batch[1:])
+
+
+class TokenCache(object):
+    """
+    a bounded LRU cache of tokenization results.
+
+    max_bytes is the maximum total size of cached tokens and their positions.
+    a result larger than max_bytes is not cached.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_ratio(self):
+        """ratio of hits to lookups"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @staticmethod
+    def key(data, flags=None, scope=None):
+        """
+        make a key from input text(a bytes-like object), flags and scope(a
+        hashable identifying the tokenizer)
+        """
+        return scope, flags, hashlib.blake2b(data, digest_size=16).digest()
+
+    def get(self, key):
+        """get a cached batch, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, batch):
+        """store a batch, and evict least recently used ones if needed"""
+        size = _batch_size(batch) + len(key[-1])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._entries[key] = (batch, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self):
+        """remove all cached batches and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.size = self.hits = self.misses = 0
+
+
+class QueryCache(TokenCache):
+    """
+    a bounded LRU cache of tokenization results of query strings.
+    query strings are short, so that they are used as keys instead of digests.
+    """
+
+    def __init__(self, max_bytes=4 * 1024 * 1024):
+        super(QueryCache, self).__init__(max_bytes)
+
+    @staticmethod
+    def key(data, flags=None, scope=None):
+        return scope, flags, bytes(data)
+
+
+__all__ = ["TokenCache", "QueryCache"]
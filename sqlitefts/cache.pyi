@@ -0,0 +1,24 @@
+from typing import Any, Optional, Tuple
+
+from .batch import TokenBatch
+
+CacheKey = Tuple[Any, Optional[int], bytes]
+
+class TokenCache:
+    max_bytes: int
+    size: int
+    hits: int
+    misses: int
+    def __init__(self, max_bytes: int = ...) -> None: ...
+    def __len__(self) -> int: ...
+    @property
+    def hit_ratio(self) -> float: ...
+    @staticmethod
+    def key(
+        data: Any, flags: Optional[int] = ..., scope: Any = ...
+    ) -> CacheKey: ...
+    def get(self, key: CacheKey) -> Optional[TokenBatch]: ...
+    def put(self, key: CacheKey, batch: TokenBatch) -> None: ...
+    def clear(self) -> None: ...
+
+class QueryCache(TokenCache): ...
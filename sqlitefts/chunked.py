@@ -0,0 +1,99 @@
+# coding: utf-8
+"""
+tokenization of large documents in chunks
+
+    tm = fts5.make_fts5_tokenizer(
+        SimpleTokenizer(), chunked=Chunked(chunk_bytes=1 << 20, max_tokens=1000000)
+    )
+
+by default, a document is decoded and tokenized at once, so memory to
+tokenize it grows with its size. with a Chunked, it is decoded and tokenized
+in windows of chunk_bytes, which are aligned on boundaries of UTF-8
+characters. the last token of each window may be cut by the end of the
+window, so it is tokenized again with the next window. offsets of tokens are
+relative to the document, and positions are the same as tokenizing it at
+once, unless a token is longer than chunk_bytes or tokens overlap, e.g.
+n-grams. FTS3/4 tokens are pulled one by one(streaming) as well.
+
+max_bytes and max_tokens limit bytes and tokens of a document. the rest is
+ignored by default. if error is True, tokenization fails with SQLITE_TOOBIG
+instead. the limits are not applied to FTS5 query strings.
+
+tokenize_bytes of a tokenizer is called for each window if it is available,
+otherwise tokenize. tokenize_batch and cache are not used.
+"""
+from .error import Error
+from .tokenizer import tokenize_input
+
+SQLITE_TOOBIG = 18
+
+_FTS5_TOKENIZE_QUERY = 0x0001
+
+
+class LimitExceeded(Error):
+    """a document exceeds max_bytes or max_tokens of Chunked(error=True)"""
+
+
+def utf8_boundary(data, i):
+    """the start of the UTF-8 character at i, or i if it is the end of data"""
+    if i >= len(data):
+        return len(data)
+    while i > 0 and data[i] & 0xC0 == 0x80:
+        i -= 1
+    return i
+
+
+class Chunked(object):
+    """
+    a policy to tokenize documents in chunks of chunk_bytes with limits of
+    max_bytes and max_tokens.
+    """
+
+    def __init__(
+        self, chunk_bytes=1 << 20, max_bytes=None, max_tokens=None, error=False
+    ):
+        if chunk_bytes < 4:
+            raise ValueError("chunk_bytes must be 4 or more")
+        self.chunk_bytes = chunk_bytes
+        self.max_bytes = max_bytes
+        self.max_tokens = max_tokens
+        self.error = error
+
+    def tokens(self, tokenizer, data, flags=None):
+        """
+        yield tokens of data(a UTF-8 encoded bytes-like object) with start/end
+        positions in data. flags is passed to the tokenizer if it is not
+        None(FTS5).
+        """
+        args = () if flags is None else (flags,)
+        limited = flags is None or not flags & _FTS5_TOKENIZE_QUERY
+        max_tokens = self.max_tokens if limited else None
+        n = len(data)
+        if limited and self.max_bytes is not None and n > self.max_bytes:
+            if self.error:
+                raise LimitExceeded("the document is larger than max_bytes")
+            n = utf8_boundary(data, self.max_bytes)
+        count = 0
+        start = 0
+        while start < n:
+            end = utf8_boundary(data, min(start + self.chunk_bytes, n))
+            if end <= start:
+                # not UTF-8
+                end = min(start + self.chunk_bytes, n)
+            tokens = list(tokenize_input(tokenizer, data[start:end], *args))
+            if end < n and tokens and tokens[-1][1] > 0:
+                # the last token may be cut, tokenize it with the next chunk
+                next_start = start + tokens.pop()[1]
+            else:
+                next_start = end
+            for normalized, begin, stop in tokens:
+                if max_tokens is not None and count >= max_tokens:
+                    if self.error:
+                        raise LimitExceeded("the document has more than max_tokens")
+                    return
+                count += 1
+                yield normalized, start + begin, start + stop
+            start = next_start
+
+
+__all__ = ["Chunked", "LimitExceeded", "utf8_boundary", "SQLITE_TOOBIG"]
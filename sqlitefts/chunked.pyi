@@ -0,0 +1,25 @@
+from typing import Any, Iterator, Optional, Tuple
+
+from .error import Error
+
+SQLITE_TOOBIG: int
+
+class LimitExceeded(Error): ...
+
+def utf8_boundary(data: Any, i: int) -> int: ...
+
+class Chunked:
+    chunk_bytes: int
+    max_bytes: Optional[int]
+    max_tokens: Optional[int]
+    error: bool
+    def __init__(
+        self,
+        chunk_bytes: int = ...,
+        max_bytes: Optional[int] = ...,
+        max_tokens: Optional[int] = ...,
+        error: bool = ...,
+    ) -> None: ...
+    def tokens(
+        self, tokenizer: Any, data: Any, flags: Optional[int] = ...
+    ) -> Iterator[Tuple[Any, int, int]]: ...
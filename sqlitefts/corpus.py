@@ -0,0 +1,136 @@
+# coding: utf-8
+"""
+deterministic synthetic text for benchmarks and tests
+
+    from sqlitefts import corpus
+
+    docs = corpus.documents(1000, seed=0, script="mixed")  # [(title, body)]
+    c.execute("CREATE VIRTUAL TABLE docs USING FTS5(title, body, tokenize=bigram)")
+
+it generates Japanese(or Japanese mixed with Latin words and numbers) text
+from a small built-in vocabulary with random.Random, so that the same seed
+gives the same text without network or third party packages.
+BigramTokenizer is a simple tokenizer for the text, which splits it by
+scripts and makes bigrams of CJK characters.
+"""
+import random
+import re
+
+from . import fts5
+
+NOUNS = (
+    "検索 全文 索引 辞書 形態素 文書 単語 文字 言語 情報 処理 速度 性能 計算 記憶 "
+    "東京 大阪 京都 北海道 九州 会社 学校 大学 研究 開発 技術 製品 市場 価格 経済 "
+    "政治 社会 文化 歴史 科学 数学 物理 化学 医療 健康 天気 季節 電車 駅 空港 "
+    "料理 野菜 果物 お茶 旅行 写真 音楽 映画 新聞 雑誌 図書館 公園 病院 銀行 "
+    "会議 資料 報告 計画 予定 結果 問題 方法 理由 目的 時間 場所 世界 日本 地域"
+).split()
+KATAKANA = (
+    "データベース コンピュータ ソフトウェア インターネット サーバ クエリ "
+    "インデックス トークン テキスト システム ネットワーク アプリ ユーザ "
+    "メモリ キャッシュ ファイル プログラム ライブラリ テスト サービス "
+    "コーヒー レストラン ホテル ニュース スポーツ カメラ"
+).split()
+VERBS = (
+    "調べる 使う 作る 読む 書く 探す 見る 行く 変える 増える 減る 比べる "
+    "調べた 使った 作った 読んだ 書いた 探した 見た 行った 変わった 始めた "
+    "改善した 公開した 発表した 確認した 検討している 利用している"
+).split()
+ADJECTIVES = (
+    "新しい 古い 速い 遅い 大きい 小さい 高い 安い 便利な 簡単な 重要な 有名な"
+).split()
+PARTICLES = "は が を に で と の も から まで より".split()
+LATIN = (
+    "SQLite Python FTS5 FTS4 tokenizer index query search ranking bm25 "
+    "unicode cache thread benchmark release version Linux Windows macOS "
+    "API JSON HTTP server client"
+).split()
+PREFECTURES = (
+    "北海道 青森県 宮城県 東京都 神奈川県 埼玉県 千葉県 愛知県 京都府 大阪府 "
+    "兵庫県 広島県 福岡県 熊本県 沖縄県"
+).split()
+PLACES = "中央 本町 栄 緑 桜 若葉 旭 港 新町 北 南 東 西 上 下".split()
+
+
+def _word(r, script):
+    n = r.random()
+    if script == "mixed" and n < 0.15:
+        return r.choice(LATIN)
+    if script == "mixed" and n < 0.2:
+        return str(r.randrange(1, 10000))
+    if n < 0.3:
+        return r.choice(KATAKANA)
+    return r.choice(NOUNS)
+
+
+def sentence(r, script="ja"):
+    """a sentence made with r, a random.Random"""
+    parts = []
+    for _ in range(r.randrange(1, 4)):
+        if r.random() < 0.3:
+            parts.append(r.choice(ADJECTIVES))
+        parts.append(_word(r, script))
+        if r.random() < 0.4:
+            parts.append("の" + _word(r, script))
+        parts.append(r.choice(PARTICLES))
+    parts.append(r.choice(VERBS))
+    sep = " " if script == "mixed" else ""
+    return sep.join(parts) + "。"
+
+
+def address(r):
+    """an address-like text made with r, a random.Random"""
+    return "{}{}市{}町{}丁目{}番{}号".format(
+        r.choice(PREFECTURES),
+        r.choice(PLACES),
+        r.choice(PLACES),
+        r.randrange(1, 10),
+        r.randrange(1, 30),
+        r.randrange(1, 20),
+    )
+
+
+def documents(n, seed=0, script="ja", sentences=(3, 12)):
+    """
+    n documents as a list of (title, body).
+    script is "ja" or "mixed". each body has sentences[0] to sentences[1]
+    sentences, and the same arguments always give the same documents.
+    """
+    if script not in ("ja", "mixed"):
+        raise ValueError("unknown script: {!r}".format(script))
+    r = random.Random(seed)
+    low, high = sentences
+    docs = []
+    for _ in range(n):
+        title = _word(r, script) + _word(r, script)
+        body = "".join(sentence(r, script) for _ in range(r.randrange(low, high + 1)))
+        if r.random() < 0.2:
+            body += address(r)
+        docs.append((title, body))
+    return docs
+
+
+class BigramTokenizer(fts5.FTS5Tokenizer):
+    """
+    split text into runs of kanji, hiragana, katakana and other word
+    characters. CJK runs are split into bigrams(a run of 1 character is kept
+    as is), and the others are lower-cased.
+    it can be used for FTS3/4 and FTS5.
+    """
+
+    char_offsets = True
+    _p = re.compile(r"(?P<cjk>[一-鿿々]+|[ぁ-ゟ]+|[ァ-ヿ]+)|[^\W一-鿿々ぁ-ゟァ-ヿ]+")
+
+    def tokenize(self, text, flags=None):
+        for m in self._p.finditer(text):
+            s, e = m.span()
+            if not m.group("cjk"):
+                yield text[s:e].lower(), s, e
+            elif e - s == 1:
+                yield text[s:e], s, e
+            else:
+                for i in range(s, e - 1):
+                    yield text[i : i + 2], i, i + 2
+
+
+__all__ = ["documents", "sentence", "address", "BigramTokenizer"]
@@ -0,0 +1,24 @@
+import random
+from typing import Iterable, List, Optional, Tuple
+
+from . import fts5
+
+NOUNS: List[str]
+KATAKANA: List[str]
+VERBS: List[str]
+ADJECTIVES: List[str]
+PARTICLES: List[str]
+LATIN: List[str]
+PREFECTURES: List[str]
+PLACES: List[str]
+
+def sentence(r: random.Random, script: str = ...) -> str: ...
+def address(r: random.Random) -> str: ...
+def documents(
+    n: int, seed: int = ..., script: str = ..., sentences: Tuple[int, int] = ...
+) -> List[Tuple[str, str]]: ...
+
+class BigramTokenizer(fts5.FTS5Tokenizer):
+    def tokenize(
+        self, text: str, flags: Optional[int] = ...
+    ) -> Iterable[Tuple[str, int, int]]: ...
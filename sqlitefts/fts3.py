@@ -4,147 +4,352 @@ support library to write SQLite FTS3 tokenizer
 """
 import sqlite3
 import struct
+import threading
+import time
 
-from .tokenizer import SQLITE_DONE, SQLITE_OK, ffi
+from . import profiling as _profiling
+from . import tokenizer as _tokenizer
+from .batch import encode_tokens, iter_batch, tokenize_to_batch
+from .cache import _registrations
+from .chunked import SQLITE_TOOBIG, LimitExceeded
+from .stats import _RecordingCursor
+from .tokenizer import (
+    SQLITE_DONE,
+    SQLITE_ERROR,
+    SQLITE_OK,
+    callback,
+    input_buffer,
+    load_once,
+    tokenize_input,
+    _PerThread,
+)
 
 SQLITE_DBCONFIG_ENABLE_FTS3_TOKENIZER = 1004
 
-ffi.cdef(
-    """
-typedef struct sqlite3_tokenizer_module sqlite3_tokenizer_module;
-typedef struct sqlite3_tokenizer sqlite3_tokenizer;
-typedef struct sqlite3_tokenizer_cursor sqlite3_tokenizer_cursor;
-struct sqlite3_tokenizer_module {
-  int iVersion;
-  int (*xCreate)(int, const char*const*, sqlite3_tokenizer**);
-  int (*xDestroy)(sqlite3_tokenizer*);
-  int (*xOpen)(
-    sqlite3_tokenizer*, const char*, int, sqlite3_tokenizer_cursor**);
-  int (*xClose)(sqlite3_tokenizer_cursor*);
-  int (*xNext)(
-    sqlite3_tokenizer_cursor*, const char**, int*, int*, int*, int*);
-  int (*xLanguageid)(sqlite3_tokenizer_cursor*, int);
-};
-
-struct sqlite3_tokenizer {
-  const sqlite3_tokenizer_module *pModule;
-  void *t;
-};
-
-struct sqlite3_tokenizer_cursor {
-  sqlite3_tokenizer *pTokenizer;
-  void *tokens;
-  size_t pos;
-  size_t offset;
-};
-"""
-)
-
 
 class Tokenizer(object):
     """
     Tokenizer base class.
     """
 
+    char_offsets = False
+    """
+    if True, tokenize yields start/end positions in characters instead of
+    bytes, and they are converted to byte positions by this module.
+    """
+
     def tokenize(self, text):
         """
         Tokenize given unicode text. Yields each tokenized token,
         start position(in bytes), end positon(in bytes)
+
+        a list of tokens can be yielded instead of a token to add colocated
+        tokens(synonyms). they are placed at the same position.
+        a tokenizer can also implement tokenize_batch(text) to return all
+        tokens at once, or tokenize_bytes(data) to work on UTF-8 encoded
+        text. see sqlitefts.batch and sqlitefts.bytes_tokenizer
+        a tokenizer wrapping a native one implements xopen(pInput, nInput) to
+        return a cursor, and close() of it is called by xClose.
+        see sqlitefts.native
         """
         yield text, 0, len(text.encode("utf-8"))
 
 
+class _Cursor(object):
+    """
+    state of an opened cursor.
+    keeps the token returned by the last xNext alive until SQLite consumes it.
+    """
+
+    __slots__ = ("tokens", "token")
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.token = None
+
+    def next(self):
+        self.token = None
+        normalized, begin, end, tflags = next(self.tokens)
+        self.token = ffi.from_buffer(normalized)
+        return self.token, len(normalized), begin, end, tflags
+
+
+class _BatchCursor(object):
+    """
+    state of an opened cursor over a batch returned by tokenize_batch.
+    """
+
+    __slots__ = ("data", "tokens")
+
+    def __init__(self, batch):
+        self.data = ffi.from_buffer(batch[0])
+        self.tokens = iter_batch(batch)
+
+    def next(self):
+        b, e, begin, end, tflags = next(self.tokens)
+        while b == e:
+            b, e, begin, end, tflags = next(self.tokens)
+        return self.data + b, e - b, begin, end, tflags
+
+
+class _Instance(object):
+    """
+    a tokenizer instance with options of make_tokenizer_module.
+    tokenizer is None if a tokenizer is made for each thread.
+    cursors holds references of opened cursors to prevent GC. SQLite doesn't
+    call a tokenizer of a connection concurrently, so it needs no lock.
+    """
+
+    __slots__ = (
+        "tokenizer",
+        "local",
+        "streaming",
+        "cache",
+        "stats",
+        "slow_log",
+        "measured",
+        "chunked",
+        "scope",
+        "cursors",
+    )
+
+    def __init__(
+        self, tokenizer, local, streaming, cache, stats, slow_log, chunked, scope
+    ):
+        self.tokenizer = tokenizer
+        self.local = local
+        self.streaming = streaming
+        self.cache = cache
+        self.stats = stats
+        self.slow_log = slow_log
+        self.measured = stats is not None or slow_log is not None
+        self.chunked = chunked
+        self.scope = scope
+        self.cursors = {}
+
+    def get(self):
+        """the tokenizer of the current thread"""
+        if self.tokenizer is None:
+            return self.local.tokenizer
+        return self.tokenizer
+
+
+_lock = threading.Lock()
+"""lock for registries mutated by callbacks"""
+
+
+def _xopen(pTokenizer, pInput, nInput, ppCursor):
+    instance = ffi.from_handle(pTokenizer.t)
+    if nInput < 0:
+        # FTS3/4 passes NUL-terminated text, measure it only once
+        nInput = _tokenizer._libc.strlen(pInput)
+    measured = instance.measured or _profiling.active
+    if measured:
+        s = time.perf_counter()
+    cur = ffi.new("sqlite3_tokenizer_cursor *")
+    tokenizer = instance.tokenizer
+    if tokenizer is None:
+        tokenizer = instance.local.tokenizer
+    cache = instance.cache
+    # SQLite keeps the input until the cursor is closed
+    data = input_buffer(pInput, nInput)
+    if instance.chunked is not None:
+        state = _Cursor(encode_tokens(instance.chunked.tokens(tokenizer, data)))
+    elif cache is not None:
+        key = cache.key(data, None, instance.scope)
+        batch = cache.get(key)
+        if batch is None:
+            batch = tokenize_to_batch(tokenizer, data)
+            cache.put(key, batch)
+        state = _BatchCursor(batch)
+    elif getattr(tokenizer, "tokenize_batch", None) is not None:
+        state = _BatchCursor(tokenize_to_batch(tokenizer, data))
+    elif hasattr(tokenizer, "xopen"):
+        state = tokenizer.xopen(pInput, nInput)
+    else:
+        tokens = encode_tokens(tokenize_input(tokenizer, data))
+        if not instance.streaming:
+            tokens = iter(list(tokens))
+        state = _Cursor(tokens)
+    if measured:
+        state = _RecordingCursor(state, time.perf_counter() - s, len(data))
+        if instance.slow_log is not None:
+            # the input may not be valid when the cursor is closed
+            state.sample = bytes(data[: instance.slow_log.sample_bytes])
+    tknh = ffi.new_handle(state)
+    cur.pTokenizer = pTokenizer
+    cur.tokens = tknh
+    cur.pos = 0
+    cur.offset = 0
+    instance.cursors[cur] = tknh
+    ppCursor[0] = cur
+    return SQLITE_OK
+
+
+def _xnext(pCursor, ppToken, pnBytes, piStartOffset, piEndOffset, piPosition):
+    try:
+        cur = pCursor[0]
+        normalized, nBytes, inputBegin, inputEnd, tflags = ffi.from_handle(
+            cur.tokens
+        ).next()
+        ppToken[0] = normalized
+        pnBytes[0] = nBytes
+        piStartOffset[0] = inputBegin
+        piEndOffset[0] = inputEnd
+        cur.offset = inputEnd
+        if tflags and cur.pos:
+            # a colocated token shares the position with the previous one
+            piPosition[0] = cur.pos - 1
+        else:
+            piPosition[0] = cur.pos
+            cur.pos += 1
+    except StopIteration:
+        return SQLITE_DONE
+    except LimitExceeded:
+        return SQLITE_TOOBIG
+    return SQLITE_OK
+
+
+def _xclose(pCursor):
+    instance = ffi.from_handle(pCursor.pTokenizer.t)
+    on_close = getattr(instance.get(), "on_close", None)
+    if on_close and hasattr(on_close, "__call__"):
+        on_close()
+
+    state = ffi.from_handle(instance.cursors.pop(pCursor))
+    close = getattr(state, "close", None)
+    if close is not None:
+        # e.g. a native cursor, which must be closed before its tokenizer
+        close()
+    if instance.measured or _profiling.active:
+        if type(state) is _RecordingCursor:
+            if instance.stats is not None:
+                instance.stats.record("fts3", state.nbytes, state.tokens, state.seconds)
+            slow_log = instance.slow_log
+            if slow_log is not None and state.seconds >= slow_log.threshold:
+                slow_log.add(
+                    None, state.sample, state.nbytes, state.tokens, state.seconds
+                )
+            if _profiling.active:
+                # xOpen, xNext and xClose
+                _profiling.add(state.seconds, state.calls + 2)
+    return SQLITE_OK
+
+
+def _load():
+    """parse the declarations and make callbacks on the first use"""
+    global ffi
+
+    from . import _cdef
+
+    ffi = _tokenizer.load()
+    if _tokenizer.lib is None:
+        ffi.cdef(_cdef.FTS3)
+    xopen = callback(
+        "int(sqlite3_tokenizer*, const char *, int, sqlite3_tokenizer_cursor **)",
+        "_sqlitefts_fts3_xopen",
+        error=SQLITE_ERROR,
+    )(_xopen)
+    xclose = callback("int(sqlite3_tokenizer_cursor *)", "_sqlitefts_fts3_xclose")(
+        _xclose
+    )
+    xnext = callback(
+        "int(sqlite3_tokenizer_cursor*, const char **, int *, int *, int *, int *)",
+        "_sqlitefts_fts3_xnext",
+        error=SQLITE_ERROR,
+    )(_xnext)
+    return xopen, xclose, xnext
+
+
 tokenizer_modules = {}
 """hold references to prevent GC"""
 
 
-def make_tokenizer_module(tokenizer):
-    """tokenizer module"""
+def make_tokenizer_module(
+    tokenizer,
+    streaming=False,
+    cache=None,
+    per_thread=False,
+    stats=None,
+    slow_log=None,
+    chunked=None,
+):
+    """
+    tokenizer module
+
+    by default, all tokens of a document are collected when a cursor is opened.
+    if streaming is True, tokens are pulled from the tokenizer and encoded one
+    by one as SQLite consumes them, so that only the current token is kept.
+    if a TokenCache is given as cache, tokens are cached by input text and
+    the tokenizer is not called for the same text again. tokenizers made
+    with different arguments don't share cached tokens.
+    if per_thread is True, tokenizer must be a class or a function, and it is
+    called for each thread using the tokenizer. it is for tokenizers which
+    are not thread-safe.
+    if a TokenizerStats is given as stats, calls of the tokenizer are counted
+    and timed. see sqlitefts.stats
+    if a SlowLog is given as slow_log, slow calls of the tokenizer are
+    recorded to it. see sqlitefts.slowlog
+    if a Chunked is given as chunked, documents are tokenized in chunks with
+    its limits, and tokens are pulled one by one. see sqlitefts.chunked
+    """
+    if per_thread and not hasattr(tokenizer, "__call__"):
+        raise TypeError("per_thread requires a class or a function")
+    xopen, xclose, xnext = load_once("fts3", _load)
     tokenizers = {}
-    cursors = {}
+    registration = None if cache is None else next(_registrations)
 
-    @ffi.callback("int(int, const char *const*, sqlite3_tokenizer **)")
+    @ffi.callback(
+        "int(int, const char *const*, sqlite3_tokenizer **)", error=SQLITE_ERROR
+    )
     def xcreate(argc, argv, ppTokenizer):
+        local = None
+        scope = registration
         if hasattr(tokenizer, "__call__"):
             args = [ffi.string(x).decode("utf-8") for x in argv[0:argc]]
-            tk = tokenizer(args)
+            if per_thread:
+                tk, local = None, _PerThread(lambda: tokenizer(args))
+            else:
+                tk = tokenizer(args)
+            if cache is not None:
+                scope = (registration, tuple(args))
         else:
             tk = tokenizer
-        th = ffi.new_handle(tk)
+        th = ffi.new_handle(
+            _Instance(tk, local, streaming, cache, stats, slow_log, chunked, scope)
+        )
         tkn = ffi.new("sqlite3_tokenizer *")
         tkn.t = th
-        tokenizers[tkn] = th
+        with _lock:
+            tokenizers[tkn] = th
         ppTokenizer[0] = tkn
         return SQLITE_OK
 
     @ffi.callback("int(sqlite3_tokenizer *)")
     def xdestroy(pTokenizer):
         tkn = pTokenizer
-        del tokenizers[tkn]
-        return SQLITE_OK
-
-    @ffi.callback(
-        "int(sqlite3_tokenizer*, const char *, int, sqlite3_tokenizer_cursor **)"
-    )
-    def xopen(pTokenizer, pInput, nInput, ppCursor):
-        cur = ffi.new("sqlite3_tokenizer_cursor *")
-        tokenizer = ffi.from_handle(pTokenizer.t)
-        i = ffi.string(pInput, nInput).decode("utf-8")
-        tokens = [(n.encode("utf-8"), b, e) for n, b, e in tokenizer.tokenize(i) if n]
-        tknh = ffi.new_handle(iter(tokens))
-        cur.pTokenizer = pTokenizer
-        cur.tokens = tknh
-        cur.pos = 0
-        cur.offset = 0
-        cursors[cur] = tknh
-        ppCursor[0] = cur
-        return SQLITE_OK
-
-    @ffi.callback(
-        "int(sqlite3_tokenizer_cursor*, const char **, int *, int *, int *, int *)"
-    )
-    def xnext(pCursor, ppToken, pnBytes, piStartOffset, piEndOffset, piPosition):
-        try:
-            cur = pCursor[0]
-            tokens = ffi.from_handle(cur.tokens)
-            normalized, inputBegin, inputEnd = next(tokens)
-            ppToken[0] = ffi.from_buffer(normalized)
-            pnBytes[0] = len(normalized)
-            piStartOffset[0] = inputBegin
-            piEndOffset[0] = inputEnd
-            cur.offset = inputEnd
-            piPosition[0] = cur.pos
-            cur.pos += 1
-        except StopIteration:
-            return SQLITE_DONE
-        return SQLITE_OK
-
-    @ffi.callback("int(sqlite3_tokenizer_cursor *)")
-    def xclose(pCursor):
-        tk = ffi.from_handle(pCursor.pTokenizer.t)
-        on_close = getattr(tk, "on_close", None)
-        if on_close and hasattr(on_close, "__call__"):
-            on_close()
-
-        del cursors[pCursor]
+        with _lock:
+            del tokenizers[tkn]
         return SQLITE_OK
 
     tokenizer_module = ffi.new(
         "sqlite3_tokenizer_module*", [0, xcreate, xdestroy, xopen, xclose, xnext]
     )
-    tokenizer_modules[tokenizer] = (
-        tokenizer_module,
-        xcreate,
-        xdestroy,
-        xopen,
-        xclose,
-        xnext,
-    )
+    with _lock:
+        tokenizer_modules[tokenizer] = (tokenizer_module, xcreate, xdestroy)
     return tokenizer_module
 
 
+def __getattr__(name):
+    if name == "ffi":
+        load_once("fts3", _load)
+        return ffi
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
 def register_tokenizer(conn, name, tokenizer_module):
     """register tokenizer module with SQLite connection."""
+    load_once("fts3", _load)
     module_addr = int(ffi.cast("uintptr_t", tokenizer_module))
     address_blob = sqlite3.Binary(struct.pack("P", module_addr))
     cur = conn.cursor()
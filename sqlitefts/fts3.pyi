@@ -1,14 +1,28 @@
 import sqlite3
-from typing import Any, Iterator, List, Tuple, Union
+from typing import Any, Iterator, List, Optional, Tuple, Union
 
 import apsw  # type: ignore
 
+from .cache import TokenCache
+from .chunked import Chunked
+from .slowlog import SlowLog
+from .stats import TokenizerStats
+
 TokenizerModule = Any
 
 class Tokenizer:
+    char_offsets: bool
     def tokenize(self, text: str) -> Iterator[Tuple[str, int, int]]: ...
 
-def make_tokenizer_module(tokenizer: Tokenizer) -> TokenizerModule: ...
+def make_tokenizer_module(
+    tokenizer: Tokenizer,
+    streaming: bool = ...,
+    cache: Optional[TokenCache] = ...,
+    per_thread: bool = ...,
+    stats: Optional[TokenizerStats] = ...,
+    slow_log: Optional[SlowLog] = ...,
+    chunked: Optional[Chunked] = ...,
+) -> TokenizerModule: ...
 def register_tokenizer(
     conn: Union[sqlite3.Connection, apsw.Connection],
     name: str,
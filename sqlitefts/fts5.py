@@ -3,100 +3,34 @@
 support library to write SQLite FTS5 tokenizer
 """
 import struct
-
+import threading
+import time
+
+from . import profiling as _profiling
+from . import tokenizer as _tokenizer
+from .batch import iter_batch, tokenize_to_batch
+from .cache import _registrations
+from .chunked import SQLITE_TOOBIG, LimitExceeded
 from .error import Error
-from .tokenizer import SQLITE_OK, dll, ffi, get_db_from_connection
+from .stats import _Recorder, kind_of
+from .tokenizer import (
+    SQLITE_ERROR,
+    SQLITE_OK,
+    callback,
+    get_db_from_connection,
+    input_buffer,
+    load_once,
+    tokenize_input,
+    _PerThread,
+)
 
 FTS5_TOKENIZE_QUERY = 0x0001
 FTS5_TOKENIZE_PREFIX = 0x0002
 FTS5_TOKENIZE_DOCUMENT = 0x0004
 FTS5_TOKENIZE_AUX = 0x0008
 FTS5_TOKEN_COLOCATED = 0x0001
+_FTS5_TOKENIZE_QUERIES = FTS5_TOKENIZE_QUERY | FTS5_TOKENIZE_PREFIX
 SQLITE_ROW = 100
-FTS5_API_PTR = ffi.new("const char[]", b"fts5_api_ptr")
-
-ffi.cdef(
-    """
-typedef struct sqlite3_context sqlite3_context;
-typedef struct sqlite3_stmt sqlite3_stmt;
-typedef struct Mem sqlite3_value;
-typedef uint64_t sqlite3_int64;
-
-void sqlite3_result_text(sqlite3_context*, const char*, int, void(*)(void*));
-void sqlite3_result_error_code(sqlite3_context*, int);
-void sqlite3_result_error(sqlite3_context*, const char*, int);
-const unsigned char *sqlite3_value_text(sqlite3_value*);
-int sqlite3_value_int(sqlite3_value*);
-int sqlite3_prepare_v2(sqlite3*, const char*, int, sqlite3_stmt**, const char**);
-int sqlite3_prepare(sqlite3*, const char*, int, sqlite3_stmt**, const char**);
-int sqlite3_bind_pointer(sqlite3_stmt*, int, void*, const char*, void(*)(void*));
-int sqlite3_step(sqlite3_stmt*);
-int sqlite3_finalize(sqlite3_stmt*);
-int sqlite3_errcode(sqlite3 *db);
-int sqlite3_extended_errcode(sqlite3 *db);
-const char *sqlite3_errmsg(sqlite3*);
-const void *sqlite3_errmsg16(sqlite3*);
-const char *sqlite3_errstr(int);
-
-typedef struct fts5_api fts5_api;
-typedef struct fts5_tokenizer fts5_tokenizer;
-typedef struct Fts5Tokenizer Fts5Tokenizer;
-typedef struct Fts5ExtensionApi Fts5ExtensionApi;
-typedef struct Fts5Context Fts5Context;
-typedef struct Fts5PhraseIter Fts5PhraseIter;
-typedef void (*fts5_extension_function)(
-  const Fts5ExtensionApi*, Fts5Context*,
-  sqlite3_context*, int, sqlite3_value**);
-
-struct fts5_api {
-  int iVersion;
-  int (*xCreateTokenizer)(
-    fts5_api*, const char*, void*,
-    fts5_tokenizer*, void (*xDestroy)(void*));
-  int (*xFindTokenizer)(
-    fts5_api*, const char*, void**, fts5_tokenizer*);
-  int (*xCreateFunction)(
-    fts5_api*, const char*, void*,
-    fts5_extension_function, void (*xDestroy)(void*));
-};
-
-struct fts5_tokenizer {
-  int (*xCreate)(void*, const char**, int, Fts5Tokenizer**);
-  void (*xDelete)(Fts5Tokenizer*);
-  int (*xTokenize)(
-    Fts5Tokenizer*, void*, int, const char*, int,
-    int (*xToken)(
-        void*, int, const char*, int, int, int));
-};
-
-struct Fts5ExtensionApi {
-  int iVersion;
-  void *(*xUserData)(Fts5Context*);
-  int (*xColumnCount)(Fts5Context*);
-  int (*xRowCount)(Fts5Context*, sqlite3_int64*);
-  int (*xColumnTotalSize)(Fts5Context*, int, sqlite3_int64*);
-  int (*xTokenize)(
-    Fts5Context*, const char*, int, void*,
-    int (*xToken)(void*, int, const char*, int, int, int));
-  int (*xPhraseCount)(Fts5Context*);
-  int (*xPhraseSize)(Fts5Context*, int);
-  int (*xInstCount)(Fts5Context*, int*);
-  int (*xInst)(Fts5Context*, int, int*, int*, int*);
-  sqlite3_int64 (*xRowid)(Fts5Context*);
-  int (*xColumnText)(Fts5Context*, int, const char**, int*);
-  int (*xColumnSize)(Fts5Context*, int, int*);
-  int (*xQueryPhrase)(Fts5Context*, int, void*,
-    int(*)(const Fts5ExtensionApi*, Fts5Context*, void*)
-  );
-  int (*xSetAuxdata)(Fts5Context*, void*, void(*xDelete)(void*));
-  void *(*xGetAuxdata)(Fts5Context*, int);
-  int (*xPhraseFirst)(Fts5Context*, int, Fts5PhraseIter*, int*, int*);
-  void (*xPhraseNext)(Fts5Context*, Fts5PhraseIter*, int*, int*);
-  int (*xPhraseFirstColumn)(Fts5Context*, int, Fts5PhraseIter*, int*);
-  void (*xPhraseNextColumn)(Fts5Context*, Fts5PhraseIter*, int*);
-};
-"""
-)
 
 
 class FTS5Tokenizer(object):
@@ -104,6 +38,12 @@ class FTS5Tokenizer(object):
     Tokenizer base class for FTS5.
     """
 
+    char_offsets = False
+    """
+    if True, tokenize yields start/end positions in characters instead of
+    bytes, and they are converted to byte positions by this module.
+    """
+
     def tokenize(self, text, flags):
         """
         Tokenize given unicode text. Yields each tokenized token,
@@ -112,6 +52,17 @@ class FTS5Tokenizer(object):
         flags will be set if a FTS5 tokenizer is used for FTS5 table.
         a FTS5 tokenizer can be used for FTS3/4 table as well, but
         flags will not be set.
+
+        a list of tokens can be yielded instead of a token to add colocated
+        tokens(synonyms). the first one is the primary token, and the others
+        are passed with FTS5_TOKEN_COLOCATED.
+
+        a tokenizer can also implement tokenize_batch(text, flags) to return
+        all tokens at once, or tokenize_bytes(data, flags) to work on UTF-8
+        encoded text. see sqlitefts.batch and sqlitefts.bytes_tokenizer
+        a tokenizer wrapping a native one implements
+        xtokenize(pCtx, flags, pText, nText, xToken) to call xToken directly.
+        see sqlitefts.native
         """
         yield text, 0, len(text.encode("utf-8"))
 
@@ -123,6 +74,7 @@ class FTS3TokenizerAdaptor(FTS5Tokenizer):
 
     def __init__(self, fts3tokenizer):
         self.fts3tokenizer = fts3tokenizer
+        self.char_offsets = getattr(fts3tokenizer, "char_offsets", False)
 
     def tokenize(self, text, flags):
         return self.fts3tokenizer.tokenize(text)
@@ -132,51 +84,97 @@ fts5_tokenizers = {}
 """hold references to prevent GC"""
 registred_fts5_tokenizers = {}
 """hold references to prevent GC"""
+_lock = threading.Lock()
+"""lock for registries mutated by callbacks"""
+
+
+_fts5_apis = {}
+"""fts5_api of each database, keyed by address of sqlite3"""
+
+_FTS5_API_HOLDER = b"sqlitefts_fts5_api"
+"""
+name of an auxiliary function registered to know when a database is closed.
+it just returns an error.
+"""
+
+
+def _forget_fts5_api(pUserData):
+    with _lock:
+        _fts5_apis.pop(int(ffi.cast("uintptr_t", pUserData)), None)
+
+
+def _fts5_api_holder(pApi, pFts, pCtx, nVal, apVal):
+    dll.sqlite3_result_error_code(pCtx, SQLITE_ERROR)
 
 
 def fts5_api_from_db(c):
+    """
+    get fts5_api of SQLite connection.
+    it is cached until the connection is closed.
+    """
+    load()
+    db = get_db_from_connection(c)
+    key = int(ffi.cast("uintptr_t", db))
+    cached = _fts5_apis.get(key)
+    if cached is not None:
+        return cached
     if not hasattr(c, "commit"):
         # APSW doesn't have conn.commit/rollback
         import apsw
 
         if apsw.using_amalgamation:
             raise Error("unable to get fts5_api")
-    cur = c.cursor()
-    try:
-        cur.execute("SELECT sqlite_version()")
-        ver = tuple(int(x) for x in cur.fetchone()[0].split("."))
-        if ver < (3, 20, 0):
+    if _libversion < 3020000:
+        cur = c.cursor()
+        try:
             cur.execute("SELECT fts5()")
             blob = cur.fetchone()[0]
             pRet = ffi.cast("fts5_api*", struct.unpack("P", blob)[0])
-        else:
-            db = get_db_from_connection(c)
-            pRet = ffi.new("fts5_api**")
-            pStmt = ffi.new("sqlite3_stmt**")
-            rc = dll.sqlite3_prepare_v2(db, b"SELECT fts5(?1)", -1, pStmt, ffi.NULL)
-            if rc == SQLITE_OK:
-                r = dll.sqlite3_bind_pointer(pStmt[0], 1, pRet, FTS5_API_PTR, ffi.NULL)
-                if r != SQLITE_OK or dll.sqlite3_step(pStmt[0]) != SQLITE_ROW:
-                    pRet = None
-                else:
-                    pRet = pRet[0]
-            else:
-                raise Error(
-                    "unable to get fts5_api(new). rc={}/{}".format(
-                        rc, ffi.string(dll.sqlite3_errmsg(db)).decode("utf-8")
-                    )
-                )
-            dll.sqlite3_finalize(pStmt[0])
-    finally:
-        cur.close()
+        finally:
+            cur.close()
+    else:
+        pRet = _fts5_api_ptr(db)
+    if pRet is not None and key:
+        _hold_fts5_api(key, pRet)
     return pRet
 
 
-def register_tokenizer(c, name, tokenizer, context=None, on_destroy=None):
-    """
-    register a tokenizer to SQLite connection
-    """
-    fts5api = fts5_api_from_db(c)
+def _fts5_api_ptr(db):
+    """get fts5_api of sqlite3* by sqlite3_bind_pointer(SQLite 3.20.0+)"""
+    pRet = ffi.new("fts5_api**")
+    pStmt = ffi.new("sqlite3_stmt**")
+    rc = dll.sqlite3_prepare_v2(db, b"SELECT fts5(?1)", -1, pStmt, ffi.NULL)
+    if rc != SQLITE_OK:
+        raise Error(
+            "unable to get fts5_api(new). rc={}/{}".format(
+                rc, ffi.string(dll.sqlite3_errmsg(db)).decode("utf-8")
+            )
+        )
+    r = dll.sqlite3_bind_pointer(pStmt[0], 1, pRet, FTS5_API_PTR, ffi.NULL)
+    if r != SQLITE_OK or dll.sqlite3_step(pStmt[0]) != SQLITE_ROW:
+        pRet = None
+    else:
+        pRet = pRet[0]
+    dll.sqlite3_finalize(pStmt[0])
+    return pRet
+
+
+def _hold_fts5_api(key, pRet):
+    """cache fts5_api until the database is closed"""
+    # FTS5 calls xDestroy of auxiliary functions when the database is closed
+    r = pRet.xCreateFunction(
+        pRet,
+        _FTS5_API_HOLDER,
+        ffi.cast("void *", key),
+        _api_holder[0],
+        _api_holder[1],
+    )
+    if r == SQLITE_OK:
+        with _lock:
+            _fts5_apis[key] = pRet
+
+
+def _create_tokenizer(fts5api, name, tokenizer, context, on_destroy):
     pContext = ffi.new_handle(context) if context is not None else ffi.NULL
     if on_destroy is None:
         xDestroy = ffi.NULL
@@ -191,69 +189,322 @@ def register_tokenizer(c, name, tokenizer, context=None, on_destroy=None):
     r = fts5api.xCreateTokenizer(
         fts5api, name.encode("utf-8"), pContext, tokenizer, xDestroy
     )
-    registred_fts5_tokenizers[name] = (tokenizer, pContext, xDestroy)
+    with _lock:
+        registred_fts5_tokenizers[name] = (tokenizer, pContext, xDestroy)
     return r == SQLITE_OK
 
 
-def make_fts5_tokenizer(tokenizer):
+def register_tokenizer(c, name, tokenizer, context=None, on_destroy=None):
+    """
+    register a tokenizer to SQLite connection
+    """
+    fts5api = fts5_api_from_db(c)
+    return _create_tokenizer(fts5api, name, tokenizer, context, on_destroy)
+
+
+def register_all(c, tokenizers=(), aux_functions=()):
+    """
+    register tokenizers and auxiliary functions to SQLite connection at once.
+    tokenizers is a dict(or pairs) of name and a tokenizer made by
+    make_fts5_tokenizer, and aux_functions is a dict(or pairs) of name and
+    an auxiliary function, e.g. fts5_aux.aux_tokenize.
+    auxiliary functions are registered with ref_ctrl=True.
+    returns True if all of them are registered.
+    """
+    fts5api = fts5_api_from_db(c)
+    ok = True
+    for name, tokenizer in dict(tokenizers).items():
+        ok = _create_tokenizer(fts5api, name, tokenizer, None, None) and ok
+    if aux_functions:
+        from .fts5_aux import _create_function
+
+        for name, f in dict(aux_functions).items():
+            ok = _create_function(fts5api, c, name, f, True) == SQLITE_OK and ok
+    return ok
+
+
+def _emit_batch(batch, pCtx, xToken):
+    """pass tokens in a batch returned by tokenize_batch to xToken"""
+    p = ffi.from_buffer(batch[0])
+    for b, e, begin, end, tflags in iter_batch(batch):
+        if b == e:
+            continue
+        r = xToken(pCtx, tflags, p + b, e - b, begin, end)
+        if r != SQLITE_OK:
+            return r
+    return SQLITE_OK
+
+
+def _emit_colocated(tokens, begin, end, pCtx, xToken):
+    """pass a list of colocated tokens to xToken"""
+    tflags = 0
+    for normalized in tokens:
+        if isinstance(normalized, str):
+            normalized = normalized.encode("utf-8")
+        if not normalized:
+            continue
+        r = xToken(
+            pCtx, tflags, ffi.from_buffer(normalized), len(normalized), begin, end
+        )
+        if r != SQLITE_OK:
+            return r
+        tflags = FTS5_TOKEN_COLOCATED
+    return SQLITE_OK
+
+
+class _Instance(object):
+    """
+    a tokenizer instance with options of make_fts5_tokenizer.
+    tokenizer is None if a tokenizer is made for each thread, and made has
+    tokenizers made for threads.
+    """
+
+    __slots__ = (
+        "tokenizer",
+        "local",
+        "made",
+        "cache",
+        "query_cache",
+        "stats",
+        "slow_log",
+        "measured",
+        "chunked",
+        "scope",
+    )
+
+    def __init__(
+        self,
+        tokenizer,
+        local,
+        made,
+        cache,
+        query_cache,
+        stats,
+        slow_log,
+        chunked,
+        scope,
+    ):
+        self.tokenizer = tokenizer
+        self.local = local
+        self.made = made
+        self.cache = cache
+        self.query_cache = query_cache
+        self.stats = stats
+        self.slow_log = slow_log
+        self.measured = stats is not None or slow_log is not None
+        self.chunked = chunked
+        self.scope = scope
+
+    def all(self):
+        """all tokenizers of this instance"""
+        if self.tokenizer is None:
+            return list(self.made)
+        return [self.tokenizer]
+
+
+def _xtokenize(pTokenizer, pCtx, flags, pText, nText, xToken):
+    instance = ffi.from_handle(ffi.cast("void *", pTokenizer))
+    if (instance.measured or _profiling.active) and type(xToken) is not _Recorder:
+        return _xtokenize_measured(
+            instance, pTokenizer, pCtx, flags, pText, nText, xToken
+        )
+    tokenizer = instance.tokenizer
+    if tokenizer is None:
+        tokenizer = instance.local.tokenizer
+    if instance.chunked is not None:
+        tokens = instance.chunked.tokens(tokenizer, input_buffer(pText, nText), flags)
+        try:
+            return _emit_tokens(tokens, pCtx, xToken)
+        except LimitExceeded:
+            return SQLITE_TOOBIG
+    c = instance.cache
+    if instance.query_cache is not None and flags & _FTS5_TOKENIZE_QUERIES:
+        c = instance.query_cache
+    if c is not None:
+        data = input_buffer(pText, nText)
+        key = c.key(data, flags, instance.scope)
+        batch = c.get(key)
+        if batch is None:
+            batch = tokenize_to_batch(tokenizer, data, flags)
+            c.put(key, batch)
+        return _emit_batch(batch, pCtx, xToken)
+    xtokenize = getattr(tokenizer, "xtokenize", None)
+    if xtokenize is not None:
+        return xtokenize(pCtx, flags, pText, nText, xToken)
+    data = input_buffer(pText, nText)
+    if getattr(tokenizer, "tokenize_batch", None) is not None:
+        return _emit_batch(tokenize_to_batch(tokenizer, data, flags), pCtx, xToken)
+    return _emit_tokens(tokenize_input(tokenizer, data, flags), pCtx, xToken)
+
+
+def _emit_tokens(tokens, pCtx, xToken):
+    """pass tokens yielded by a tokenizer to xToken"""
+    for normalized, begin, end in tokens:
+        if isinstance(normalized, str):
+            normalized = normalized.encode("utf-8")
+        elif isinstance(normalized, (list, tuple)):
+            r = _emit_colocated(normalized, begin, end, pCtx, xToken)
+            if r != SQLITE_OK:
+                return r
+            continue
+        if not normalized:
+            continue
+
+        r = xToken(pCtx, 0, ffi.from_buffer(normalized), len(normalized), begin, end)
+        if r != SQLITE_OK:
+            return r
+    return SQLITE_OK
+
+
+def _xtokenize_measured(instance, pTokenizer, pCtx, flags, pText, nText, xToken):
+    """
+    call _xtokenize again with xToken wrapped, and record the call to stats,
+    the slow log and the profiler
+    """
+    recorder = _Recorder(xToken)
+    s = time.perf_counter()
+    r = _xtokenize(pTokenizer, pCtx, flags, pText, nText, recorder)
+    seconds = time.perf_counter() - s
+    stats = instance.stats
+    slow_log = instance.slow_log
+    if stats is not None or slow_log is not None:
+        data = input_buffer(pText, nText)
+        if stats is not None:
+            kind = kind_of(flags)
+            stats.record(kind, len(data), recorder.tokens, seconds, recorder.seconds)
+        if slow_log is not None and seconds >= slow_log.threshold:
+            slow_log.add(flags, data, len(data), recorder.tokens, seconds)
+    if _profiling.active:
+        _profiling.add(seconds - recorder.seconds)
+    return r
+
+
+def _load():
+    """parse the declarations and make callbacks on the first use"""
+    global ffi, dll, FTS5_API_PTR, _api_holder, _libversion
+
+    from . import _cdef
+
+    ffi = _tokenizer.load()
+    dll = _tokenizer.dll
+    if _tokenizer.lib is None:
+        ffi.cdef(_cdef.FTS5_TYPES + _cdef.FTS5_FUNCTIONS)
+    FTS5_API_PTR = ffi.new("const char[]", b"fts5_api_ptr")
+    _libversion = dll.sqlite3_libversion_number()
+    _api_holder = (
+        ffi.callback("fts5_extension_function", _fts5_api_holder),
+        ffi.callback("void(void*)", _forget_fts5_api),
+    )
+    return callback(
+        "int(Fts5Tokenizer *, void *, int, const char *, int, "
+        "int(void*, int, const char *, int, int, int))",
+        "_sqlitefts_fts5_xtokenize",
+        error=SQLITE_ERROR,
+    )(_xtokenize)
+
+
+def load():
+    """
+    load the FTS5 declarations. it is done when a FTS5 tokenizer is made or
+    registered first.
+    """
+    load_once("fts5", _load)
+
+
+def __getattr__(name):
+    if name in ("ffi", "dll", "FTS5_API_PTR"):
+        load()
+        return globals()[name]
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def make_fts5_tokenizer(
+    tokenizer,
+    cache=None,
+    query_cache=None,
+    per_thread=False,
+    stats=None,
+    slow_log=None,
+    chunked=None,
+):
     """
     make a FTS5 tokenizer using given tokenizer.
     tokenizer can be an instance of Tokenizer or a Tokenizer class or
     a method to get an instance of tokenizer.
     if a class is given, an instance of the class will be created as needed.
+    if a TokenCache is given as cache, tokens are cached by input text and
+    flags, and the tokenizer is not called for the same text again.
+    tokenizers made with different arguments don't share cached tokens.
+    if a QueryCache is given as query_cache, it is used instead of cache for
+    query strings(FTS5_TOKENIZE_QUERY/FTS5_TOKENIZE_PREFIX), scoped in the
+    same way.
+    if per_thread is True, tokenizer must be a class or a function, and it is
+    called for each thread using the tokenizer. it is for tokenizers which
+    are not thread-safe.
+    if a TokenizerStats is given as stats, calls of the tokenizer are counted
+    and timed. see sqlitefts.stats
+    if a SlowLog is given as slow_log, slow calls of the tokenizer are
+    recorded to it. see sqlitefts.slowlog
+    if a Chunked is given as chunked, documents are tokenized in chunks with
+    its limits. see sqlitefts.chunked
     """
+    if per_thread and not hasattr(tokenizer, "__call__"):
+        raise TypeError("per_thread requires a class or a function")
+    xtokenize = load_once("fts5", _load)
     tokenizers = set()
+    cached = cache is not None or query_cache is not None
+    registration = next(_registrations) if cached else None
 
-    @ffi.callback("int(void*, const char **, int, Fts5Tokenizer **)")
+    @ffi.callback(
+        "int(void*, const char **, int, Fts5Tokenizer **)", error=SQLITE_ERROR
+    )
     def xcreate(ctx, argv, argc, ppOut):
+        local = made = None
+        scope = registration
         if hasattr(tokenizer, "__call__"):
             args = [ffi.string(x).decode("utf-8") for x in argv[0:argc]]
-            tk = tokenizer(ffi.from_handle(ctx), args)
+            context = ffi.from_handle(ctx) if ctx else None
+            if per_thread:
+                made = []
+                tk = None
+                local = _PerThread(lambda: tokenizer(context, args), made)
+            else:
+                tk = tokenizer(context, args)
+            if cached:
+                # the context is kept while the tokenizer is registered
+                scope = (registration, id(context), tuple(args))
         else:
             tk = tokenizer
-        th = ffi.new_handle(tk)
+        instance = _Instance(
+            tk, local, made, cache, query_cache, stats, slow_log, chunked, scope
+        )
+        th = ffi.new_handle(instance)
         tkn = ffi.cast("Fts5Tokenizer *", th)
-        tokenizers.add(th)
+        with _lock:
+            tokenizers.add(th)
         ppOut[0] = tkn
         return SQLITE_OK
 
     @ffi.callback("void(Fts5Tokenizer *)")
     def xdelete(pTokenizer):
         th = ffi.cast("void *", pTokenizer)
-        tk = ffi.from_handle(th)
-        on_delete = getattr(tk, "on_delete", None)
-        if on_delete and hasattr(on_delete, "__call__"):
-            on_delete()
+        for tk in ffi.from_handle(th).all():
+            on_delete = getattr(tk, "on_delete", None)
+            if on_delete and hasattr(on_delete, "__call__"):
+                on_delete()
 
-        tokenizers.remove(th)
+        with _lock:
+            tokenizers.remove(th)
         return None
 
-    @ffi.callback(
-        "int(Fts5Tokenizer *, void *, int, const char *, int, "
-        "int(void*, int, const char *, int, int, int))"
-    )
-    def xtokenize(pTokenizer, pCtx, flags, pText, nText, xToken):
-        tokenizer = ffi.from_handle(ffi.cast("void *", pTokenizer))
-        text = ffi.string(pText[0:nText]).decode("utf-8")
-        for normalized, begin, end in tokenizer.tokenize(text, flags):
-            normalized = normalized.encode("utf-8")
-            if not normalized:
-                continue
-
-            # TODO: Synonym Support
-            r = xToken(
-                pCtx, 0, ffi.from_buffer(normalized), len(normalized), begin, end
-            )
-            if r != SQLITE_OK:
-                return r
-        return SQLITE_OK
-
     fts5_tokenizer = ffi.new("fts5_tokenizer *", [xcreate, xdelete, xtokenize])
-    fts5_tokenizers[tokenizer] = (fts5_tokenizer, xcreate, xdelete, xtokenize)
+    with _lock:
+        fts5_tokenizers[tokenizer] = (fts5_tokenizer, xcreate, xdelete)
     return fts5_tokenizer
 
 
 __all__ = [
+    "register_all",
     "register_tokenizer",
     "make_fts5_tokenizer",
     "FTS5Tokenizer",
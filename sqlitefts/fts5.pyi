@@ -1,8 +1,13 @@
 import sqlite3
-from typing import Any, Callable, Iterable, Optional, Tuple, Union
+from typing import Any, Callable, Iterable, Mapping, Optional, Tuple, Union
 
 import apsw  # type: ignore
 
+from .cache import QueryCache, TokenCache
+from .chunked import Chunked
+from .slowlog import SlowLog
+from .stats import TokenizerStats
+
 from .fts3 import Tokenizer as FTS3Tokenizer
 
 FTS5TokenizerHandle = Any
@@ -12,7 +17,10 @@ FTS5_TOKENIZE_DOCUMENT: int
 FTS5_TOKENIZE_AUX: int
 FTS5_TOKEN_COLOCATED: int
 
+def load() -> None: ...
+
 class FTS5Tokenizer:
+    char_offsets: bool
     def tokenize(
         self, text: str, flags: int = ...
     ) -> Iterable[Tuple[str, int, int]]: ...
@@ -31,6 +39,17 @@ def register_tokenizer(
     context: Any = ...,
     on_destroy: Optional[Callable[[Any], None]] = ...,
 ) -> bool: ...
+def register_all(
+    c: Union[sqlite3.Connection, apsw.Connection],
+    tokenizers: Union[Mapping[str, FTS5TokenizerHandle], Iterable[Tuple[str, FTS5TokenizerHandle]]] = ...,
+    aux_functions: Union[Mapping[str, Any], Iterable[Tuple[str, Any]]] = ...,
+) -> bool: ...
 def make_fts5_tokenizer(
-    tokenizer: Union[FTS5Tokenizer, Callable[[], FTS5Tokenizer]]
+    tokenizer: Union[FTS5Tokenizer, Callable[[], FTS5Tokenizer]],
+    cache: Optional[TokenCache] = ...,
+    query_cache: Optional[QueryCache] = ...,
+    per_thread: bool = ...,
+    stats: Optional[TokenizerStats] = ...,
+    slow_log: Optional[SlowLog] = ...,
+    chunked: Optional[Chunked] = ...,
 ) -> FTS5TokenizerHandle: ...
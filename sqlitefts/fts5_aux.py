@@ -1,26 +1,46 @@
-from .fts5 import dll, ffi, fts5_api_from_db
-from .tokenizer import SQLITE_OK
+import time
 
-SQLITE_TRANSIENT = ffi.cast("void(*)(void*)", -1)
+from . import fts5
+from . import profiling as _profiling
+from .fts5 import fts5_api_from_db
+from .tokenizer import SQLITE_OK, callback, load_once
 
 _aux_funcs_holder = {}
 """holding references of aux funcs to prevent GC"""
 
 
-@ffi.callback(
-    "void(const Fts5ExtensionApi*, Fts5Context*,"
-    "sqlite3_context*, int, sqlite3_value**)"
-)
-def aux_tokenize(pApi, pFts, pCtx, nVal, apVal):
+def _token(pCtx, tflags, pToken, nToken, iStart, iEnd):
+    ffi.from_handle(pCtx).append(ffi.string(pToken[0:nToken]))
+    return SQLITE_OK
+
+
+def _aux_tokenize(pApi, pFts, pCtx, nVal, apVal):
     """ FTS5 AUX function to tokenize a column.
 
     this function is a callback function, thus it should not be called directly
     """
+    if not _profiling.active:
+        _tokenize_column(pApi, pFts, pCtx, nVal, apVal)
+        return
+    running = _profiling.current()
+    nested = running.python_seconds if running else 0.0
+    s = time.perf_counter()
+    ntokens = _tokenize_column(pApi, pFts, pCtx, nVal, apVal)
+    seconds = time.perf_counter() - s
+    if running is not None:
+        # a tokenizer written in Python has added its time already
+        seconds -= running.python_seconds - nested
+    # the function and a callback for each token
+    _profiling.add(seconds, 1 + ntokens)
+
+
+def _tokenize_column(pApi, pFts, pCtx, nVal, apVal):
+    """tokenize a column, and return the number of tokens"""
     if nVal != 1:
         dll.sqlite3_result_error(
             pCtx, ffi.new("char[]", "this function accepts only 1 argument")
         )
-        return
+        return 0
 
     col = dll.sqlite3_value_int(apVal[0])
     pz = ffi.new("char**")
@@ -28,22 +48,42 @@ def aux_tokenize(pApi, pFts, pCtx, nVal, apVal):
     rc = pApi.xColumnText(pFts, col, pz, pn)
     if rc != SQLITE_OK:
         dll.sqlite3_result_error_code(pCtx, rc)
-        return
+        return 0
 
     tokens = []
-
-    @ffi.callback("int(void*, int, const char*, int, int, int)")
-    def token(pCtx, tflags, pToken, nToken, iStart, iEnd):
-        tokens.append(ffi.string(pToken[0:nToken]))
-        return SQLITE_OK
-
-    rc = pApi.xTokenize(pFts, pz[0], pn[0], ffi.NULL, token)
+    rc = pApi.xTokenize(pFts, pz[0], pn[0], ffi.new_handle(tokens), token)
     if rc == SQLITE_OK:
         dll.sqlite3_result_text(
             pCtx, ffi.new("char []", b", ".join(tokens)), -1, SQLITE_TRANSIENT
         )
     else:
         dll.sqlite3_result_error_code(pCtx, rc)
+    return len(tokens)
+
+
+def _load():
+    """make callbacks on the first use"""
+    global ffi, dll, SQLITE_TRANSIENT, token, aux_tokenize
+    fts5.load()
+    ffi = fts5.ffi
+    dll = fts5.dll
+    SQLITE_TRANSIENT = ffi.cast("void(*)(void*)", -1)
+    token = callback(
+        "int(void*, int, const char*, int, int, int)", "_sqlitefts_fts5_aux_token"
+    )(_token)
+    aux_tokenize = callback(
+        "void(const Fts5ExtensionApi*, Fts5Context*,"
+        "sqlite3_context*, int, sqlite3_value**)",
+        "_sqlitefts_fts5_aux_tokenize",
+    )(_aux_tokenize)
+    return aux_tokenize
+
+
+def __getattr__(name):
+    if name in ("ffi", "dll", "SQLITE_TRANSIENT", "aux_tokenize"):
+        load_once("fts5_aux", _load)
+        return globals()[name]
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 def register_aux_function(con, name, f, ref_ctrl=True):
@@ -54,7 +94,11 @@ def register_aux_function(con, name, f, ref_ctrl=True):
     If ref_ctrl is True, the connection must be closed explicitly.
     """
     fts5api = fts5_api_from_db(con)
+    return _create_function(fts5api, con, name, f, ref_ctrl)
+
 
+def _create_function(fts5api, con, name, f, ref_ctrl):
+    load_once("fts5_aux", _load)
     if ref_ctrl:
 
         @ffi.callback("void(void*)")
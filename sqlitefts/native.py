@@ -0,0 +1,426 @@
+# coding: utf-8
+"""
+tokenizers built on top of the built-in(or any other registered) tokenizers
+
+    tk = native.FTS5NativeTokenizer(
+        c,
+        "unicode61",
+        ["remove_diacritics", "2"],
+        filters=[native.stopwords(["a", "the"]), native.synonyms({"1st": ["first"]})],
+    )
+    fts5.register_tokenizer(c, "en", fts5.make_fts5_tokenizer(tk))
+
+a native tokenizer splits and folds the text in C, and only its tokens are
+passed to filters written in Python. a filter is a function taking a token
+(bytes) and flags(None for FTS3/4), and returns bytes to replace it, a list
+of bytes to add colocated tokens(the first one is the primary token), or None
+to remove it. for FTS5, tokens are passed from the native tokenizer to
+filters and then to FTS5 one by one, and a token returned as is is passed
+without copying.
+
+a native tokenizer is found by the name registered to a connection, and
+the connection must be open while it is used.
+it implements tokenize_bytes as well, so it can be used for FTS3/4, and with
+cache and chunked. an instance is not thread-safe, use per_thread of
+make_fts5_tokenizer with a function making it for tokenizers used by threads.
+"""
+import struct
+
+from . import fts3, fts5
+from .error import Error
+from .tokenizer import SQLITE_DONE, SQLITE_ERROR, SQLITE_OK, callback, load_once
+
+FTS5_TOKEN_COLOCATED = 0x0001
+
+
+class _Forward(object):
+    """a context of xTokenize of a native tokenizer called by xtokenize"""
+
+    __slots__ = ("pCtx", "xToken", "filters", "flags", "dropped")
+
+    def __init__(self, pCtx, xToken, filters, flags):
+        self.pCtx = pCtx
+        self.xToken = xToken
+        self.filters = filters
+        self.flags = flags
+        self.dropped = False
+
+
+def _apply(filters, token, flags):
+    """apply filters to a token, returns bytes, a list of bytes or None"""
+    for f in filters:
+        if type(token) is list:
+            r = []
+            for t in token:
+                t = f(t, flags)
+                if type(t) is list:
+                    r.extend(t)
+                elif t is not None:
+                    r.append(t)
+            token = r
+        else:
+            token = f(token, flags)
+        if not token:
+            return None
+    return token
+
+
+def _forward(pCtx, tflags, pToken, nToken, iStart, iEnd):
+    ctx = ffi.from_handle(pCtx)
+    if not ctx.filters:
+        return ctx.xToken(ctx.pCtx, tflags, pToken, nToken, iStart, iEnd)
+    if ctx.dropped and tflags & FTS5_TOKEN_COLOCATED:
+        # the primary token is removed, this one is the primary now
+        tflags &= ~FTS5_TOKEN_COLOCATED
+    token = ffi.unpack(pToken, nToken)
+    r = _apply(ctx.filters, token, ctx.flags)
+    ctx.dropped = r is None
+    if r is None:
+        return SQLITE_OK
+    if r is token:
+        return ctx.xToken(ctx.pCtx, tflags, pToken, nToken, iStart, iEnd)
+    if type(r) is not list:
+        r = [r]
+    for t in r:
+        rc = ctx.xToken(ctx.pCtx, tflags, ffi.from_buffer(t), len(t), iStart, iEnd)
+        if rc != SQLITE_OK:
+            return rc
+        tflags |= FTS5_TOKEN_COLOCATED
+    return SQLITE_OK
+
+
+def _collect(pCtx, tflags, pToken, nToken, iStart, iEnd):
+    tokens = ffi.from_handle(pCtx)
+    token = ffi.unpack(pToken, nToken)
+    if tflags & FTS5_TOKEN_COLOCATED and tokens:
+        t = tokens[-1]
+        if type(t[0]) is list:
+            t[0].append(token)
+        else:
+            tokens[-1] = ([t[0], token], t[1], t[2])
+    else:
+        tokens.append((token, iStart, iEnd))
+    return SQLITE_OK
+
+
+def _load():
+    """make callbacks on the first use"""
+    global ffi, forward, collect
+    fts5.load()
+    ffi = fts5.ffi
+    decl = "int(void*, int, const char*, int, int, int)"
+    forward = callback(decl, "_sqlitefts_fts5_native_forward", error=SQLITE_ERROR)(
+        _forward
+    )
+    collect = callback(decl, "_sqlitefts_fts5_native_collect", error=SQLITE_ERROR)(
+        _collect
+    )
+    return forward
+
+
+def _load_fts3():
+    """parse the FTS3 declarations on the first use"""
+    global ffi
+    ffi = fts3.ffi
+    return ffi
+
+
+class FTS5NativeTokenizer(object):
+    """
+    a FTS5 tokenizer registered to a connection as name, created with args.
+    filters are applied to its tokens.
+    """
+
+    def __init__(self, c, name, args=(), filters=()):
+        load_once("native", _load)
+        api = fts5.fts5_api_from_db(c)
+        if api is None:
+            raise Error("unable to get fts5_api")
+        pUserData = ffi.new("void **")
+        self._module = ffi.new("fts5_tokenizer *")
+        if api.xFindTokenizer(api, name.encode("utf-8"), pUserData, self._module):
+            raise Error("no such tokenizer: {}".format(name))
+        argv = [ffi.new("char[]", a.encode("utf-8")) for a in args]
+        pTokenizer = ffi.new("Fts5Tokenizer **")
+        rc = self._module.xCreate(
+            pUserData[0], ffi.new("char *[]", argv), len(argv), pTokenizer
+        )
+        if rc != SQLITE_OK:
+            raise Error("unable to create tokenizer {}. rc={}".format(name, rc))
+        self.name = name
+        self.filters = list(filters)
+        self._tokenizer = pTokenizer[0]
+
+    def _call(self, ctx, flags, pText, nText, xToken):
+        if self._tokenizer is None:
+            raise Error("the tokenizer is closed")
+        tokenizer = self._tokenizer
+        return self._module.xTokenize(tokenizer, ctx, flags, pText, nText, xToken)
+
+    def xtokenize(self, pCtx, flags, pText, nText, xToken):
+        """
+        tokenize the text given to xTokenize of FTS5, and pass tokens to
+        xToken through filters
+        """
+        if not self.filters and isinstance(xToken, ffi.CData):
+            # tokens don't have to be seen by Python
+            return self._call(pCtx, flags, pText, nText, xToken)
+        ctx = _Forward(pCtx, xToken, self.filters, flags)
+        return self._call(ffi.new_handle(ctx), flags, pText, nText, forward)
+
+    def tokenize_bytes(self, data, flags=None):
+        """tokenize UTF-8 text(a bytes-like object), and apply filters"""
+        tokens = []
+        rc = self._call(
+            ffi.new_handle(tokens),
+            fts5.FTS5_TOKENIZE_DOCUMENT if flags is None else flags,
+            ffi.from_buffer(data),
+            len(data),
+            collect,
+        )
+        if rc != SQLITE_OK:
+            raise Error("{} failed. rc={}".format(self.name, rc))
+        if not self.filters:
+            return tokens
+        return _apply_all(self.filters, tokens, flags)
+
+    def tokenize(self, text, flags=None):
+        return self.tokenize_bytes(text.encode("utf-8"), flags)
+
+    def close(self):
+        """delete the native tokenizer"""
+        if self._tokenizer is not None:
+            self._module.xDelete(self._tokenizer)
+            self._tokenizer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class FTS3NativeTokenizer(object):
+    """
+    a FTS3/4 tokenizer module registered to a connection as name(simple,
+    porter, unicode61, icu or another one), created with args.
+    filters are applied to its tokens.
+    """
+
+    def __init__(self, c, name, args=(), filters=()):
+        load_once("native_fts3", _load_fts3)
+        cur = c.cursor()
+        try:
+            # the name is bound, so it doesn't have to be enabled
+            r = cur.execute("SELECT fts3_tokenizer(?)", (name,)).fetchone()
+        except Exception:
+            raise Error("no such tokenizer: {}".format(name))
+        finally:
+            cur.close()
+        if not r or not r[0]:
+            raise Error("unable to get the tokenizer module: {}".format(name))
+        addr = struct.unpack("P", r[0])[0]
+        self._module = ffi.cast("sqlite3_tokenizer_module *", addr)
+        argv = [ffi.new("char[]", a.encode("utf-8")) for a in args]
+        pTokenizer = ffi.new("sqlite3_tokenizer **")
+        rc = self._module.xCreate(len(argv), ffi.new("char *[]", argv), pTokenizer)
+        if rc != SQLITE_OK:
+            raise Error("unable to create tokenizer {}. rc={}".format(name, rc))
+        pTokenizer[0].pModule = self._module
+        self.name = name
+        self.filters = list(filters)
+        self._tokenizer = pTokenizer[0]
+
+    def xopen(self, pInput, nInput):
+        """
+        open a cursor of the native tokenizer for the text given to xOpen of
+        FTS3/4. tokens are pulled from it through filters by xNext.
+        """
+        return _FTS3Cursor(self, pInput, nInput)
+
+    def iter_tokens(self, data):
+        """
+        yield (token, start, end, position) of UTF-8 text(a bytes-like object)
+        by xOpen/xNext of the native tokenizer. data must be valid until the
+        iteration ends, and the cursor is closed then.
+        """
+        if self._tokenizer is None:
+            raise Error("the tokenizer is closed")
+        module = self._module
+        pCursor = ffi.new("sqlite3_tokenizer_cursor **")
+        rc = module.xOpen(self._tokenizer, ffi.from_buffer(data), len(data), pCursor)
+        if rc != SQLITE_OK:
+            raise Error("{} failed. rc={}".format(self.name, rc))
+        cursor = pCursor[0]
+        cursor.pTokenizer = self._tokenizer
+        xNext = module.xNext
+        pToken = ffi.new("char **")
+        out = ffi.new("int[4]")
+        pn, pStart, pEnd, pPos = out, out + 1, out + 2, out + 3
+        try:
+            while True:
+                rc = xNext(cursor, pToken, pn, pStart, pEnd, pPos)
+                if rc != SQLITE_OK:
+                    break
+                yield ffi.unpack(pToken[0], out[0]), out[1], out[2], out[3]
+        finally:
+            module.xClose(cursor)
+        if rc != SQLITE_DONE:
+            raise Error("{} failed. rc={}".format(self.name, rc))
+
+    def tokenize_bytes(self, data, flags=None):
+        """
+        yield tokens of UTF-8 text(a bytes-like object) with filters applied.
+        tokens at the same position are yielded as a list(colocated).
+        """
+        filters = self.filters
+        last = None
+        for token, begin, end, position in self.iter_tokens(data):
+            if last is not None and position == last[3]:
+                if type(last[0]) is list:
+                    last[0].append(token)
+                else:
+                    last = ([last[0], token], last[1], last[2], position)
+                continue
+            if last is not None:
+                r = _apply(filters, last[0], flags) if filters else last[0]
+                if r is not None:
+                    yield r, last[1], last[2]
+            last = (token, begin, end, position)
+        if last is not None:
+            r = _apply(filters, last[0], flags) if filters else last[0]
+            if r is not None:
+                yield r, last[1], last[2]
+
+    def tokenize(self, text, flags=None):
+        return self.tokenize_bytes(text.encode("utf-8"), flags)
+
+    def close(self):
+        """destroy the native tokenizer"""
+        if self._tokenizer is not None:
+            self._module.xDestroy(self._tokenizer)
+            self._tokenizer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _FTS3Cursor(object):
+    """
+    a cursor of a native FTS3 tokenizer, a state of a cursor of
+    make_tokenizer_module. a token kept by filters is passed without copying,
+    it is valid until the next xNext of the native tokenizer.
+    """
+
+    __slots__ = (
+        "cursor",
+        "xNext",
+        "xClose",
+        "filters",
+        "out",
+        "last",
+        "pending",
+        "token",
+    )
+
+    def __init__(self, tokenizer, pInput, nInput):
+        self.cursor = None
+        if tokenizer._tokenizer is None:
+            raise Error("the tokenizer is closed")
+        module = tokenizer._module
+        pCursor = ffi.new("sqlite3_tokenizer_cursor **")
+        rc = module.xOpen(tokenizer._tokenizer, pInput, nInput, pCursor)
+        if rc != SQLITE_OK:
+            raise Error("{} failed. rc={}".format(tokenizer.name, rc))
+        self.cursor = pCursor[0]
+        self.cursor.pTokenizer = tokenizer._tokenizer
+        self.xNext = module.xNext
+        self.xClose = module.xClose
+        self.filters = tokenizer.filters
+        # token, length, start, end and position
+        self.out = (ffi.new("char **"), ffi.new("int[4]"))
+        self.last = None
+        self.pending = []
+        self.token = None
+
+    def next(self):
+        if self.pending:
+            t = self.token = self.pending.pop()
+            return t
+        pToken, a = self.out
+        while True:
+            rc = self.xNext(self.cursor, pToken, a, a + 1, a + 2, a + 3)
+            if rc == SQLITE_DONE:
+                raise StopIteration
+            if rc != SQLITE_OK:
+                raise Error("xNext failed. rc={}".format(rc))
+            tflags = 1 if a[3] == self.last else 0
+            self.last = a[3]
+            if not self.filters:
+                return pToken[0], a[0], a[1], a[2], tflags
+            token = ffi.unpack(pToken[0], a[0])
+            r = _apply(self.filters, token, None)
+            if r is None:
+                continue
+            if r is token:
+                return pToken[0], a[0], a[1], a[2], tflags
+            if type(r) is not list:
+                r = [r]
+            begin, end = a[1], a[2]
+            self.pending = [(ffi.from_buffer(t), len(t), begin, end, 1) for t in r]
+            self.pending.reverse()
+            t = self.token = self.pending.pop()
+            return t[:4] + (tflags,)
+
+    def close(self):
+        """close the native cursor, it is called by xClose"""
+        if self.cursor is not None:
+            self.xClose(self.cursor)
+            self.cursor = None
+
+
+def _apply_all(filters, tokens, flags):
+    r = []
+    for token, begin, end in tokens:
+        token = _apply(filters, token, flags)
+        if token is not None:
+            r.append((token, begin, end))
+    return r
+
+
+def _encode(word):
+    return word.encode("utf-8") if isinstance(word, str) else word
+
+
+def stopwords(words):
+    """a filter removing tokens in words(str or bytes)"""
+    words = frozenset(_encode(w) for w in words)
+
+    def _stopwords(token, flags):
+        return None if token in words else token
+
+    return _stopwords
+
+
+def synonyms(mapping, query=False):
+    """
+    a filter adding colocated tokens. mapping is a dict of a token and a list
+    of its synonyms(str or bytes). synonyms are added to documents, and to
+    queries as well if query is True.
+    """
+    mapping = {_encode(k): [_encode(v) for v in vs] for k, vs in mapping.items()}
+    queries = fts5._FTS5_TOKENIZE_QUERIES
+
+    def _synonyms(token, flags):
+        s = mapping.get(token)
+        if s is None or not query and flags is not None and flags & queries:
+            return token
+        return [token] + s
+
+    return _synonyms
+
+
+__all__ = ["FTS3NativeTokenizer", "FTS5NativeTokenizer", "stopwords", "synonyms"]
@@ -0,0 +1,69 @@
+import sqlite3
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import apsw  # type: ignore
+
+Token = Union[bytes, List[bytes]]
+Filter = Callable[[bytes, Optional[int]], Optional[Token]]
+
+class FTS5NativeTokenizer:
+    name: str
+    filters: List[Filter]
+    def __init__(
+        self,
+        c: Union[sqlite3.Connection, apsw.Connection],
+        name: str,
+        args: Sequence[str] = ...,
+        filters: Iterable[Filter] = ...,
+    ) -> None: ...
+    def xtokenize(
+        self, pCtx: Any, flags: int, pText: Any, nText: int, xToken: Any
+    ) -> int: ...
+    def tokenize_bytes(
+        self, data: Any, flags: Optional[int] = ...
+    ) -> List[Tuple[Token, int, int]]: ...
+    def tokenize(
+        self, text: str, flags: Optional[int] = ...
+    ) -> List[Tuple[Token, int, int]]: ...
+    def close(self) -> None: ...
+    def __enter__(self) -> "FTS5NativeTokenizer": ...
+    def __exit__(self, *args: Any) -> None: ...
+
+class FTS3NativeTokenizer:
+    name: str
+    filters: List[Filter]
+    def __init__(
+        self,
+        c: Union[sqlite3.Connection, apsw.Connection],
+        name: str,
+        args: Sequence[str] = ...,
+        filters: Iterable[Filter] = ...,
+    ) -> None: ...
+    def xopen(self, pInput: Any, nInput: int) -> Any: ...
+    def iter_tokens(self, data: Any) -> Iterator[Tuple[bytes, int, int, int]]: ...
+    def tokenize_bytes(
+        self, data: Any, flags: Optional[int] = ...
+    ) -> Iterator[Tuple[Token, int, int]]: ...
+    def tokenize(
+        self, text: str, flags: Optional[int] = ...
+    ) -> Iterator[Tuple[Token, int, int]]: ...
+    def close(self) -> None: ...
+    def __enter__(self) -> "FTS3NativeTokenizer": ...
+    def __exit__(self, *args: Any) -> None: ...
+
+def stopwords(words: Iterable[Union[str, bytes]]) -> Filter: ...
+def synonyms(
+    mapping: Mapping[Union[str, bytes], Sequence[Union[str, bytes]]],
+    query: bool = ...,
+) -> Filter: ...
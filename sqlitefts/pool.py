@@ -0,0 +1,230 @@
+# coding: utf-8
+"""
+a pool of SQLite connections with tokenizers registered
+
+tokenizers and auxiliary functions are registered once for each connection
+when it is opened, and PRAGMAs are applied to it. connections are reused
+until the pool is closed, and all of them are closed explicitly on close()
+or at exit.
+
+    pool = ConnectionPool(
+        "fts.db",
+        size=4,
+        tokenizers={"simple": fts.make_tokenizer_module(SimpleTokenizer())},
+        fts5_tokenizers={"simple": fts5.make_fts5_tokenizer(SimpleFTS5Tokenizer())},
+        aux_functions={"tokenize": fts5_aux.aux_tokenize},
+        pragmas={"journal_mode": "WAL"},
+    )
+    with pool.connection() as c:
+        c.execute("SELECT * FROM docs WHERE docs MATCH ?", ["text"])
+
+connect can be a function to open a connection, e.g. to use APSW:
+
+    pool = ConnectionPool(lambda: apsw.Connection("fts.db"), ...)
+"""
+import atexit
+import re
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+
+from . import fts3, fts5
+from .error import Error
+
+_pools = weakref.WeakSet()
+"""pools not closed yet"""
+
+_PRAGMA_NAME = re.compile(r"(?:[A-Za-z_]\w*\.)?[A-Za-z_]\w*", re.ASCII)
+_KEYWORD = re.compile(r"[A-Za-z_]\w*", re.ASCII)
+
+
+@atexit.register
+def _close_pools():
+    for pool in list(_pools):
+        pool.close(force=True)
+
+
+def _pragma_sql(name, value):
+    """
+    make `PRAGMA name=value`. PRAGMA doesn't take parameters, so name must be
+    an identifier(with a schema name) and value a number, a keyword or
+    a string, which is quoted.
+    """
+    if not isinstance(name, str) or not _PRAGMA_NAME.fullmatch(name):
+        raise ValueError("invalid PRAGMA name: {!r}".format(name))
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, (int, float)):
+        value = repr(value)
+    elif isinstance(value, str):
+        if not _KEYWORD.fullmatch(value):
+            value = "'{}'".format(value.replace("'", "''"))
+    else:
+        raise ValueError("invalid PRAGMA value: {!r}".format(value))
+    return "PRAGMA {}={}".format(name, value)
+
+
+class ConnectionPool(object):
+    """
+    a pool of at most size connections.
+
+    connect is a path of a database for sqlite3, or a function returning
+    a new connection(sqlite3 or APSW).
+    tokenizers is a dict of name and a FTS3 tokenizer module made by
+    make_tokenizer_module, fts5_tokenizers is a dict of name and a FTS5
+    tokenizer made by make_fts5_tokenizer, and aux_functions is a dict of
+    name and a FTS5 auxiliary function.
+    pragmas is a dict of name and value, applied as `PRAGMA name=value`.
+    a value is a number, a keyword(e.g. WAL) or a string quoted as a literal.
+    ValueError is raised for an invalid name or value.
+    acquire() waits for timeout seconds(forever if None) if all connections
+    are in use.
+    """
+
+    def __init__(
+        self,
+        connect,
+        size=4,
+        tokenizers=None,
+        fts5_tokenizers=None,
+        aux_functions=None,
+        pragmas=None,
+        timeout=None,
+    ):
+        if isinstance(connect, str):
+            database = connect
+
+            def connect():
+                return sqlite3.connect(database, check_same_thread=False)
+
+        self._connect = connect
+        self.size = size
+        self.tokenizers = dict(tokenizers or {})
+        self.fts5_tokenizers = dict(fts5_tokenizers or {})
+        self.aux_functions = dict(aux_functions or {})
+        self.pragmas = dict(pragmas or {})
+        for name, value in self.pragmas.items():
+            _pragma_sql(name, value)
+        self.timeout = timeout
+        self.closed = False
+        self._semaphore = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._connections = set()
+        self._in_use = set()
+        _pools.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        """number of open connections"""
+        return len(self._connections)
+
+    def _open(self):
+        c = self._connect()
+        try:
+            cur = c.cursor()
+            try:
+                for name, value in self.pragmas.items():
+                    cur.execute(_pragma_sql(name, value)).fetchall()
+            finally:
+                cur.close()
+            for name, tokenizer_module in self.tokenizers.items():
+                fts3.register_tokenizer(c, name, tokenizer_module)
+            if self.fts5_tokenizers or self.aux_functions:
+                if not fts5.register_all(c, self.fts5_tokenizers, self.aux_functions):
+                    raise Error("unable to register FTS5 tokenizers/functions")
+        except BaseException:
+            c.close()
+            raise
+        with self._lock:
+            self._connections.add(c)
+        return c
+
+    def acquire(self, timeout=None):
+        """
+        get a connection. it must be given back by release().
+        raises Error if the pool is closed or no connection gets available
+        in timeout seconds. timeout of the pool is used if it is None.
+        """
+        if self.closed:
+            raise Error("the pool is closed")
+        if timeout is None:
+            timeout = self.timeout
+        if not self._semaphore.acquire(timeout=timeout):
+            raise Error("no connection is available in {} seconds".format(timeout))
+        try:
+            with self._lock:
+                c = self._idle.pop() if self._idle else None
+            if c is None:
+                c = self._open()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        with self._lock:
+            self._in_use.add(c)
+        return c
+
+    def release(self, c):
+        """
+        give back a connection. an open transaction is rolled back.
+        the connection is closed if the pool is closed.
+        raises Error if the connection is not in use, e.g. released twice.
+        """
+        with self._lock:
+            if c not in self._in_use:
+                raise Error("the connection is not acquired from the pool")
+            self._in_use.remove(c)
+        try:
+            if self.closed:
+                self._discard(c)
+            elif getattr(c, "in_transaction", False):
+                try:
+                    c.cursor().execute("ROLLBACK")
+                except Exception:
+                    self._discard(c)
+                    return
+            with self._lock:
+                if not self.closed and c in self._connections:
+                    self._idle.append(c)
+        finally:
+            self._semaphore.release()
+
+    def _discard(self, c):
+        with self._lock:
+            self._connections.discard(c)
+        c.close()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """acquire a connection and release it on exit of with statement"""
+        c = self.acquire(timeout)
+        try:
+            yield c
+        finally:
+            self.release(c)
+
+    def close(self, force=False):
+        """
+        close idle connections, and connections in use are closed when they
+        are released. if force is True, connections in use are closed as well.
+        """
+        with self._lock:
+            self.closed = True
+            if force:
+                connections, self._connections = self._connections, set()
+            else:
+                connections = self._idle
+                self._connections.difference_update(connections)
+            self._idle = []
+        for c in connections:
+            c.close()
+        _pools.discard(self)
+
+
+__all__ = ["ConnectionPool"]
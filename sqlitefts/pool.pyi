@@ -0,0 +1,32 @@
+import sqlite3
+from typing import Any, Callable, ContextManager, Mapping, Optional, Union
+
+import apsw  # type: ignore
+
+Connection = Union[sqlite3.Connection, apsw.Connection]
+
+class ConnectionPool:
+    size: int
+    tokenizers: Mapping[str, Any]
+    fts5_tokenizers: Mapping[str, Any]
+    aux_functions: Mapping[str, Any]
+    pragmas: Mapping[str, Any]
+    timeout: Optional[float]
+    closed: bool
+    def __init__(
+        self,
+        connect: Union[str, Callable[[], Connection]],
+        size: int = ...,
+        tokenizers: Optional[Mapping[str, Any]] = ...,
+        fts5_tokenizers: Optional[Mapping[str, Any]] = ...,
+        aux_functions: Optional[Mapping[str, Any]] = ...,
+        pragmas: Optional[Mapping[str, Any]] = ...,
+        timeout: Optional[float] = ...,
+    ) -> None: ...
+    def __enter__(self) -> "ConnectionPool": ...
+    def __exit__(self, *exc_info: Any) -> None: ...
+    def __len__(self) -> int: ...
+    def acquire(self, timeout: Optional[float] = ...) -> Connection: ...
+    def release(self, c: Connection) -> None: ...
+    def connection(self, timeout: Optional[float] = ...) -> ContextManager[Connection]: ...
+    def close(self, force: bool = ...) -> None: ...
@@ -0,0 +1,258 @@
+# coding: utf-8
+"""
+attribute time spent in Python callbacks to SQL statements
+
+    profiler = Profiler()
+    profiler.attach(c)
+    c.execute("INSERT INTO docs VALUES(?)", [text])
+    c.execute("SELECT * FROM docs WHERE docs MATCH ?", [query]).fetchall()
+    profiler.detach(c)
+    profiler.dump(10)
+
+a profiler traces statements of connections by sqlite3_trace_v2, and
+callbacks of tokenizers(xTokenize of FTS5, xOpen/xNext/xClose of FTS3/4)
+and fts5_aux.aux_tokenize add the time spent in Python to the statement
+running in the same thread. for each statement, it reports the wall time
+from the first step until it is reset or finalized, the time in Python
+callbacks, and the number of crossings(calls of the callbacks) from SQLite
+to Python.
+
+a connection has only one trace callback, so attach() replaces one set by
+sqlite3.Connection.set_trace_callback. a statement started while another one
+is not finished yet in the same thread, e.g. interleaved cursors, gets the
+time until it finishes.
+"""
+import heapq
+import itertools
+import sys
+import threading
+import time
+
+from . import tokenizer as _tokenizer
+from .tokenizer import callback, get_db_from_connection, load_once
+
+SQLITE_TRACE_STMT = 0x01
+SQLITE_TRACE_PROFILE = 0x02
+
+active = 0
+"""number of connections traced. callbacks are measured only if it is not 0"""
+
+_traced = {}
+"""profiler of each traced database, keyed by address of sqlite3"""
+
+_lock = threading.Lock()
+_local = threading.local()
+_counter = itertools.count()
+
+
+class _Running(object):
+    """a statement running in a thread"""
+
+    __slots__ = ("profiler", "stmt", "start", "python_seconds", "crossings")
+
+    def __init__(self, profiler, stmt):
+        self.profiler = profiler
+        self.stmt = stmt
+        self.start = time.perf_counter()
+        self.python_seconds = 0.0
+        self.crossings = 0
+
+
+def current():
+    """the statement running in this thread, or None"""
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+
+def add(seconds, crossings=1):
+    """add time spent in Python callbacks to the statement of this thread"""
+    stack = getattr(_local, "stack", None)
+    if stack:
+        running = stack[-1]
+        running.python_seconds += seconds
+        running.crossings += crossings
+
+
+def _trace(mask, ctx, p, x):
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stmt = int(ffi.cast("uintptr_t", p))
+    if mask == SQLITE_TRACE_STMT:
+        if ffi.string(ffi.cast("char *", x), 2) == b"--":
+            # a trigger of the running statement
+            return 0
+        profiler = _traced.get(int(ffi.cast("uintptr_t", ctx)))
+        if profiler is None:
+            # detached
+            return 0
+        stack[:] = [r for r in stack if r.stmt != stmt]
+        stack.append(_Running(profiler, stmt))
+    elif mask == SQLITE_TRACE_PROFILE:
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i].stmt == stmt:
+                running = stack.pop(i)
+                break
+        else:
+            return 0
+        # x is the time measured by SQLite, but it is in milliseconds on Unix
+        wall = time.perf_counter() - running.start
+        sql = dll.sqlite3_sql(ffi.cast("sqlite3_stmt *", p))
+        sql = ffi.string(sql).decode("utf-8", "replace") if sql else ""
+        running.profiler._finish(sql, wall, running)
+    return 0
+
+
+def _load():
+    global ffi, dll
+
+    from . import _cdef
+
+    ffi = _tokenizer.load()
+    dll = _tokenizer.dll
+    if _tokenizer.lib is None:
+        ffi.cdef(_cdef.PROFILE_FUNCTIONS)
+    decl = "int(unsigned int, void *, void *, void *)"
+    return callback(decl, "_sqlitefts_trace", error=0)(_trace)
+
+
+class Profiler(object):
+    """
+    statistics of statements of attached connections.
+    top is the number of the slowest statements kept.
+    """
+
+    def __init__(self, top=10):
+        self.top = top
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.detach_all()
+
+    def attach(self, c):
+        """start tracing statements of a connection"""
+        global active
+        trace = load_once("profiling", _load)
+        db = get_db_from_connection(c)
+        mask = SQLITE_TRACE_STMT | SQLITE_TRACE_PROFILE
+        # the context is the database, to find the profiler attached now
+        dll.sqlite3_trace_v2(db, mask, trace, db)
+        with _lock:
+            _traced[int(ffi.cast("uintptr_t", db))] = self
+            active = len(_traced)
+        return self
+
+    def detach(self, c):
+        """stop tracing statements of a connection. call it before closing it"""
+        load_once("profiling", _load)
+        db = get_db_from_connection(c)
+        key = int(ffi.cast("uintptr_t", db))
+        if key:
+            dll.sqlite3_trace_v2(db, 0, ffi.NULL, ffi.NULL)
+        self._forget([key])
+
+    def detach_all(self):
+        """
+        stop recording statements of all connections. traces of connections
+        still open are not removed but ignored, use detach() to remove them.
+        """
+        self._forget([key for key, p in list(_traced.items()) if p is self])
+
+    def _forget(self, keys):
+        global active
+        with _lock:
+            for key in keys:
+                if _traced.get(key) is self:
+                    del _traced[key]
+            active = len(_traced)
+
+    def reset(self):
+        with self._lock:
+            self._statements = {}
+            self._slowest = []
+
+    def _finish(self, sql, wall, running):
+        python = running.python_seconds
+        crossings = running.crossings
+        with self._lock:
+            s = self._statements.get(sql)
+            if s is None:
+                s = self._statements[sql] = [0, 0.0, 0.0, 0, 0.0]
+            s[0] += 1
+            s[1] += wall
+            s[2] += python
+            s[3] += crossings
+            s[4] = max(s[4], wall)
+            entry = (wall, next(_counter), sql, python, crossings)
+            if len(self._slowest) < self.top:
+                heapq.heappush(self._slowest, entry)
+            elif self.top:
+                heapq.heappushpop(self._slowest, entry)
+
+    def statements(self):
+        """
+        totals of each SQL as a list of dicts of sql, calls, wall_seconds,
+        python_seconds, sqlite_seconds, crossings and max_wall_seconds,
+        in descending order of wall_seconds.
+        """
+        with self._lock:
+            items = list(self._statements.items())
+        r = [
+            {
+                "sql": sql,
+                "calls": calls,
+                "wall_seconds": wall,
+                "python_seconds": python,
+                "sqlite_seconds": max(wall - python, 0.0),
+                "crossings": crossings,
+                "max_wall_seconds": max_wall,
+            }
+            for sql, (calls, wall, python, crossings, max_wall) in items
+        ]
+        return sorted(r, key=lambda x: x["wall_seconds"], reverse=True)
+
+    def slowest(self):
+        """
+        the slowest executions of statements as a list of dicts of sql,
+        wall_seconds, python_seconds, sqlite_seconds and crossings.
+        """
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+        return [
+            {
+                "sql": sql,
+                "wall_seconds": wall,
+                "python_seconds": python,
+                "sqlite_seconds": max(wall - python, 0.0),
+                "crossings": crossings,
+            }
+            for wall, _, sql, python, crossings in entries
+        ]
+
+    def dump(self, n=None, file=None):
+        """print the n(top by default) slowest executions"""
+        file = file or sys.stderr
+        print(
+            "{:>10s} {:>10s} {:>10s} {:>9s}  sql".format(
+                "wall ms", "python ms", "sqlite ms", "crossings"
+            ),
+            file=file,
+        )
+        for r in self.slowest()[:n]:
+            print(
+                "{:10.3f} {:10.3f} {:10.3f} {:9d}  {}".format(
+                    r["wall_seconds"] * 1e3,
+                    r["python_seconds"] * 1e3,
+                    r["sqlite_seconds"] * 1e3,
+                    r["crossings"],
+                    " ".join(r["sql"].split()),
+                ),
+                file=file,
+            )
+
+
+__all__ = ["Profiler", "add", "current", "SQLITE_TRACE_STMT", "SQLITE_TRACE_PROFILE"]
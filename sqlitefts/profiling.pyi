@@ -0,0 +1,24 @@
+import sqlite3
+from typing import Any, Dict, List, Optional, TextIO, Union
+
+import apsw  # type: ignore
+
+SQLITE_TRACE_STMT: int
+SQLITE_TRACE_PROFILE: int
+active: int
+
+def current() -> Optional[Any]: ...
+def add(seconds: float, crossings: int = ...) -> None: ...
+
+class Profiler:
+    top: int
+    def __init__(self, top: int = ...) -> None: ...
+    def __enter__(self) -> "Profiler": ...
+    def __exit__(self, *exc_info: Any) -> None: ...
+    def attach(self, c: Union[sqlite3.Connection, apsw.Connection]) -> "Profiler": ...
+    def detach(self, c: Union[sqlite3.Connection, apsw.Connection]) -> None: ...
+    def detach_all(self) -> None: ...
+    def reset(self) -> None: ...
+    def statements(self) -> List[Dict[str, Any]]: ...
+    def slowest(self) -> List[Dict[str, Any]]: ...
+    def dump(self, n: Optional[int] = ..., file: Optional[TextIO] = ...) -> None: ...
@@ -0,0 +1,96 @@
+# coding: utf-8
+"""
+a log of slow calls of tokenizers
+
+    log = SlowLog(threshold_ms=50, size=100)
+    tm = fts5.make_fts5_tokenizer(HTMLTokenizer(), slow_log=log)
+    ...
+    for e in log.entries():
+        print(e.seconds, e.nbytes, e.sample[:40], "".join(e.stack))
+
+a call of a tokenizer taking threshold_ms or longer is recorded with its
+flags, the length of the input, the first sample_bytes of it, the number of
+tokens and the Python stack which executed the statement. only the latest
+size entries are kept. for FTS3/4, the time includes making tokens until
+the cursor is closed, and flags is None.
+"""
+import codecs
+import collections
+import os
+import threading
+import time
+import traceback
+
+from .stats import kind_of
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+SlowCall = collections.namedtuple(
+    "SlowCall",
+    ("time", "seconds", "kind", "flags", "nbytes", "ntokens", "sample", "stack"),
+)
+"""
+a slow call. time is when it is recorded(time.time()), sample is the first
+bytes of the input decoded as UTF-8, and stack is a list of strings formatted
+by traceback.format_stack, or None.
+"""
+
+
+class SlowLog(object):
+    """
+    a ring buffer of the latest size slow calls.
+    on_slow is called with a SlowCall when it is recorded.
+    stack=False stops capturing stacks.
+    """
+
+    def __init__(
+        self, threshold_ms=100.0, size=100, sample_bytes=256, stack=True, on_slow=None
+    ):
+        self.threshold = threshold_ms / 1e3
+        self.sample_bytes = sample_bytes
+        self.stack = stack
+        self.on_slow = on_slow
+        self.count = 0
+        """number of slow calls, including ones pushed out of the buffer"""
+        self._entries = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, flags, sample, nbytes, ntokens, seconds):
+        """
+        record a slow call. sample is a bytes-like object of the beginning of
+        the input, it is truncated to sample_bytes.
+        """
+        stack = None
+        if self.stack:
+            frames = traceback.extract_stack()
+            # without frames of this package, i.e. callbacks
+            while frames and os.path.dirname(frames[-1].filename) == _HERE:
+                frames.pop()
+            stack = traceback.format_list(frames)
+        # without a character cut at the end
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        sample = decoder.decode(bytes(sample[: self.sample_bytes]), final=False)
+        e = SlowCall(
+            time.time(), seconds, kind_of(flags), flags, nbytes, ntokens, sample, stack
+        )
+        with self._lock:
+            self._entries.append(e)
+            self.count += 1
+        if self.on_slow is not None:
+            self.on_slow(e)
+
+    def entries(self):
+        """recorded slow calls, the oldest first"""
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.count = 0
+
+
+__all__ = ["SlowLog", "SlowCall"]
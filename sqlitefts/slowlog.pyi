@@ -0,0 +1,37 @@
+from typing import Any, Callable, List, NamedTuple, Optional
+
+class SlowCall(NamedTuple):
+    time: float
+    seconds: float
+    kind: str
+    flags: Optional[int]
+    nbytes: int
+    ntokens: int
+    sample: str
+    stack: Optional[List[str]]
+
+class SlowLog:
+    threshold: float
+    sample_bytes: int
+    stack: bool
+    on_slow: Optional[Callable[[SlowCall], Any]]
+    count: int
+    def __init__(
+        self,
+        threshold_ms: float = ...,
+        size: int = ...,
+        sample_bytes: int = ...,
+        stack: bool = ...,
+        on_slow: Optional[Callable[[SlowCall], Any]] = ...,
+    ) -> None: ...
+    def __len__(self) -> int: ...
+    def add(
+        self,
+        flags: Optional[int],
+        sample: Any,
+        nbytes: int,
+        ntokens: int,
+        seconds: float,
+    ) -> None: ...
+    def entries(self) -> List[SlowCall]: ...
+    def clear(self) -> None: ...
@@ -0,0 +1,199 @@
+# coding: utf-8
+"""
+runtime counters of tokenizers
+
+    stats = TokenizerStats("ja")
+    tm = fts5.make_fts5_tokenizer(JapaneseTokenizer(), stats=stats)
+    ...
+    stats.snapshot()["document"]["tokenize_seconds"]
+
+    register_function(c)
+    c.execute("SELECT sqlitefts_stats()")  # JSON of all TokenizerStats
+
+a TokenizerStats counts calls, tokens, input bytes, time spent in the
+tokenizer and time spent in xToken(FTS5) for each kind of input, and keeps
+a histogram of the latency of each call in buckets of powers of 2
+microseconds. kinds are "document", "query", "prefix" and "aux" by FTS5
+flags, and "fts3" for FTS3/4, which doesn't tell them apart. FTS3/4 pulls
+tokens by xNext, so xtoken_seconds is always 0 and tokenize_seconds
+includes the time to make each token.
+
+tokenizers made without stats are not measured, and they pay only a check
+of an attribute for each call.
+"""
+import json
+import threading
+import time
+import weakref
+
+FUNCTION_NAME = "sqlitefts_stats"
+
+KINDS = ("document", "query", "prefix", "aux", "fts3")
+
+_HISTOGRAM_BUCKETS = 40
+
+_registry = weakref.WeakValueDictionary()
+"""TokenizerStats by name"""
+
+
+def kind_of(flags):
+    """the kind of a call by FTS5 flags, or "fts3" if flags is None"""
+    if flags is None:
+        return "fts3"
+    if flags & 0x0002:  # FTS5_TOKENIZE_PREFIX
+        return "prefix"
+    if flags & 0x0001:  # FTS5_TOKENIZE_QUERY
+        return "query"
+    if flags & 0x0008:  # FTS5_TOKENIZE_AUX
+        return "aux"
+    return "document"
+
+
+def _bucket(seconds):
+    """0 for less than 1us, n for [2**(n-1), 2**n)us"""
+    return min(int(seconds * 1e6).bit_length(), _HISTOGRAM_BUCKETS - 1)
+
+
+class _Counters(object):
+    __slots__ = (
+        "calls",
+        "tokens",
+        "bytes",
+        "tokenize_seconds",
+        "xtoken_seconds",
+        "histogram",
+    )
+
+    def __init__(self):
+        self.calls = self.tokens = self.bytes = 0
+        self.tokenize_seconds = self.xtoken_seconds = 0.0
+        self.histogram = [0] * _HISTOGRAM_BUCKETS
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "tokens": self.tokens,
+            "bytes": self.bytes,
+            "tokenize_seconds": self.tokenize_seconds,
+            "xtoken_seconds": self.xtoken_seconds,
+            # upper bound(us) and count of non-empty buckets
+            "histogram": [[1 << i, n] for i, n in enumerate(self.histogram) if n],
+        }
+
+
+class TokenizerStats(object):
+    """
+    counters of tokenizers made with stats=this.
+    name identifies it in sqlitefts_stats(). a new one replaces the one of
+    the same name.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._counters = {}
+        _registry[name] = self
+
+    def record(self, kind, nbytes, ntokens, seconds, xtoken_seconds=0.0):
+        """record a call taking seconds, xtoken_seconds of it in xToken"""
+        bucket = _bucket(seconds)
+        with self._lock:
+            c = self._counters.get(kind)
+            if c is None:
+                c = self._counters[kind] = _Counters()
+            c.calls += 1
+            c.tokens += ntokens
+            c.bytes += nbytes
+            c.tokenize_seconds += seconds - xtoken_seconds
+            c.xtoken_seconds += xtoken_seconds
+            c.histogram[bucket] += 1
+
+    def snapshot(self):
+        """a dict of counters of each kind recorded so far"""
+        with self._lock:
+            return {kind: c.to_dict() for kind, c in self._counters.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+
+
+class _Recorder(object):
+    """a xToken counting tokens and time spent in it"""
+
+    __slots__ = ("xToken", "tokens", "seconds")
+
+    def __init__(self, xToken):
+        self.xToken = xToken
+        self.tokens = 0
+        self.seconds = 0.0
+
+    def __call__(self, pCtx, tflags, pToken, nToken, iStart, iEnd):
+        s = time.perf_counter()
+        r = self.xToken(pCtx, tflags, pToken, nToken, iStart, iEnd)
+        self.seconds += time.perf_counter() - s
+        self.tokens += 1
+        return r
+
+
+class _RecordingCursor(object):
+    """a FTS3 cursor state counting tokens and time to make them"""
+
+    __slots__ = ("state", "calls", "tokens", "seconds", "nbytes", "sample")
+
+    def __init__(self, state, seconds, nbytes):
+        self.state = state
+        self.calls = 0
+        self.tokens = 0
+        self.seconds = seconds
+        self.nbytes = nbytes
+        self.sample = None
+
+    def next(self):
+        self.calls += 1
+        s = time.perf_counter()
+        try:
+            r = self.state.next()
+        finally:
+            self.seconds += time.perf_counter() - s
+        self.tokens += 1
+        return r
+
+    def close(self):
+        close = getattr(self.state, "close", None)
+        if close is not None:
+            close()
+
+
+def snapshot():
+    """counters of all TokenizerStats by name"""
+    return {name: stats.snapshot() for name, stats in list(_registry.items())}
+
+
+def _stats_function(name=None):
+    if name is None:
+        return json.dumps(snapshot(), sort_keys=True)
+    stats = _registry.get(name)
+    return json.dumps(stats and stats.snapshot(), sort_keys=True)
+
+
+def register_function(c, name=FUNCTION_NAME):
+    """
+    register a SQL function returning snapshot() as JSON to a connection.
+    name(stats) returns only counters of the TokenizerStats.
+    """
+    if hasattr(c, "create_function"):
+        c.create_function(name, -1, _stats_function)
+    else:
+        # APSW
+        c.createscalarfunction(name, _stats_function)
+
+
+__all__ = [
+    "TokenizerStats",
+    "KINDS",
+    "FUNCTION_NAME",
+    "kind_of",
+    "register_function",
+    "snapshot",
+]
@@ -0,0 +1,28 @@
+import sqlite3
+from typing import Any, Dict, Optional, Tuple, Union
+
+import apsw  # type: ignore
+
+FUNCTION_NAME: str
+KINDS: Tuple[str, ...]
+
+def kind_of(flags: Optional[int]) -> str: ...
+
+class TokenizerStats:
+    name: str
+    def __init__(self, name: str) -> None: ...
+    def record(
+        self,
+        kind: str,
+        nbytes: int,
+        ntokens: int,
+        seconds: float,
+        xtoken_seconds: float = ...,
+    ) -> None: ...
+    def snapshot(self) -> Dict[str, Dict[str, Any]]: ...
+    def reset(self) -> None: ...
+
+def snapshot() -> Dict[str, Dict[str, Dict[str, Any]]]: ...
+def register_function(
+    c: Union[sqlite3.Connection, apsw.Connection], name: str = ...
+) -> None: ...
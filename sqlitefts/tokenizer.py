@@ -3,83 +3,305 @@
 a proof of concept implementation of SQLite FTS tokenizers in Python
 """
 
+import os
 import sys
-import sysconfig
+import threading
 
-from cffi import FFI  # type: ignore
 
 SQLITE_OK = 0
+SQLITE_ERROR = 1
 SQLITE_DONE = 101
 
-ffi = FFI()
+_LAZY = ("ffi", "lib", "dll", "backend", "library_path")
+"""attributes set by load()"""
 
-if sys.platform == "win32":
-    import sqlite3  # noqa
+_lock = threading.RLock()
+_loaded = {}
 
-    dll = ffi.dlopen("sqlite3.dll")
-else:
-    from ctypes.util import find_library
 
+def load():
+    """
+    select the backend, parse the declarations and open SQLite library.
+    it is done only once, when a tokenizer or an auxiliary function is
+    registered first, or one of the attributes below is accessed.
+
+    - ffi: FFI object of the backend
+    - lib: the compiled module, or None for the ABI mode
+    - dll: SQLite library(lib for the compiled module)
+    - backend: "api" if the compiled module is used, otherwise "abi"
+    - library_path: the path of SQLite library
+    """
+    return load_once("tokenizer", _load)
+
+
+def load_once(name, f):
+    """call f only once for name, and return the result of it"""
+    r = _loaded.get(name)
+    if r is None:
+        with _lock:
+            r = _loaded.get(name)
+            if r is None:
+                r = _loaded[name] = f()
+    return r
+
+
+def _load():
+    global ffi, lib, dll, backend, _libc
+    import sysconfig
+
+    from . import _cdef
+
+    lib = None
+    env = os.environ.get("SQLITEFTS_BACKEND", "")
+    if env != "abi":
+        try:
+            # built by `python -m sqlitefts._build`
+            from ._sqlitefts_cffi import ffi, lib  # type: ignore
+
+            signature = getattr(lib, "sqlitefts_cdef_signature", None)
+            signature = signature and ffi.string(signature()).decode("ascii")
+            if signature != _cdef.signature():
+                lib = None
+                raise ImportError("the compiled module is outdated, rebuild it")
+        except ImportError:
+            if env == "api":
+                raise
+
+    if lib is None:
+        from cffi import FFI  # type: ignore
+
+        backend = "abi"
+        ffi = FFI()
+        if sysconfig.get_config_var("Py_GIL_DISABLED") == 1:
+            ffi.cdef(_cdef.SQLITE3 + _cdef.CONNECTION_GIL_DISABLED)
+        elif hasattr(sys, "getobjects"):
+            # for a python built with Py_TRACE_REFS
+            ffi.cdef(_cdef.SQLITE3 + _cdef.CONNECTION_TRACE_REFS)
+        else:
+            ffi.cdef(_cdef.SQLITE3 + _cdef.CONNECTION)
+        ffi.cdef(_cdef.LIBC)
+        _libc = _open_libc()
+    else:
+        backend = "api"
+        _libc = lib
+    dll = _open_sqlite3()
+    return ffi
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        load()
+        return globals()[name]
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+SQLITE3_LIBRARY_ENV = "SQLITEFTS_SQLITE3_LIBRARY"
+"""environment variable to specify the path of SQLite library explicitly"""
+
+
+def _mapped_sqlite3_libraries(maps="/proc/self/maps"):
+    """paths of SQLite libraries already loaded into this process"""
+    try:
+        with open(maps) as f:
+            lines = f.readlines()
+    except (IOError, OSError):
+        return []
+    paths = []
+    for line in lines:
+        path = line.rstrip("\n").partition("/")[2]
+        if path and os.path.basename(path).startswith("libsqlite3"):
+            path = "/" + path
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def sqlite3_library_paths():
+    """
+    candidates of SQLite library in order of preference.
+    - the path given by SQLITEFTS_SQLITE3_LIBRARY. no other paths are tried.
+    - _sqlite3 extension module, that is linked to the library sqlite3 uses.
+    - libsqlite3 already loaded, e.g. by _sqlite3 of PyPy.
+    - ctypes.util.find_library as a last resort. it may run subprocesses.
+    """
+    path = os.environ.get(SQLITE3_LIBRARY_ENV)
+    if path:
+        yield path
+        return
+    if sys.platform == "win32":
+        import sqlite3  # noqa
+
+        yield "sqlite3.dll"
+        return
     try:
         # try to use _sqlite3.so first
         import _sqlite3  # noqa
 
-        dll = ffi.dlopen(_sqlite3.__file__)
-    except:
-        dll = ffi.dlopen(find_library("sqlite3"))
-
-if sysconfig.get_config_var("Py_GIL_DISABLED") == 1:
-    ffi.cdef(
-        """
-typedef struct sqlite3 sqlite3;
-typedef struct {
-  uintptr_t ob_tid;
-  uint16_t _padding;
-  uint8_t ob_mutex;
-  uint8_t ob_gc_bits;
-  uint32_t ob_ref_local;
-  ssize_t ob_ref_shared;
-  void *ob_type;
-  sqlite3 *db;
-} PyObject;
-"""
-    )
-elif hasattr(sys, "getobjects"):
-    # for a python built with Py_TRACE_REFS
-    ffi.cdef(
-        """
-typedef struct sqlite3 sqlite3;
-typedef struct {
-  union {
-    ssize_t ob_refcnt;
-    uint32_t ob_refcnt_split[2];
-  };
-  void *ob_type;
-  sqlite3 *db;
-} PyObject;
-"""
-    )
-else:
-    ffi.cdef(
-        """
-typedef struct sqlite3 sqlite3;
-typedef struct {
-  size_t ob_refcnt;
-  void *ob_type;
-  sqlite3 *db;
-} PyObject;
-"""
-    )
+        yield _sqlite3.__file__
+    except ImportError:
+        pass
+    for path in _mapped_sqlite3_libraries():
+        yield path
+    from ctypes.util import find_library
+
+    yield find_library("sqlite3")
+
+
+def _open_sqlite3():
+    global library_path
+    error = None
+    for path in sqlite3_library_paths():
+        try:
+            r = ffi.dlopen(path) if lib is None else _bind_functions(path)
+        except (OSError, AttributeError) as e:
+            error = e
+            continue
+        library_path = path
+        return r
+    raise error
+
+
+def _open_libc():
+    """the C library for the ABI mode"""
+    if sys.platform == "win32":
+        return ffi.dlopen("ucrtbase")
+    return ffi.dlopen(None)
+
+
+def _bind_functions(path):
+    """
+    set the SQLite functions(pointers) of the compiled module to the ones in
+    the library, so that it uses the same library as sqlite3 module
+    """
+    import ctypes
+
+    from . import _cdef
+
+    cdll = ctypes.CDLL(path)
+    for name in _cdef.function_names(_cdef.FUNCTIONS):
+        p = ctypes.cast(getattr(cdll, name), ctypes.c_void_p).value
+        setattr(lib, name, ffi.cast(ffi.typeof(getattr(lib, name)), p))
+    return lib
+
+
+def callback(decl, name, error=None, onerror=None):
+    """
+    make a C function calling the decorated function.
+    it is an `extern "Python"` function of the compiled module if available,
+    otherwise a function made by ffi.callback.
+    the name must be declared in sqlitefts._cdef.CALLBACKS.
+    """
+    load()
+
+    def decorator(f):
+        if lib is None:
+            return ffi.callback(decl, f, error=error, onerror=onerror)
+        ffi.def_extern(name=name, error=error, onerror=onerror)(f)
+        return getattr(lib, name)
+
+    return decorator
+
+
+class _PerThread(threading.local):
+    """
+    a tokenizer of each thread, for tokenizers which are not thread-safe.
+    factory is called to make it on the first use in a thread, and it is
+    appended to made if given.
+    """
+
+    def __init__(self, factory, made=None):
+        self.tokenizer = factory()
+        if made is not None:
+            made.append(self.tokenizer)
+
+
+def input_buffer(p, n):
+    """
+    get a memoryview of UTF-8 text passed from SQLite without copying it.
+    a negative length means the text is NUL-terminated.
+    it is valid only while SQLite keeps the text.
+    """
+    if n < 0:
+        n = _libc.strlen(p)
+    return memoryview(ffi.buffer(p, n))
+
+
+def decode_input(p, n):
+    """
+    decode UTF-8 text passed from SQLite directly from its buffer.
+    a negative length means the text is NUL-terminated.
+    """
+    return str(input_buffer(p, n), "utf-8")
+
+
+def char_to_byte_offsets(text, tokens):
+    """
+    convert start/end positions(in characters) of tokens to positions in
+    UTF-8 encoded text. each span of the text is encoded only once when tokens
+    are given in order, so the conversion is linear to the length of the text.
+    """
+    if text.isascii():
+        return tokens
+    return _char_to_byte_offsets(text, tokens)
+
+
+def _char_to_byte_offsets(text, tokens):
+    c = b = 0
+    for normalized, start, end in tokens:
+        if start >= c:
+            b += len(text[c:start].encode("utf-8"))
+        else:
+            b -= len(text[start:c].encode("utf-8"))
+        begin = b
+        if end >= start:
+            b += len(text[start:end].encode("utf-8"))
+        else:
+            b -= len(text[end:start].encode("utf-8"))
+        c = end
+        yield normalized, begin, b
+
+
+def tokenize_input(tokenizer, data, *args):
+    """
+    tokenize UTF-8 text(a bytes-like object) with tokenize_bytes of a
+    tokenizer if it has one, otherwise with tokenize. start/end positions of
+    the tokens are in bytes of data either way.
+    args are passed to the tokenizer as is, e.g. flags for FTS5.
+    """
+    tokenize_bytes = getattr(tokenizer, "tokenize_bytes", None)
+    if tokenize_bytes is not None:
+        return tokenize_bytes(data, *args)
+    text = str(data, "utf-8")
+    tokens = tokenizer.tokenize(text, *args)
+    if getattr(tokenizer, "char_offsets", False):
+        tokens = char_to_byte_offsets(text, tokens)
+    return tokens
 
 
 def get_db_from_connection(c):
+    load()
     db = getattr(c, "_db", None)
     if db:
         # pypy's SQLite3 connection has _db using cffi
         db = ffi.cast("sqlite3*", db)
     else:
-        db = ffi.cast("PyObject *", id(c)).db
+        db = ffi.cast("sqlitefts_Connection *", id(c)).db
     return db
 
 
-__all__ = ["get_db_from_connection", "SQLITE_OK", "SQLITE_DONE"]
+__all__ = [
+    "backend",
+    "callback",
+    "library_path",
+    "load",
+    "sqlite3_library_paths",
+    "SQLITE3_LIBRARY_ENV",
+    "char_to_byte_offsets",
+    "decode_input",
+    "get_db_from_connection",
+    "input_buffer",
+    "tokenize_input",
+    "SQLITE_OK",
+    "SQLITE_ERROR",
+    "SQLITE_DONE",
+]
@@ -1,12 +1,36 @@
 import sqlite3
-from typing import Any, Union
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple, TypeVar, Union
 
 import apsw  # type: ignore
 
 SQLITE3DBHandle = Any
 SQLITE_OK: int
+SQLITE_ERROR: int
 SQLITE_DONE: int
 
+ffi: Any
+lib: Optional[Any]
+dll: Any
+backend: str
+SQLITE3_LIBRARY_ENV: str
+library_path: Optional[str]
+
+_T = TypeVar("_T")
+
+def load() -> Any: ...
+def load_once(name: str, f: Callable[[], _T]) -> _T: ...
+def sqlite3_library_paths() -> Iterator[Optional[str]]: ...
+def callback(
+    decl: str, name: str, error: Any = ..., onerror: Optional[Callable] = ...
+) -> Callable[[Callable], Any]: ...
+def char_to_byte_offsets(
+    text: str, tokens: Iterable[Tuple[_T, int, int]]
+) -> Iterable[Tuple[_T, int, int]]: ...
+def decode_input(p: Any, n: int) -> str: ...
+def input_buffer(p: Any, n: int) -> memoryview: ...
+def tokenize_input(
+    tokenizer: Any, data: Any, *args: Any
+) -> Iterable[Tuple[Any, int, int]]: ...
 def get_db_from_connection(
     c: Union[sqlite3.Connection, apsw.Connection]
 ) -> SQLITE3DBHandle: ...
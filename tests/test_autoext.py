@@ -0,0 +1,117 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import gc
+import re
+import sqlite3
+
+import pytest
+
+import sqlitefts as fts
+from sqlitefts import autoext, fts5, fts5_aux
+
+
+class SimpleTokenizer(fts5.FTS5Tokenizer):
+    _p = re.compile(r"\w+", re.UNICODE)
+
+    def tokenize(self, text, flags=None):
+        for m in self._p.finditer(text):
+            s, e = m.span()
+            t = text[s:e].lower()
+            l = len(t.encode("utf-8"))
+            p = len(text[:s].encode("utf-8"))
+            yield t, p, p + l
+
+
+@pytest.fixture
+def installed():
+    fts.install(
+        tokenizers={"s": fts.make_tokenizer_module(SimpleTokenizer())},
+        fts5_tokenizers={"s": fts5.make_fts5_tokenizer(SimpleTokenizer())},
+        aux_functions={"tokenize": fts5_aux.aux_tokenize},
+    )
+    yield
+    fts.uninstall()
+
+
+def test_install(installed):
+    c = sqlite3.connect(":memory:")
+    try:
+        c.execute("CREATE VIRTUAL TABLE t3 USING FTS4(w, tokenize=s)")
+        c.execute("CREATE VIRTUAL TABLE t5 USING FTS5(w, tokenize=s)")
+        c.execute("INSERT INTO t3 VALUES('Abc def')")
+        c.execute("INSERT INTO t5 VALUES('Abc def')")
+        r = c.execute("SELECT * FROM t3 WHERE t3 MATCH 'abc'").fetchall()
+        assert r == [("Abc def",)]
+        r = c.execute("SELECT tokenize(t5, 0) FROM t5 WHERE t5 MATCH 'abc'")
+        assert r.fetchall() == [("abc, def",)]
+        # fts5_api is cached by the auto extension
+        assert fts5.fts5_api_from_db(c) is not None
+    finally:
+        c.close()
+
+
+def test_uninstall(installed):
+    assert fts.uninstall()
+    assert not fts.uninstall()
+    c = sqlite3.connect(":memory:")
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            c.execute("CREATE VIRTUAL TABLE t5 USING FTS5(w, tokenize=s)")
+    finally:
+        c.close()
+
+
+def test_reinstall(installed):
+    fts.install(fts5_tokenizers={"x": fts5.make_fts5_tokenizer(SimpleTokenizer())})
+    c = sqlite3.connect(":memory:")
+    try:
+        c.execute("CREATE VIRTUAL TABLE t5 USING FTS5(w, tokenize=x)")
+        with pytest.raises(sqlite3.OperationalError):
+            c.execute("CREATE VIRTUAL TABLE t3 USING FTS4(w, tokenize=s)")
+    finally:
+        c.close()
+
+
+def install_aux():
+    """install an auxiliary function referred only by the installed config"""
+    ffi = fts5.ffi
+
+    @ffi.callback("fts5_extension_function")
+    def aux(pApi, pFts, pCtx, nVal, apVal):
+        fts5.dll.sqlite3_result_text(pCtx, b"ok", -1, fts5_aux.SQLITE_TRANSIENT)
+
+    fts.install(aux_functions={"myaux": aux})
+
+
+def test_aux_after_uninstall():
+    install_aux()
+    c = sqlite3.connect(":memory:")
+    try:
+        fts.uninstall()
+        install_aux()
+        fts.uninstall()
+        gc.collect()
+        c.execute("CREATE VIRTUAL TABLE t USING FTS5(w)")
+        c.execute("INSERT INTO t VALUES('abc')")
+        r = c.execute("SELECT myaux(t) FROM t WHERE t MATCH 'abc'").fetchall()
+        assert r == [("ok",)]
+    finally:
+        c.close()
+
+
+def test_release_configs():
+    for _ in range(3):
+        install_aux()
+        fts.uninstall()
+    assert autoext._installed == {}
+    install_aux()
+    c = sqlite3.connect(":memory:")
+    try:
+        install_aux()
+        fts.uninstall()
+        # the first config is kept for c
+        assert len(autoext._installed) == 1
+    finally:
+        c.close()
+    assert autoext._installed == {}
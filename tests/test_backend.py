@@ -0,0 +1,75 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+import sqlitefts as fts
+from sqlitefts import fts5, tokenizer
+
+SCRIPT = """
+import sqlite3
+import sqlitefts as fts
+from sqlitefts import fts5
+from sqlitefts.tokenizer import backend
+
+c = sqlite3.connect(":memory:")
+fts.register_tokenizer(c, "t", fts.make_tokenizer_module(fts.Tokenizer()))
+c.execute("CREATE VIRTUAL TABLE tok USING fts3tokenize(t)")
+assert c.execute("SELECT token FROM tok WHERE input='abc'").fetchall() == [("abc",)]
+fts5.register_tokenizer(c, "t", fts5.make_fts5_tokenizer(fts5.FTS5Tokenizer()))
+c.execute("CREATE VIRTUAL TABLE t USING FTS5(w, tokenize=t)")
+c.execute("INSERT INTO t VALUES('abc')")
+assert c.execute("SELECT * FROM t WHERE t MATCH 'abc'").fetchall() == [("abc",)]
+c.close()
+print(backend)
+"""
+
+
+def run_with_backend(backend):
+    env = dict(os.environ, SQLITEFTS_BACKEND=backend)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join([root, env.get("PYTHONPATH", "")])
+    out = subprocess.check_output([sys.executable, "-c", SCRIPT], env=env)
+    return out.decode("utf-8").strip()
+
+
+def test_abi_backend():
+    assert run_with_backend("abi") == "abi"
+
+
+def test_default_backend():
+    assert tokenizer.backend in ("abi", "api")
+    assert (tokenizer.lib is None) == (tokenizer.backend == "abi")
+    current = os.environ.get("SQLITEFTS_BACKEND", "")
+    assert run_with_backend(current) == tokenizer.backend
+
+
+class RaisingTokenizer(object):
+    def tokenize(self, text, flags=None):
+        raise ValueError("broken tokenizer")
+
+
+# cffi reports the exception as unraisable
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnraisableExceptionWarning")
+def test_tokenizer_error():
+    c = sqlite3.connect(":memory:")
+    try:
+        fts.register_tokenizer(c, "r", fts.make_tokenizer_module(RaisingTokenizer()))
+        c.execute("CREATE VIRTUAL TABLE t3 USING FTS4(w, tokenize=r)")
+        with pytest.raises(sqlite3.Error):
+            with c:
+                c.execute("INSERT INTO t3 VALUES('abc')")
+        tm = fts5.make_fts5_tokenizer(RaisingTokenizer())
+        assert fts5.register_tokenizer(c, "r", tm)
+        c.execute("CREATE VIRTUAL TABLE t5 USING FTS5(w, tokenize=r)")
+        with pytest.raises(sqlite3.Error):
+            with c:
+                c.execute("INSERT INTO t5 VALUES('abc')")
+        assert c.execute("SELECT count(*) FROM t5").fetchone() == (0,)
+    finally:
+        c.close()
@@ -32,9 +32,9 @@ def c():
     return c
 
 
-@pytest.fixture
-def tokenizer_module():
-    return fts.make_tokenizer_module(SimpleTokenizer())
+@pytest.fixture(params=[False, True], ids=["eager", "streaming"])
+def tokenizer_module(request):
+    return fts.make_tokenizer_module(SimpleTokenizer(), streaming=request.param)
 
 
 def test_make_tokenizer(c):
@@ -307,6 +307,97 @@ def test_tokenizer_output(c, tokenizer_module):
             assert a == e
 
 
+def test_streaming(c):
+    pulled = []
+
+    class T(SimpleTokenizer):
+        def tokenize(self, text):
+            for t in super(T, self).tokenize(text):
+                pulled.append(t[0])
+                yield t
+
+    name = "streaming"
+    fts.register_tokenizer(c, name, fts.make_tokenizer_module(T(), streaming=True))
+    c.execute("CREATE VIRTUAL TABLE tok USING fts3tokenize({})".format(name))
+    r = c.execute(
+        "SELECT token FROM tok WHERE input='This is a test sentence.' LIMIT 1"
+    ).fetchall()
+    assert [x[0] for x in r] == ["this"]
+    assert len(pulled) < 5
+    c.close()
+
+
+def test_char_offsets(c):
+    class T(fts.Tokenizer):
+        char_offsets = True
+        _p = re.compile(r"\w+", re.UNICODE)
+
+        def tokenize(self, text):
+            for m in self._p.finditer(text):
+                s, e = m.span()
+                yield text[s:e].lower(), s, e
+
+    fts.register_tokenizer(c, "b", fts.make_tokenizer_module(SimpleTokenizer()))
+    fts.register_tokenizer(c, "c", fts.make_tokenizer_module(T()))
+    c.execute("CREATE VIRTUAL TABLE tok_b USING fts3tokenize(b)")
+    c.execute("CREATE VIRTUAL TABLE tok_c USING fts3tokenize(c)")
+    sql = "SELECT token, start, end, position FROM {} WHERE input=?"
+    for s in ["This is a test sentence.", "これ は テスト の 文 です", "αβγ abc 𠮷野家 def"]:
+        expect = c.execute(sql.format("tok_b"), [s]).fetchall()
+        assert c.execute(sql.format("tok_c"), [s]).fetchall() == expect
+    c.close()
+
+
+def test_colocated(c):
+    class T(SimpleTokenizer):
+        def tokenize(self, text):
+            for t, s, e in super(T, self).tokenize(text):
+                yield [t, t.upper()] if t == "tokyo" else t, s, e
+
+    fts.register_tokenizer(c, "syn", fts.make_tokenizer_module(T()))
+    c.execute("CREATE VIRTUAL TABLE tok USING fts3tokenize(syn)")
+    r = c.execute(
+        "SELECT token, start, end, position FROM tok WHERE input=?",
+        ["tokyo tower"],
+    ).fetchall()
+    assert [tuple(x) for x in r] == [
+        ("tokyo", 0, 5, 0),
+        ("TOKYO", 0, 5, 0),
+        ("tower", 6, 11, 1),
+    ]
+    c.close()
+
+
+def test_char_to_byte_offsets():
+    text = "aあ𠮷 b"
+    tokens = [("あ", 1, 2), ("a", 0, 1), ("b", 4, 5), ("𠮷", 2, 3)]
+    assert list(fts.tokenizer.char_to_byte_offsets(text, tokens)) == [
+        ("あ", 1, 4),
+        ("a", 0, 1),
+        ("b", 9, 10),
+        ("𠮷", 4, 8),
+    ]
+    assert fts.tokenizer.char_to_byte_offsets("abc", tokens) is tokens
+
+
+def test_tokenize_input():
+    class CharTokenizer(object):
+        char_offsets = True
+
+        def tokenize(self, text, *args):
+            yield text[1:2], 1, 2
+
+    class BytesTokenizer(CharTokenizer):
+        def tokenize_bytes(self, data, *args):
+            yield "b", 0, len(data)
+
+    data = "aあ".encode("utf-8")
+    tokens = fts.tokenizer.tokenize_input(CharTokenizer(), data)
+    assert list(tokens) == [("あ", 1, 4)]
+    tokens = fts.tokenizer.tokenize_input(BytesTokenizer(), memoryview(data), 0)
+    assert list(tokens) == [("b", 0, 4)]
+
+
 def test_quoted(c, tokenizer_module):
     name = "simple1"
     docs = [
@@ -0,0 +1,104 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import re
+import sqlite3
+from array import array
+
+import pytest
+
+import sqlitefts as fts
+from sqlitefts import fts5, fts5_aux
+from sqlitefts.batch import pack_tokens, unpack_tokens
+
+
+class SimpleTokenizer(fts5.FTS5Tokenizer):
+    _p = re.compile(r"\w+", re.UNICODE)
+
+    def tokenize(self, text, flags=None):
+        for m in self._p.finditer(text):
+            s, e = m.span()
+            t = text[s:e].lower()
+            l = len(t.encode("utf-8"))
+            p = len(text[:s].encode("utf-8"))
+            yield t, p, p + l
+
+
+class BatchTokenizer(SimpleTokenizer):
+    def tokenize(self, text, flags=None):
+        raise AssertionError("tokenize_batch should be used")
+
+    def tokenize_batch(self, text, flags=None):
+        return pack_tokens(super(BatchTokenizer, self).tokenize(text, flags))
+
+
+@pytest.fixture
+def c():
+    c = sqlite3.connect(":memory:")
+    yield c
+    c.close()
+
+
+def test_pack_tokens():
+    batch = pack_tokens([("abc", 0, 3), ("", 3, 3), ("あい", 4, 10)])
+    data, offsets, starts, ends = batch
+    assert data == "abcあい".encode("utf-8")
+    assert offsets == array("i", [0, 3, 9])
+    assert starts == array("i", [0, 4])
+    assert ends == array("i", [3, 10])
+    assert list(unpack_tokens(batch)) == [
+        (b"abc", 0, 3),
+        ("あい".encode("utf-8"), 4, 10),
+    ]
+
+
+def test_pack_colocated_tokens():
+    tokens = [
+        ("a", 0, 1),
+        (["tokyo", "東京", ""], 2, 7),
+        ([b"", b"x"], 8, 9),
+        ("b", 10, 11),
+    ]
+    batch = pack_tokens(tokens)
+    assert len(batch) == 5
+    assert batch[4] == array("i", [0, 0, 1, 0, 0])
+    expect = [
+        (b"a", 0, 1),
+        ([b"tokyo", "東京".encode("utf-8")], 2, 7),
+        (b"x", 8, 9),
+        (b"b", 10, 11),
+    ]
+    assert list(unpack_tokens(batch)) == expect
+    assert pack_tokens(unpack_tokens(batch)) == batch
+
+
+def test_fts3_batch(c):
+    fts.register_tokenizer(c, "s", fts.make_tokenizer_module(SimpleTokenizer()))
+    fts.register_tokenizer(c, "b", fts.make_tokenizer_module(BatchTokenizer()))
+    c.execute("CREATE VIRTUAL TABLE tok_s USING fts3tokenize(s)")
+    c.execute("CREATE VIRTUAL TABLE tok_b USING fts3tokenize(b)")
+    s = "This is a test sentence. これ は テスト の 文 です"
+    sql = "SELECT token, start, end, position FROM {} WHERE input=?"
+    expect = c.execute(sql.format("tok_s"), [s]).fetchall()
+    assert len(expect) == 11
+    assert c.execute(sql.format("tok_b"), [s]).fetchall() == expect
+
+    c.execute("CREATE VIRTUAL TABLE fts USING FTS4(tokenize=b)")
+    c.executemany("INSERT INTO fts VALUES(?)", [("abc def",), ("あいうえお abc",)])
+    r = c.execute("SELECT * FROM fts WHERE fts MATCH 'abc'").fetchall()
+    assert len(r) == 2
+    r = c.execute("SELECT * FROM fts WHERE fts MATCH 'あいうえお'").fetchall()
+    assert len(r) == 1
+
+
+def test_fts5_batch(c):
+    fts5.register_tokenizer(c, "b", fts5.make_fts5_tokenizer(BatchTokenizer()))
+    fts5_aux.register_aux_function(c, "tokenize", fts5_aux.aux_tokenize)
+    c.execute("CREATE VIRTUAL TABLE fts USING FTS5(content, tokenize=b)")
+    c.executemany("INSERT INTO fts VALUES(?)", [("abc def",), ("あいうえお abc",)])
+    r = c.execute("SELECT * FROM fts WHERE fts MATCH 'abc'").fetchall()
+    assert len(r) == 2
+    r = c.execute("SELECT * FROM fts WHERE fts MATCH 'あいうえお'").fetchall()
+    assert len(r) == 1
+    r = c.execute("SELECT tokenize(fts, 0) FROM fts ORDER BY rowid")
+    assert [x[0] for x in r.fetchall()] == ["abc, def", "あいうえお, abc"]
@@ -0,0 +1,83 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import json
+import sqlite3
+
+import pytest
+
+from sqlitefts import bench, tokenizer
+
+
+def test_bench():
+    r = bench.run(docs=10, tokens=5, repeat=1)
+    assert r["backend"] == tokenizer.backend
+    assert set(r["fts3"]) == set(r["fts5"]) == {"call", "token"}
+
+
+def test_bench_threads():
+    r = bench.threads((1, 2), docs=10, queries=10, per_thread=True)
+    assert r["backend"] == tokenizer.backend
+    assert [t["threads"] for t in r["threads"]] == [1, 2]
+    assert set(r["threads"][1]) == {"threads", "index", "query"}
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnraisableExceptionWarning")
+def test_bench_threads_error(monkeypatch):
+    def tokenize(self, text, flags=None):
+        raise KeyError(text)
+
+    monkeypatch.setattr(bench._RegexTokenizer, "tokenize", tokenize)
+    # a thread fails after others are waiting for it
+    with pytest.raises(sqlite3.OperationalError):
+        bench.threads((2,), docs=5, queries=5)
+
+    def register_tokenizer(*args):
+        raise KeyError("register")
+
+    monkeypatch.setattr(bench.fts5, "register_tokenizer", register_tokenizer)
+    with pytest.raises(KeyError):
+        bench.threads((1, 2), docs=5, queries=5)
+
+
+def test_bench_compare(tmp_path):
+    r = bench.compare(sizes=(1, 10), budget=20, repeat=1)
+    cases = {(x["module"], x["tokenizer"], x["size"]) for x in r}
+    assert ("fts3", "python", 10) in cases and ("fts5", "python", 10) in cases
+    assert all(x["us_per_call"] > 0 and x["tokens_per_sec"] > 0 for x in r)
+    path = tmp_path / "bench.json"
+    argv = ["compare", "--sizes", "1", "--budget", "5", "--repeat", "1"]
+    assert bench.main(argv + ["--json", str(path)]) == 0
+    with path.open() as f:
+        runs = json.load(f)["runs"]
+    assert runs[0]["benchmark"] == "compare"
+    assert runs[0]["sqlite"] == sqlite3.sqlite_version
+    assert runs[0]["results"][0]["size"] == 1
+
+
+def test_bench_end_to_end():
+    r = bench.end_to_end(docs=30, script="mixed", queries=5)
+    assert r["docs"] == 30 and r["tokenizer"] == "BigramTokenizer"
+    assert [t["module"] for t in r["tables"]] == ["fts4", "fts5"]
+    for t in r["tables"]:
+        assert t["build_seconds"] > 0 and t["size_bytes"] > 0
+        for q in t["queries"]:
+            assert q["queries"] == 5
+            assert q["p50_ms"] <= q["p90_ms"] <= q["p99_ms"] <= q["max_ms"]
+    kinds = [q["kind"] for q in r["tables"][1]["queries"]]
+    assert "rank" in kinds and "tokenize" in kinds
+    assert sum(q["hits"] for q in r["tables"][0]["queries"]) > 0
+
+
+def test_bench_threads_queries(monkeypatch):
+    called = []
+
+    def threads(nthreads, docs, queries, per_thread=False):
+        called.append((nthreads, docs, queries, per_thread))
+        return {"backend": tokenizer.backend, "gil": True, "threads": []}
+
+    monkeypatch.setattr(bench, "threads", threads)
+    argv = ["threads", "--threads", "1,2", "--docs", "5", "--queries", "7"]
+    assert bench.main(argv) == 0
+    assert bench.main(["threads", "--threads", "1"]) == 0
+    assert called == [([1, 2], 5, 7, False), ([1], 2000, 2000, False)]
@@ -0,0 +1,179 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import re
+import sqlite3
+
+import pytest
+
+import sqlitefts as fts
+from sqlitefts import bulk, fts5
+
+
+class SimpleTokenizer(fts5.FTS5Tokenizer):
+    _p = re.compile(r"\w+", re.UNICODE)
+
+    def tokenize(self, text, flags=None):
+        for m in self._p.finditer(text):
+            s, e = m.span()
+            t = text[s:e].lower()
+            l = len(t.encode("utf-8"))
+            p = len(text[:s].encode("utf-8"))
+            yield t, p, p + l
+
+
+class SimpleFTS3Tokenizer(fts.Tokenizer):
+    def tokenize(self, text):
+        return SimpleTokenizer().tokenize(text)
+
+
+DOCS = [("doc {}".format(i), "Abc {} 日本語 def".format(i % 7)) for i in range(200)]
+
+
+@pytest.fixture
+def c():
+    c = sqlite3.connect(":memory:")
+    yield c
+    c.close()
+
+
+def test_replay_tokenizer():
+    tk = bulk.ReplayTokenizer(SimpleTokenizer())
+    assert tk.flags == fts5.FTS5_TOKENIZE_DOCUMENT
+    assert bulk.ReplayTokenizer(SimpleFTS3Tokenizer).flags is None
+    batch = tk.tokenize_batch("x y", fts5.FTS5_TOKENIZE_DOCUMENT)
+    assert tk.misses == 1
+    tk.add("abc", batch)
+    assert tk.tokenize_batch("abc", fts5.FTS5_TOKENIZE_DOCUMENT) is batch
+    assert list(tk.tokenize("abc", fts5.FTS5_TOKENIZE_QUERY)) == [(b"abc", 0, 3)]
+    assert (tk.hits, tk.misses) == (1, 2)
+    tk.clear()
+    assert len(tk) == 0
+
+
+def test_index_parallel_fts5(c):
+    tk = bulk.ReplayTokenizer(SimpleTokenizer())
+    fts5.register_tokenizer(c, "r", fts5.make_fts5_tokenizer(tk))
+    c.execute("CREATE VIRTUAL TABLE t USING FTS5(title, body, tokenize=r)")
+    with c:
+        n = bulk.index_parallel(c, "t", DOCS, tk, workers=2, chunk_size=16)
+    assert n == len(DOCS)
+    assert tk.hits == 2 * len(DOCS) and len(tk) == 0
+    r = c.execute("SELECT title FROM t WHERE t MATCH 'body:3'").fetchall()
+    assert len(r) == len([d for d in DOCS if d[1].startswith("Abc 3 ")])
+    r = c.execute("SELECT count(*) FROM t WHERE t MATCH '日本語'").fetchone()
+    assert r == (len(DOCS),)
+    c.execute("INSERT INTO t(t) VALUES('integrity-check')")
+
+
+def test_index_parallel_fts4(c):
+    tk = bulk.ReplayTokenizer(SimpleFTS3Tokenizer)
+    fts.register_tokenizer(c, "r", fts.make_tokenizer_module(tk))
+    c.execute("CREATE VIRTUAL TABLE t USING FTS4(body, tokenize=r)")
+    docs = [d[1] for d in DOCS]
+    with c:
+        n = bulk.index_parallel(c, "t", docs, tk, columns=["body"], workers=2)
+    assert n == len(docs)
+    r = c.execute("SELECT count(*) FROM t WHERE t MATCH 'abc 3'").fetchone()
+    assert r == (len([d for d in docs if d.startswith("Abc 3 ")]),)
+
+
+def fts5_config(c, table):
+    return dict(c.execute("SELECT k, v FROM {}_config".format(table)))
+
+
+@pytest.mark.parametrize("finish", ["optimize", "merge", None])
+def test_load_fts5(c, finish):
+    c.execute("CREATE VIRTUAL TABLE t USING FTS5(title, body)")
+    with c:
+        c.execute("INSERT INTO t(t, rank) VALUES('crisismerge', 8)")
+    r = bulk.load(c, "t", iter(DOCS), batch_size=30, finish=finish)
+    assert r["rows"] == len(DOCS) and r["batches"] == 7
+    assert r["bytes"] == sum(len(v.encode("utf-8")) for d in DOCS for v in d)
+    assert r["rows_per_sec"] > 0 and r["bytes_per_sec"] > 0
+    assert not c.in_transaction
+    # settings are restored
+    config = fts5_config(c, "t")
+    assert config["crisismerge"] == 8 and "automerge" not in config
+    r = c.execute("SELECT count(*) FROM t WHERE t MATCH '日本語'").fetchone()
+    assert r == (len(DOCS),)
+    c.execute("INSERT INTO t(t) VALUES('integrity-check')")
+    segments = c.execute("SELECT count(*) FROM t_data").fetchone()[0]
+    if finish == "optimize":
+        assert segments < 10
+
+
+@pytest.mark.parametrize("module", ["FTS3", "FTS4"])
+def test_load_fts4(c, module):
+    c.execute("CREATE VIRTUAL TABLE t USING {}(body)".format(module))
+    with c:
+        c.execute("INSERT INTO t(t) VALUES('automerge=2')")
+    docs = [d[1] for d in DOCS]
+    r = bulk.load(c, "t", docs, batch_size=50, columns=["body"], finish="merge")
+    assert r["rows"] == len(docs)
+    assert c.execute("SELECT value FROM t_stat WHERE id=2").fetchone() == (2,)
+    r = c.execute("SELECT count(*) FROM t WHERE t MATCH 'abc'").fetchone()
+    assert r == (len(docs),)
+
+
+def test_load_errors(c):
+    c.execute("CREATE TABLE x(a)")
+    with pytest.raises(fts.Error):
+        bulk.load(c, "x", [])
+    c.execute("CREATE VIRTUAL TABLE t USING FTS5(a, b)")
+    with pytest.raises(ValueError):
+        bulk.load(c, "t", [], finish="vacuum")
+
+    def rows():
+        yield ("a", "b")
+        raise KeyError("x")
+
+    with pytest.raises(KeyError):
+        bulk.load(c, "t", rows(), batch_size=1)
+    assert c.execute("SELECT count(*) FROM t").fetchone() == (1,)
+    with pytest.raises(sqlite3.OperationalError):
+        bulk.load(c, "t", [("a", "b", "c")])
+    assert c.execute("SELECT count(*) FROM t").fetchone() == (1,)
+    assert fts5_config(c, "t").get("automerge", 4) == 4
+
+
+def test_load_same_connection(c):
+    c.execute("CREATE TABLE src(title, body)")
+    c.executemany("INSERT INTO src VALUES(?, ?)", DOCS)
+    c.commit()
+    c.execute("CREATE VIRTUAL TABLE t USING FTS5(title, body)")
+    r = bulk.load(c, "t", c.execute("SELECT title, body FROM src"), batch_size=30)
+    assert r["rows"] == len(DOCS)
+    assert c.execute("SELECT count(*) FROM t").fetchone() == (len(DOCS),)
+    # rows of the same connection can't be read in another thread
+    with pytest.raises(sqlite3.ProgrammingError):
+        bulk.load(c, "t", c.execute("SELECT title, body FROM src"), prefetch=True)
+    assert c.execute("SELECT count(*) FROM t").fetchone() == (len(DOCS),)
+    r = bulk.load(c, "t", DOCS, batch_size=30, prefetch=True)
+    assert r["rows"] == len(DOCS) and r["batches"] == 7
+
+
+def test_load_settings_absent(c):
+    c.execute("CREATE VIRTUAL TABLE t USING FTS5(title, body)")
+    with c:
+        c.execute("INSERT INTO t(t, rank) VALUES('pgsz', 1000)")
+    settings = {"rank": "bm25(10.0, 1.0)", "automerge": 0, "pgsz": 2000}
+    bulk.load(c, "t", DOCS, settings=settings)
+    config = fts5_config(c, "t")
+    assert "rank" not in config and "automerge" not in config
+    assert config["pgsz"] == 1000
+
+
+def test_load_restore_error(c, monkeypatch):
+    c.execute("CREATE VIRTUAL TABLE t USING FTS5(a, b)")
+
+    def restore(*args):
+        raise sqlite3.OperationalError("restore")
+
+    def rows():
+        yield ("a", "b")
+        raise KeyError("x")
+
+    monkeypatch.setattr(bulk, "_restore", restore)
+    with pytest.raises(KeyError):
+        bulk.load(c, "t", rows(), batch_size=1)
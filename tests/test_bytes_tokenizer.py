@@ -0,0 +1,78 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import sqlite3
+
+import pytest
+
+import sqlitefts as fts
+from sqlitefts import fts5, fts5_aux
+from sqlitefts.bytes_tokenizer import BytesTokenizer, RegexTokenizer
+
+
+@pytest.fixture
+def c():
+    c = sqlite3.connect(":memory:")
+    yield c
+    c.close()
+
+
+def test_regex_tokenizer():
+    t = RegexTokenizer()
+    data = memoryview("Hello, 世界! foo_bar".encode("utf-8"))
+    assert list(t.tokenize_bytes(data)) == [
+        (b"hello", 0, 5),
+        ("世界".encode("utf-8"), 7, 13),
+        (b"foo_bar", 15, 22),
+    ]
+    t = RegexTokenizer(rb"[^ ]+", lower=False)
+    assert list(t.tokenize_bytes(b"A b")) == [(b"A", 0, 1), (b"b", 2, 3)]
+
+
+def test_fts3(c):
+    fts.register_tokenizer(c, "r", fts.make_tokenizer_module(RegexTokenizer()))
+    c.execute("CREATE VIRTUAL TABLE tok USING fts3tokenize(r)")
+    r = c.execute(
+        "SELECT token, start, end, position FROM tok WHERE input=?",
+        ["This is 日本語 text."],
+    ).fetchall()
+    assert r == [
+        ("this", 0, 4, 0),
+        ("is", 5, 7, 1),
+        ("日本語", 8, 17, 2),
+        ("text", 18, 22, 3),
+    ]
+    c.execute("CREATE VIRTUAL TABLE fts USING FTS4(tokenize=r)")
+    c.executemany("INSERT INTO fts VALUES(?)", [("abc def",), ("ABC 日本語",)])
+    r = c.execute("SELECT * FROM fts WHERE fts MATCH 'abc'").fetchall()
+    assert len(r) == 2
+    r = c.execute("SELECT * FROM fts WHERE fts MATCH '日本語'").fetchall()
+    assert len(r) == 1
+
+
+def test_fts5(c):
+    fts5.register_tokenizer(c, "r", fts5.make_fts5_tokenizer(RegexTokenizer()))
+    fts5_aux.register_aux_function(c, "tokenize", fts5_aux.aux_tokenize)
+    c.execute("CREATE VIRTUAL TABLE fts USING FTS5(content, tokenize=r)")
+    c.executemany("INSERT INTO fts VALUES(?)", [("abc def",), ("ABC 日本語",)])
+    r = c.execute("SELECT * FROM fts WHERE fts MATCH 'abc'").fetchall()
+    assert len(r) == 2
+    r = c.execute("SELECT * FROM fts WHERE fts MATCH '日本語'").fetchall()
+    assert len(r) == 1
+    r = c.execute("SELECT tokenize(fts, 0) FROM fts ORDER BY rowid")
+    assert [x[0] for x in r.fetchall()] == ["abc, def", "abc, 日本語"]
+
+
+def test_flags(c):
+    called = []
+
+    class T(BytesTokenizer):
+        def tokenize_bytes(self, data, flags=None):
+            called.append(flags)
+            return super(T, self).tokenize_bytes(data, flags)
+
+    fts5.register_tokenizer(c, "t", fts5.make_fts5_tokenizer(T()))
+    c.execute("CREATE VIRTUAL TABLE fts USING FTS5(content, tokenize=t)")
+    c.execute("INSERT INTO fts VALUES(?)", ["abc"])
+    c.execute("SELECT * FROM fts WHERE fts MATCH 'abc'").fetchall()
+    assert called == [fts5.FTS5_TOKENIZE_DOCUMENT, fts5.FTS5_TOKENIZE_QUERY]
@@ -0,0 +1,181 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import re
+import sqlite3
+from collections import Counter
+
+import pytest
+
+import sqlitefts as fts
+from sqlitefts import fts5
+from sqlitefts.batch import pack_tokens
+from sqlitefts.cache import QueryCache, TokenCache
+
+
+class CountingTokenizer(fts5.FTS5Tokenizer):
+    _p = re.compile(r"\w+", re.UNICODE)
+
+    def __init__(self):
+        self.called = Counter()
+
+    def tokenize(self, text, flags=None):
+        self.called[text] += 1
+        for m in self._p.finditer(text):
+            s, e = m.span()
+            t = text[s:e]
+            l = len(t.encode("utf-8"))
+            p = len(text[:s].encode("utf-8"))
+            yield t, p, p + l
+
+
+@pytest.fixture
+def c():
+    c = sqlite3.connect(":memory:")
+    yield c
+    c.close()
+
+
+def test_token_cache():
+    cache = TokenCache(max_bytes=100)
+    k1 = TokenCache.key(b"abc", 1)
+    assert k1 != TokenCache.key(b"abc", 4)
+    assert cache.get(k1) is None
+    b1 = pack_tokens([("abc", 0, 3)])
+    cache.put(k1, b1)
+    assert cache.get(k1) == b1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.size == 3 + 4 * 2 + 4 + 4 + 16
+    assert cache.hit_ratio == 0.5
+
+    cache.put(TokenCache.key(b"x" * 100), pack_tokens([("x" * 100, 0, 100)]))
+    assert len(cache) == 1
+
+    for i in range(10):
+        cache.put(TokenCache.key(str(i).encode()), b1)
+    assert cache.size <= 100
+    assert cache.get(k1) is None
+    assert cache.get(TokenCache.key(b"9")) == b1
+
+    cache.clear()
+    assert (len(cache), cache.size, cache.hits, cache.misses) == (0, 0, 0, 0)
+
+
+def test_fts5_cache(c):
+    t = CountingTokenizer()
+    cache = TokenCache()
+    fts5.register_tokenizer(c, "t", fts5.make_fts5_tokenizer(t, cache=cache))
+    c.execute("CREATE VIRTUAL TABLE fts USING FTS5(w, tokenize=t)")
+    docs = ["abc def", "あいうえお かきくけこ", "abc xyz"]
+    c.executemany("INSERT INTO fts VALUES(?)", ([d] for d in docs))
+    c.execute("INSERT INTO fts SELECT * FROM fts")
+    c.execute("INSERT INTO fts SELECT * FROM fts")
+    assert all(t.called[d] == 1 for d in docs)
+    assert cache.hits == 9 and cache.misses == 3
+    sql = "SELECT COUNT(*) FROM fts WHERE fts MATCH ?"
+    assert c.execute(sql, ["abc"]).fetchone()[0] == 8
+    assert c.execute(sql, ["かきくけこ"]).fetchone()[0] == 4
+
+
+def test_fts5_query_cache(c):
+    t = CountingTokenizer()
+    query_cache = QueryCache()
+    tm = fts5.make_fts5_tokenizer(t, query_cache=query_cache)
+    fts5.register_tokenizer(c, "t", tm)
+    c.execute("CREATE VIRTUAL TABLE fts USING FTS5(w, tokenize=t)")
+    c.executemany("INSERT INTO fts VALUES(?)", [["abc def"], ["abc def"], ["xyz"]])
+    assert t.called["abc def"] == 2
+    assert len(query_cache) == 0
+    sql = "SELECT COUNT(*) FROM fts WHERE fts MATCH ?"
+    for _ in range(3):
+        assert c.execute(sql, ["def abc"]).fetchone()[0] == 2
+        assert c.execute(sql, ["ab*"]).fetchone()[0] == 2
+    assert t.called["abc"] == t.called["def"] == t.called["ab"] == 1
+    assert query_cache.hits == 6 and query_cache.misses == 3
+    assert len(query_cache) == 3
+    assert query_cache.hit_ratio == pytest.approx(6 / 9)
+
+
+def test_fts3_cache(c):
+    t = CountingTokenizer()
+    cache = TokenCache()
+    fts.register_tokenizer(c, "t", fts.make_tokenizer_module(t, cache=cache))
+    c.execute("CREATE VIRTUAL TABLE fts USING FTS4(w, tokenize=t)")
+    docs = ["abc def", "あいうえお かきくけこ", "abc xyz"]
+    c.executemany("INSERT INTO fts VALUES(?)", ([d] for d in docs))
+    c.execute("INSERT INTO fts SELECT * FROM fts")
+    assert all(t.called[d] == 1 for d in docs)
+    sql = "SELECT COUNT(*) FROM fts WHERE fts MATCH ?"
+    assert c.execute(sql, ["abc"]).fetchone()[0] == 4
+    c.execute("CREATE VIRTUAL TABLE tok USING fts3tokenize(t)")
+    r = c.execute(
+        "SELECT token, start, end, position FROM tok WHERE input=?", [docs[1]]
+    ).fetchall()
+    assert r == [("あいうえお", 0, 15, 0), ("かきくけこ", 16, 31, 1)]
+
+
+class PrefixTokenizer(fts5.FTS5Tokenizer):
+    """tokenize words to their first n characters"""
+
+    def __init__(self, context=None, args=()):
+        self.n = int(args[0]) if args else 1
+
+    def tokenize(self, text, flags=None):
+        for m in re.finditer(r"\w+", text):
+            s = m.start()
+            t = m.group()[: self.n]
+            yield t, s, s + len(t)
+
+
+def test_fts5_cache_shared(c):
+    cache = TokenCache()
+    tm = fts5.make_fts5_tokenizer(PrefixTokenizer, cache=cache)
+    fts5.register_tokenizer(c, "p", tm)
+    tm = fts5.make_fts5_tokenizer(PrefixTokenizer(), cache=cache)
+    fts5.register_tokenizer(c, "u", tm)
+    c.execute("CREATE VIRTUAL TABLE t1 USING FTS5(w, tokenize='p 1')")
+    c.execute("CREATE VIRTUAL TABLE t2 USING FTS5(w, tokenize='p 3')")
+    c.execute("CREATE VIRTUAL TABLE t3 USING FTS5(w, tokenize='p 3')")
+    c.execute("CREATE VIRTUAL TABLE t4 USING FTS5(w, tokenize=u)")
+    for t in ("t1", "t2", "t3", "t4"):
+        c.execute("INSERT INTO {} VALUES('abcdef')".format(t))
+    # tables with the same tokenizer and arguments share cached tokens
+    assert cache.hits == 1 and len(cache) == 3
+    for t, q in [("t1", "a"), ("t2", "abc"), ("t3", "abc"), ("t4", "a")]:
+        sql = "SELECT w FROM {0} WHERE {0} MATCH ?".format(t)
+        assert c.execute(sql, [q]).fetchall() == [("abcdef",)]
+
+
+def test_fts5_query_cache_shared(c):
+    query_cache = QueryCache()
+    tm = fts5.make_fts5_tokenizer(PrefixTokenizer, query_cache=query_cache)
+    fts5.register_tokenizer(c, "p", tm)
+    c.execute("CREATE VIRTUAL TABLE t1 USING FTS5(w, tokenize='p 1')")
+    c.execute("CREATE VIRTUAL TABLE t2 USING FTS5(w, tokenize='p 3')")
+    c.execute("INSERT INTO t1 VALUES('axxxxx')")
+    c.execute("INSERT INTO t2 VALUES('abcdef')")
+    assert c.execute("SELECT w FROM t1 WHERE t1 MATCH 'abc'").fetchall() == [
+        ("axxxxx",)
+    ]
+    assert c.execute("SELECT w FROM t2 WHERE t2 MATCH 'abc'").fetchall() == [
+        ("abcdef",)
+    ]
+    assert len(query_cache) == 2
+
+
+def test_fts3_cache_shared(c):
+    def tokenizer(args):
+        tk = PrefixTokenizer(None, args)
+        tk.tokenize = lambda text, f=tk.tokenize: f(text)
+        return tk
+
+    cache = TokenCache()
+    fts.register_tokenizer(c, "p", fts.make_tokenizer_module(tokenizer, cache=cache))
+    c.execute("CREATE VIRTUAL TABLE t1 USING FTS4(w, tokenize=p 1)")
+    c.execute("CREATE VIRTUAL TABLE t2 USING FTS4(w, tokenize=p 3)")
+    for t in ("t1", "t2"):
+        c.execute("INSERT INTO {} VALUES('abcdef')".format(t))
+    assert len(cache) == 2
+    for t, q in [("t1", "a"), ("t2", "abc")]:
+        sql = "SELECT w FROM {0} WHERE {0} MATCH ?".format(t)
+        assert c.execute(sql, [q]).fetchall() == [("abcdef",)]
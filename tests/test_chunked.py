@@ -0,0 +1,154 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import re
+import sqlite3
+import tracemalloc
+
+import pytest
+
+import sqlitefts as fts
+from sqlitefts import fts5
+from sqlitefts.chunked import Chunked, utf8_boundary
+
+TEXT = "foo あいうえお bar 日本語の文章 baz " * 20
+
+
+class SimpleTokenizer(fts5.FTS5Tokenizer):
+    _p = re.compile(r"\w+", re.UNICODE)
+
+    def tokenize(self, text, flags=None):
+        for m in self._p.finditer(text):
+            s, e = m.span()
+            p = len(text[:s].encode("utf-8"))
+            yield text[s:e], p, p + len(text[s:e].encode("utf-8"))
+
+
+class CharTokenizer(SimpleTokenizer):
+    char_offsets = True
+
+    def tokenize(self, text, flags=None):
+        for m in self._p.finditer(text):
+            yield m.group(), m.start(), m.end()
+
+
+@pytest.fixture
+def c():
+    c = sqlite3.connect(":memory:")
+    yield c
+    c.close()
+
+
+def test_utf8_boundary():
+    data = "aあb".encode("utf-8")
+    assert [utf8_boundary(data, i) for i in range(6)] == [0, 1, 1, 1, 4, 5]
+
+
+@pytest.mark.parametrize("chunk_bytes", [18, 19, 25, 100, 1 << 20])
+@pytest.mark.parametrize("t", [SimpleTokenizer(), CharTokenizer()])
+def test_tokens(t, chunk_bytes):
+    data = TEXT.encode("utf-8")
+    expected = list(SimpleTokenizer().tokenize(TEXT))
+    assert list(Chunked(chunk_bytes).tokens(t, data)) == expected
+    assert list(Chunked(chunk_bytes).tokens(t, memoryview(data), 0)) == expected
+
+
+def test_long_token():
+    # a token longer than chunk_bytes is split
+    t = SimpleTokenizer()
+    r = list(Chunked(4).tokens(t, "abcdef ghi".encode("utf-8")))
+    assert r == [("abcd", 0, 4), ("ef", 4, 6), ("ghi", 7, 10)]
+
+
+def test_limits():
+    data = TEXT.encode("utf-8")
+    expected = list(SimpleTokenizer().tokenize(TEXT))
+    t = SimpleTokenizer()
+    assert list(Chunked(20, max_tokens=4).tokens(t, data)) == expected[:4]
+    # a character cut by max_bytes is dropped
+    assert list(Chunked(20, max_bytes=6).tokens(t, data)) == [("foo", 0, 3)]
+    r = list(Chunked(20, max_bytes=7).tokens(t, data))
+    assert r == [("foo", 0, 3), ("あ", 4, 7)]
+    # queries are not limited
+    q = fts5.FTS5_TOKENIZE_QUERY
+    assert list(Chunked(20, max_tokens=4).tokens(t, data, q)) == expected
+    with pytest.raises(fts.Error):
+        list(Chunked(20, max_tokens=5, error=True).tokens(t, data))
+    with pytest.raises(fts.Error):
+        list(Chunked(20, max_bytes=6, error=True).tokens(t, data))
+    with pytest.raises(ValueError):
+        Chunked(3)
+
+
+def test_fts5(c):
+    tm = fts5.make_fts5_tokenizer(SimpleTokenizer(), chunked=Chunked(20))
+    assert fts5.register_tokenizer(c, "s", tm)
+    c.execute("CREATE VIRTUAL TABLE t USING FTS5(w, tokenize=s)")
+    with c:
+        c.execute("INSERT INTO t VALUES(?)", [TEXT])
+    r = c.execute("SELECT highlight(t, 0, '[', ']') FROM t WHERE t MATCH 'あいうえお'")
+    assert r.fetchone()[0] == TEXT.replace("あいうえお", "[あいうえお]")
+    r = c.execute("SELECT rowid FROM t WHERE t MATCH '\"bar 日本語の文章\"'")
+    assert r.fetchall() == [(1,)]
+
+
+def test_fts5_limit(c):
+    chunked = Chunked(20, max_tokens=4)
+    tm = fts5.make_fts5_tokenizer(SimpleTokenizer(), chunked=chunked)
+    assert fts5.register_tokenizer(c, "s", tm)
+    c.execute("CREATE VIRTUAL TABLE t USING FTS5(w, tokenize=s)")
+    with c:
+        c.execute("INSERT INTO t VALUES(?)", [TEXT])
+    assert c.execute("SELECT rowid FROM t WHERE t MATCH 'bar'").fetchall() == [(1,)]
+    assert c.execute("SELECT rowid FROM t WHERE t MATCH 'baz'").fetchall() == []
+    chunked.error = True
+    with pytest.raises(sqlite3.Error):
+        with c:
+            c.execute("INSERT INTO t VALUES(?)", [TEXT])
+    assert c.execute("SELECT count(*) FROM t").fetchone() == (1,)
+
+
+def test_fts4(c):
+    tm = fts.make_tokenizer_module(SimpleTokenizer(), chunked=Chunked(20))
+    fts.register_tokenizer(c, "s", tm)
+    c.execute("CREATE VIRTUAL TABLE t USING FTS4(w, tokenize=s)")
+    with c:
+        c.execute("INSERT INTO t VALUES(?)", [TEXT])
+    sql = "SELECT snippet(t, '[', ']', '', -1, 64) FROM t WHERE w MATCH ?"
+    r = c.execute(sql, ["日本語の文章"])
+    assert "bar [日本語の文章] baz" in r.fetchone()[0]
+    r = c.execute("SELECT offsets(t) FROM t WHERE w MATCH 'foo'").fetchone()[0]
+    o = [int(x) for x in r.split()]
+    assert o[:4] == [0, 0, 0, 3]
+    assert len(o) == 4 * 20
+
+
+def test_fts4_limit(c):
+    tm = fts.make_tokenizer_module(
+        SimpleTokenizer(), chunked=Chunked(20, max_tokens=5, error=True)
+    )
+    fts.register_tokenizer(c, "s", tm)
+    c.execute("CREATE VIRTUAL TABLE t USING FTS4(w, tokenize=s)")
+    with pytest.raises(sqlite3.Error):
+        with c:
+            c.execute("INSERT INTO t VALUES(?)", [TEXT])
+    with c:
+        c.execute("INSERT INTO t VALUES(?)", ["foo bar"])
+    assert c.execute("SELECT rowid FROM t WHERE w MATCH 'bar'").fetchall() == [(1,)]
+
+
+def test_fts4_memory(c):
+    tm = fts.make_tokenizer_module(SimpleTokenizer(), chunked=Chunked(1 << 16))
+    fts.register_tokenizer(c, "s", tm)
+    c.execute("CREATE VIRTUAL TABLE t USING FTS4(w, tokenize=s)")
+    doc = ("word" + " " * 9996) * 1000
+    tracemalloc.start()
+    try:
+        with c:
+            c.execute("INSERT INTO t VALUES(?)", [doc])
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # the document(10MB) is not copied into Python
+    assert peak < len(doc) // 10
+    assert c.execute("SELECT rowid FROM t WHERE w MATCH 'word'").fetchall() == [(1,)]
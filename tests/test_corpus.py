@@ -0,0 +1,54 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import sqlite3
+
+import pytest
+
+import sqlitefts as fts
+from sqlitefts import corpus, fts5
+
+
+@pytest.fixture
+def c():
+    c = sqlite3.connect(":memory:")
+    yield c
+    c.close()
+
+
+def test_documents():
+    docs = corpus.documents(50, seed=1)
+    assert docs == corpus.documents(50, seed=1)
+    assert docs != corpus.documents(50, seed=2)
+    assert len(docs) == 50
+    assert all(t and b.endswith(("。", "号")) for t, b in docs)
+    assert not any(c.isascii() and c.isalpha() for _, b in docs for c in b)
+    mixed = corpus.documents(50, seed=1, script="mixed")
+    assert any(w in b for _, b in mixed for w in corpus.LATIN)
+    with pytest.raises(ValueError):
+        corpus.documents(1, script="en")
+
+
+def test_bigram_tokenizer(c):
+    t = corpus.BigramTokenizer()
+    assert list(t.tokenize("東京のSQLiteデータ")) == [
+        ("東京", 0, 2),
+        ("の", 2, 3),
+        ("sqlite", 3, 9),
+        ("デー", 9, 11),
+        ("ータ", 10, 12),
+    ]
+    fts.register_tokenizer(c, "b", fts.make_tokenizer_module(t))
+    fts5.register_tokenizer(c, "b", fts5.make_fts5_tokenizer(t))
+    c.execute("CREATE VIRTUAL TABLE t4 USING FTS4(title, body, tokenize=b)")
+    c.execute("CREATE VIRTUAL TABLE t5 USING FTS5(title, body, tokenize=b)")
+    docs = corpus.documents(20)
+    with c:
+        c.executemany("INSERT INTO t4 VALUES(?, ?)", docs)
+        c.executemany("INSERT INTO t5 VALUES(?, ?)", docs)
+    title = docs[3][0]
+    expected = [i + 1 for i, (t, _) in enumerate(docs) if t == title]
+    for table in ("t4", "t5"):
+        sql = "SELECT rowid FROM {} WHERE title MATCH ? ORDER BY rowid".format(table)
+        r = c.execute(sql, ['"{}"'.format(title)]).fetchall()
+        assert [x[0] for x in r] == expected
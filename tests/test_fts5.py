@@ -44,6 +44,38 @@ def test_fts5_api_from_db(c):
     c.close()
 
 
+def test_fts5_api_cache(c):
+    statements = []
+    c.set_trace_callback(statements.append)
+    fts5api = fts5.fts5_api_from_db(c)
+    assert fts5.fts5_api_from_db(c) == fts5api
+    assert len([s for s in statements if s.startswith("SELECT fts5(")]) == 1
+    # no other statements, e.g. SELECT sqlite_version()
+    assert len(statements) == 1
+    key = next(k for k, v in fts5._fts5_apis.items() if v == fts5api)
+    c.close()
+    assert key not in fts5._fts5_apis
+
+
+def test_register_all(c, tm):
+    statements = []
+    c.set_trace_callback(statements.append)
+    r = fts5.register_all(
+        c,
+        tokenizers={"s1": tm, "s2": tm},
+        aux_functions=[("tokenize", fts5_aux.aux_tokenize)],
+    )
+    assert r
+    assert len([s for s in statements if s.startswith("SELECT fts5(")]) == 1
+    c.execute("CREATE VIRTUAL TABLE fts USING FTS5(w, tokenize=s2)")
+    c.execute("INSERT INTO fts VALUES('abc def')")
+    r = c.execute("SELECT tokenize(fts, 0) FROM fts WHERE fts MATCH 'def'")
+    assert r.fetchone()[0] == "abc, def"
+    with pytest.raises(sqlite3.OperationalError):
+        c.execute("SELECT sqlitefts_fts5_api(fts) FROM fts").fetchall()
+    c.close()
+
+
 def test_make_tokenizer(c):
     tm = fts5.make_fts5_tokenizer(SimpleTokenizer())
     assert all(getattr(tm, x) is not None for x in ("xCreate", "xDelete", "xTokenize"))
@@ -167,6 +199,62 @@ def test_match(c, tm):
     c.close()
 
 
+def test_embedded_nul(c, tm):
+    name = "super_simple"
+    fts5.register_tokenizer(c, name, tm)
+    c.execute("CREATE VIRTUAL TABLE fts USING FTS5(content, tokenize={})".format(name))
+    c.execute("INSERT INTO fts VALUES(?)", ("abc\x00def あいう\x00えお",))
+    r = c.execute("SELECT * FROM fts WHERE fts MATCH 'def'").fetchall()
+    assert len(r) == 1
+    r = c.execute("SELECT * FROM fts WHERE fts MATCH 'えお'").fetchall()
+    assert len(r) == 1
+    c.close()
+
+
+def test_char_offsets(c):
+    class T(fts5.FTS5Tokenizer):
+        char_offsets = True
+        _p = re.compile(r"\w+", re.UNICODE)
+
+        def tokenize(self, text, flags):
+            for m in self._p.finditer(text):
+                s, e = m.span()
+                yield text[s:e], s, e
+
+    fts5.register_tokenizer(c, "c", fts5.make_fts5_tokenizer(T()))
+    c.execute("CREATE VIRTUAL TABLE fts USING FTS5(content, tokenize=c)")
+    c.execute("INSERT INTO fts VALUES(?)", ("これは 日本語 です abc",))
+    r = c.execute(
+        "SELECT highlight(fts, 0, '[', ']') FROM fts WHERE fts MATCH ?", ["日本語"]
+    ).fetchone()
+    assert r[0] == "これは [日本語] です abc"
+    c.close()
+
+
+def test_colocated(c):
+    synonyms = {"tokyo": ["東京", "とうきょう"]}
+
+    class T(SimpleTokenizer):
+        def tokenize(self, text, flags):
+            for t, s, e in super(T, self).tokenize(text, flags):
+                if flags & fts5.FTS5_TOKENIZE_DOCUMENT and t in synonyms:
+                    yield [t] + synonyms[t], s, e
+                else:
+                    yield t, s, e
+
+    fts5.register_tokenizer(c, "syn", fts5.make_fts5_tokenizer(T()))
+    c.execute("CREATE VIRTUAL TABLE fts USING FTS5(content, tokenize=syn)")
+    c.executemany("INSERT INTO fts VALUES(?)", [["tokyo tower"], ["kyoto tower"]])
+    for q in ["tokyo", "東京", "とうきょう", '"東京 tower"']:
+        r = c.execute("SELECT * FROM fts WHERE fts MATCH ?", [q]).fetchall()
+        assert [x[0] for x in r] == ["tokyo tower"]
+    r = c.execute(
+        "SELECT highlight(fts, 0, '[', ']') FROM fts WHERE fts MATCH '東京'"
+    ).fetchone()
+    assert r[0] == "[tokyo] tower"
+    c.close()
+
+
 def test_full_text_index_queries(c, tm):
     name = "super_simple"
     docs = [
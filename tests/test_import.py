@@ -0,0 +1,87 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import json
+import os
+import subprocess
+import sys
+
+from sqlitefts import tokenizer
+
+IMPORT_BUDGET = 0.5
+"""seconds. importing sqlitefts and loading SQLite takes about 0.03s(api)/0.08s(abi)"""
+
+SCRIPT = """
+import json
+import sys
+import time
+
+events = []
+
+
+def hook(event, args):
+    if event in ("subprocess.Popen", "os.posix_spawn", "os.exec", "os.fork"):
+        events.append(event)
+
+
+sys.addaudithook(hook)
+import sqlite3  # noqa
+
+s = time.perf_counter()
+import sqlitefts  # noqa
+
+modules = sorted(m for m in sys.modules if m.startswith(("sqlitefts", "cffi")))
+sqlitefts.tokenizer.load()
+t = time.perf_counter() - s
+print(
+    json.dumps(
+        {
+            "time": t,
+            "events": events,
+            "modules": modules,
+            "path": sqlitefts.tokenizer.library_path,
+        }
+    )
+)
+"""
+
+
+def run_import(script=SCRIPT, **env):
+    e = dict(os.environ, **env)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    e["PYTHONPATH"] = os.pathsep.join([root, e.get("PYTHONPATH", "")])
+    return json.loads(subprocess.check_output([sys.executable, "-c", script], env=e))
+
+
+def test_import_time():
+    r = run_import()
+    assert r["events"] == []
+    assert r["time"] < IMPORT_BUDGET
+    assert r["path"] == tokenizer.library_path
+
+
+def test_lazy_import():
+    r = run_import()
+    assert r["modules"] == ["sqlitefts", "sqlitefts.error"]
+    script = "import json, sys, sqlitefts.fts5_aux; print(json.dumps(list(sys.modules)))"
+    modules = run_import(script)
+    assert "sqlitefts.fts5" in modules
+    assert "cffi" not in modules and "sqlitefts._sqlitefts_cffi" not in modules
+
+
+def test_explicit_library_path():
+    r = run_import(SQLITEFTS_SQLITE3_LIBRARY=tokenizer.library_path)
+    assert r["path"] == tokenizer.library_path
+
+
+def test_mapped_sqlite3_libraries(tmp_path):
+    maps = tmp_path / "maps"
+    maps.write_text(
+        "7f00-7f01 r--p 00000000 08:01 1 /usr/lib/libsqlite3.so.0.8.6\n"
+        "7f01-7f02 r-xp 00001000 08:01 1 /usr/lib/libsqlite3.so.0.8.6\n"
+        "7f02-7f03 r--p 00000000 08:01 2 /usr/lib/libc.so.6\n"
+        "7f03-7f04 rw-p 00000000 00:00 0 [heap]\n"
+    )
+    paths = tokenizer._mapped_sqlite3_libraries(str(maps))
+    assert paths == ["/usr/lib/libsqlite3.so.0.8.6"]
+    assert tokenizer._mapped_sqlite3_libraries(str(tmp_path / "none")) == []
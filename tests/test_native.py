@@ -0,0 +1,207 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import sqlite3
+
+import pytest
+
+import sqlitefts as fts
+from sqlitefts import fts5, native
+from sqlitefts.cache import TokenCache
+from sqlitefts.stats import TokenizerStats
+
+
+@pytest.fixture
+def c():
+    c = sqlite3.connect(":memory:")
+    yield c
+    c.close()
+
+
+def make_table(c, tk, name="n"):
+    assert fts5.register_tokenizer(c, name, fts5.make_fts5_tokenizer(tk))
+    c.execute("CREATE VIRTUAL TABLE t USING FTS5(w, tokenize={})".format(name))
+    with c:
+        c.executemany(
+            "INSERT INTO t VALUES(?)",
+            [["The Quick brown fox"], ["the first café"], ["1st street"]],
+        )
+
+
+def search(c, q):
+    r = c.execute("SELECT rowid FROM t WHERE t MATCH ? ORDER BY rowid", [q])
+    return [x[0] for x in r]
+
+
+def test_tokenize(c):
+    with native.FTS5NativeTokenizer(c, "unicode61", ["remove_diacritics", "2"]) as tk:
+        r = tk.tokenize_bytes("Café 日本".encode("utf-8"))
+        assert r == [(b"cafe", 0, 5), ("日本".encode("utf-8"), 6, 12)]
+        r = tk.tokenize("a b", fts5.FTS5_TOKENIZE_QUERY)
+        assert r == [(b"a", 0, 1), (b"b", 2, 3)]
+    with pytest.raises(fts.Error):
+        tk.tokenize("a")
+    with pytest.raises(fts.Error):
+        native.FTS5NativeTokenizer(c, "nonexistent")
+    with pytest.raises(fts.Error):
+        native.FTS5NativeTokenizer(c, "unicode61", ["no_such_option", "1"])
+
+
+def test_passthrough(c):
+    tk = native.FTS5NativeTokenizer(c, "porter")
+    make_table(c, tk)
+    assert search(c, "jumping OR foxes") == [1]
+    r = c.execute("SELECT highlight(t, 0, '[', ']') FROM t WHERE t MATCH 'quick'")
+    assert r.fetchall() == [("The [Quick] brown fox",)]
+    tk.close()
+
+
+def test_filters(c):
+    filters = [
+        native.stopwords(["the"]),
+        native.synonyms({"1st": ["first"], "fox": [b"vixen"]}),
+    ]
+    tk = native.FTS5NativeTokenizer(c, "unicode61", filters=filters)
+    r = tk.tokenize("the 1st fox")
+    assert r == [([b"1st", b"first"], 4, 7), ([b"fox", b"vixen"], 8, 11)]
+    make_table(c, tk)
+    assert search(c, "the") == []
+    assert search(c, "first") == [2, 3]
+    assert search(c, "vixen") == [1]
+    # synonyms are not added to queries
+    assert search(c, "1st") == [3]
+    r = c.execute("SELECT highlight(t, 0, '[', ']') FROM t WHERE t MATCH 'first'")
+    assert r.fetchall() == [("the [first] café",), ("[1st] street",)]
+    tk.close()
+
+
+def test_rewrite(c):
+    def f(token, flags):
+        if token == b"brown":
+            return None
+        if token == b"cafe":
+            return [b"caffe", b"coffee"]
+        return token
+
+    filters = [f, native.stopwords(["caffe"])]
+    tk = native.FTS5NativeTokenizer(c, "unicode61", filters=filters)
+    make_table(c, tk)
+    assert search(c, "brown") == []
+    assert search(c, "caffe") == []
+    # the colocated token becomes the primary one
+    assert search(c, "coffee") == [2]
+    assert search(c, "\"first coffee\"") == [2]
+    tk.close()
+
+
+def test_options(c):
+    s = TokenizerStats("native")
+    filters = [native.stopwords(["the"])]
+    tk = native.FTS5NativeTokenizer(c, "unicode61", filters=filters)
+    tm = fts5.make_fts5_tokenizer(tk, cache=TokenCache(), stats=s)
+    assert fts5.register_tokenizer(c, "n", tm)
+    c.execute("CREATE VIRTUAL TABLE t USING FTS5(w, tokenize=n)")
+    with c:
+        c.execute("INSERT INTO t VALUES('the quick fox')")
+    assert search(c, "quick") == [1]
+    assert s.snapshot()["document"]["tokens"] == 2
+    tk.close()
+
+
+# cffi reports the exception as unraisable
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnraisableExceptionWarning")
+def test_closed(c):
+    tk = native.FTS5NativeTokenizer(c, "unicode61")
+    make_table(c, tk)
+    tk.close()
+    with pytest.raises(sqlite3.Error):
+        with c:
+            c.execute("INSERT INTO t VALUES('lost')")
+    assert c.execute("SELECT count(*) FROM t").fetchone() == (3,)
+
+
+def test_fts4(c):
+    filters = [native.synonyms({"fox": ["vixen"]})]
+    tk = native.FTS5NativeTokenizer(c, "unicode61", filters=filters)
+    fts.register_tokenizer(c, "n", fts.make_tokenizer_module(tk))
+    c.execute("CREATE VIRTUAL TABLE t USING FTS4(w, tokenize=n)")
+    with c:
+        c.execute("INSERT INTO t VALUES('The Quick fox')")
+    assert c.execute("SELECT rowid FROM t WHERE w MATCH 'vixen'").fetchall() == [(1,)]
+    tk.close()
+
+
+def test_fts3_tokenize(c):
+    with native.FTS3NativeTokenizer(c, "porter") as tk:
+        r = list(tk.iter_tokens(b"The jumping foxes"))
+        assert r == [(b"the", 0, 3, 0), (b"jump", 4, 11, 1), (b"fox", 12, 17, 2)]
+        assert list(tk.tokenize("The foxes")) == [(b"the", 0, 3), (b"fox", 4, 9)]
+    with pytest.raises(fts.Error):
+        list(tk.tokenize("a"))
+    with pytest.raises(fts.Error):
+        native.FTS3NativeTokenizer(c, "nonexistent")
+    args = ["remove_diacritics=1"]
+    with native.FTS3NativeTokenizer(c, "unicode61", args) as tk:
+        assert list(tk.tokenize("Café")) == [(b"cafe", 0, 5)]
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_fts3_filters(c, streaming):
+    filters = [native.stopwords(["the"]), native.synonyms({"fox": ["vixen"]})]
+    tk = native.FTS3NativeTokenizer(c, "porter", filters=filters)
+    r = list(tk.tokenize("the foxes"))
+    assert r == [([b"fox", b"vixen"], 4, 9)]
+    fts.register_tokenizer(c, "n", fts.make_tokenizer_module(tk, streaming=streaming))
+    c.execute("CREATE VIRTUAL TABLE t USING FTS4(w, tokenize=n)")
+    with c:
+        c.executemany(
+            "INSERT INTO t VALUES(?)", [["The quick foxes jumped"], ["the fox"]]
+        )
+
+    def search(q):
+        r = c.execute("SELECT rowid FROM t WHERE w MATCH ? ORDER BY rowid", [q])
+        return [x[0] for x in r]
+
+    assert search("the") == []
+    assert search("jumping") == [1]
+    assert search("vixen") == [1, 2]
+    assert search('"quick vixen jumps"') == [1]
+    r = c.execute("SELECT offsets(t) FROM t WHERE w MATCH 'vixen'").fetchall()
+    assert r == [("0 0 10 5",), ("0 0 4 3",)]
+    tk.close()
+
+
+def test_fts3_cached(c):
+    tk = native.FTS3NativeTokenizer(c, "simple", filters=[native.stopwords(["a"])])
+    fts.register_tokenizer(c, "n", fts.make_tokenizer_module(tk, cache=TokenCache()))
+    c.execute("CREATE VIRTUAL TABLE t USING FTS4(w, tokenize=n)")
+    with c:
+        c.executemany("INSERT INTO t VALUES(?)", [["a b c"], ["a b c"]])
+    assert c.execute("SELECT rowid FROM t WHERE w MATCH 'b'").fetchall() == [(1,), (2,)]
+    assert c.execute("SELECT rowid FROM t WHERE w MATCH 'a'").fetchall() == []
+    tk.close()
+
+
+# cffi reports the exception as unraisable
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnraisableExceptionWarning")
+def test_fts3_closed(c, monkeypatch):
+    closed = []
+    close = native._FTS3Cursor.close
+
+    def counting_close(self):
+        closed.append(self.cursor is not None)
+        close(self)
+
+    monkeypatch.setattr(native._FTS3Cursor, "close", counting_close)
+    tk = native.FTS3NativeTokenizer(c, "simple")
+    fts.register_tokenizer(c, "n", fts.make_tokenizer_module(tk))
+    c.execute("CREATE VIRTUAL TABLE t USING FTS4(w, tokenize=n)")
+    with c:
+        c.execute("INSERT INTO t VALUES('a b')")
+    # closed by xClose, not by GC
+    assert closed == [True]
+    tk.close()
+    with pytest.raises(sqlite3.Error):
+        with c:
+            c.execute("INSERT INTO t VALUES('c')")
+    assert c.execute("SELECT count(*) FROM t").fetchone() == (1,)
@@ -0,0 +1,180 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import re
+import sqlite3
+import threading
+
+import pytest
+
+import sqlitefts as fts
+from sqlitefts import fts5, fts5_aux
+from sqlitefts.error import Error
+from sqlitefts.pool import ConnectionPool
+
+
+class SimpleTokenizer(fts5.FTS5Tokenizer):
+    _p = re.compile(r"\w+", re.UNICODE)
+
+    def tokenize(self, text, flags=None):
+        for m in self._p.finditer(text):
+            s, e = m.span()
+            t = text[s:e].lower()
+            l = len(t.encode("utf-8"))
+            p = len(text[:s].encode("utf-8"))
+            yield t, p, p + l
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(
+        str(tmp_path / "fts.db"),
+        size=2,
+        tokenizers={"s": fts.make_tokenizer_module(SimpleTokenizer())},
+        fts5_tokenizers={"s": fts5.make_fts5_tokenizer(SimpleTokenizer())},
+        aux_functions={"tokenize": fts5_aux.aux_tokenize},
+        pragmas={"journal_mode": "WAL", "cache_size": -4096},
+        timeout=0.1,
+    )
+    yield pool
+    pool.close(force=True)
+
+
+def test_registered(pool):
+    with pool.connection() as c:
+        c.execute("CREATE VIRTUAL TABLE t3 USING FTS4(w, tokenize=s)")
+        c.execute("CREATE VIRTUAL TABLE t5 USING FTS5(w, tokenize=s)")
+        with c:
+            c.execute("INSERT INTO t3 VALUES('Abc def')")
+            c.execute("INSERT INTO t5 VALUES('Abc def')")
+        assert c.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert c.execute("PRAGMA cache_size").fetchone()[0] == -4096
+    with pool.connection() as c1, pool.connection() as c2:
+        assert len(pool) == 2
+        for c in (c1, c2):
+            r = c.execute("SELECT * FROM t3 WHERE t3 MATCH 'abc'").fetchall()
+            assert r == [("Abc def",)]
+            r = c.execute("SELECT tokenize(t5, 0) FROM t5 WHERE t5 MATCH 'abc'")
+            assert r.fetchall() == [("abc, def",)]
+
+
+def test_reuse_and_bound(pool):
+    c1 = pool.acquire()
+    c2 = pool.acquire()
+    with pytest.raises(Error):
+        pool.acquire()
+    c1.execute("BEGIN")
+    pool.release(c1)
+    c3 = pool.acquire()
+    assert c3 is c1 and not c3.in_transaction
+    pool.release(c2)
+    pool.release(c3)
+    assert len(pool) == 2
+
+
+def test_threads(pool):
+    with pool.connection() as c:
+        c.execute("CREATE VIRTUAL TABLE t5 USING FTS5(w, tokenize=s)")
+        with c:
+            c.executemany("INSERT INTO t5 VALUES(?)", [["abc"], ["def"]])
+    results = []
+
+    def run():
+        for _ in range(20):
+            with pool.connection(timeout=10) as c:
+                r = c.execute("SELECT COUNT(*) FROM t5 WHERE t5 MATCH 'abc'")
+                results.append(r.fetchone()[0])
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [1] * 80
+    assert len(pool) <= 2
+
+
+def test_close(pool):
+    c1 = pool.acquire()
+    with pool.connection():
+        pass
+    assert len(pool) == 2
+    pool.close()
+    assert len(pool) == 1
+    with pytest.raises(Error):
+        pool.acquire()
+    c1.execute("SELECT 1")
+    pool.release(c1)
+    assert len(pool) == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        c1.execute("SELECT 1")
+
+
+def test_force_close(pool):
+    c = pool.acquire()
+    pool.close(force=True)
+    with pytest.raises(sqlite3.ProgrammingError):
+        c.execute("SELECT 1")
+    pool.release(c)
+
+
+def test_release_twice(pool):
+    pool.acquire()
+    c = pool.acquire()
+    pool.release(c)
+    with pytest.raises(Error):
+        pool.release(c)
+    other = sqlite3.connect(":memory:")
+    with pytest.raises(Error):
+        pool.release(other)
+    other.close()
+    a = pool.acquire()
+    with pytest.raises(Error):
+        pool.acquire()
+    pool.release(a)
+
+
+def test_open_error(tmp_path):
+    def connect():
+        c = sqlite3.connect(str(tmp_path / "fts.db"))
+        opened.append(c)
+        return c
+
+    opened = []
+    with ConnectionPool(connect, pragmas={"nosuch.journal_mode": "WAL"}) as pool:
+        with pytest.raises(sqlite3.OperationalError):
+            pool.acquire()
+        assert len(pool) == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].execute("SELECT 1")
+
+
+@pytest.mark.parametrize(
+    "pragmas",
+    [
+        {"no such": "pragma"},
+        {"cache_size=1; DROP TABLE t; --": 1},
+        {"journal_mode": None},
+    ],
+)
+def test_invalid_pragmas(pragmas):
+    with pytest.raises(ValueError):
+        ConnectionPool(":memory:", pragmas=pragmas)
+
+
+def test_pragma_values(tmp_path):
+    pragmas = {
+        "main.cache_size": -2048,
+        "foreign_keys": True,
+        "journal_mode": "WAL",
+        "application_id": 7,
+        "user_version": "3; DROP TABLE t",
+    }
+    with ConnectionPool(str(tmp_path / "fts.db"), pragmas=pragmas) as pool:
+        with pool.connection() as c:
+            assert c.execute("PRAGMA cache_size").fetchone() == (-2048,)
+            assert c.execute("PRAGMA foreign_keys").fetchone() == (1,)
+            assert c.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+            assert c.execute("PRAGMA application_id").fetchone() == (7,)
+            # a string is a literal, not SQL
+            assert c.execute("PRAGMA user_version").fetchone() == (3,)
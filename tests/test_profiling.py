@@ -0,0 +1,105 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import io
+import re
+import sqlite3
+
+import pytest
+
+import sqlitefts as fts
+from sqlitefts import fts5, fts5_aux, profiling
+
+
+class SimpleTokenizer(fts5.FTS5Tokenizer):
+    _p = re.compile(r"\w+", re.UNICODE)
+
+    def tokenize(self, text, flags=None):
+        for m in self._p.finditer(text):
+            s, e = m.span()
+            t = text[s:e].lower()
+            l = len(t.encode("utf-8"))
+            p = len(text[:s].encode("utf-8"))
+            yield t, p, p + l
+
+
+@pytest.fixture
+def c():
+    c = sqlite3.connect(":memory:")
+    t = SimpleTokenizer()
+    fts.register_tokenizer(c, "s", fts.make_tokenizer_module(t))
+    assert fts5.register_tokenizer(c, "s", fts5.make_fts5_tokenizer(t))
+    assert fts5_aux.register_aux_function(c, "tokenize", fts5_aux.aux_tokenize) == 0
+    c.execute("CREATE VIRTUAL TABLE t4 USING FTS4(w, tokenize=s)")
+    c.execute("CREATE VIRTUAL TABLE t5 USING FTS5(w, tokenize=s)")
+    yield c
+    c.close()
+
+
+def by_sql(p):
+    return {s["sql"]: s for s in p.statements()}
+
+
+def test_statements(c):
+    p = profiling.Profiler(top=3)
+    assert p.attach(c) is p
+    assert profiling.active == 1
+    try:
+        rows = [["abc def ghi"], ["def"]]
+        c.executemany("INSERT INTO t4 VALUES(?)", rows)
+        c.executemany("INSERT INTO t5 VALUES(?)", rows)
+        c.commit()
+        r = c.execute("SELECT tokenize(t5, 0) FROM t5 WHERE t5 MATCH 'abc'")
+        assert r.fetchall() == [("abc, def, ghi",)]
+        c.execute("SELECT 1").fetchall()
+    finally:
+        p.detach(c)
+    assert profiling.active == 0
+    s = by_sql(p)
+    t4 = s["INSERT INTO t4 VALUES(?)"]
+    # xOpen, xNext for each token and the end, and xClose
+    assert t4["calls"] == 2 and t4["crossings"] == 2 * 2 + (4 + 2)
+    t5 = s["INSERT INTO t5 VALUES(?)"]
+    assert t5["calls"] == 2 and t5["crossings"] == 2
+    aux = s["SELECT tokenize(t5, 0) FROM t5 WHERE t5 MATCH 'abc'"]
+    # the query, aux_tokenize, xTokenize and a callback for each token
+    assert aux["crossings"] == 1 + 1 + 1 + 3
+    for x in (t4, t5, aux):
+        assert 0 < x["python_seconds"] <= x["wall_seconds"]
+        assert x["sqlite_seconds"] >= 0
+    assert s["SELECT 1"]["crossings"] == 0
+    slowest = p.slowest()
+    assert len(slowest) == 3
+    assert [x["wall_seconds"] for x in slowest] == sorted(
+        (x["wall_seconds"] for x in slowest), reverse=True
+    )
+    out = io.StringIO()
+    p.dump(2, file=out)
+    assert len(out.getvalue().splitlines()) == 3
+
+    c.execute("SELECT 2").fetchall()
+    assert "SELECT 2" not in by_sql(p)
+    p.reset()
+    assert p.statements() == [] and p.slowest() == []
+
+
+def test_connections(c):
+    c2 = sqlite3.connect(":memory:")
+    try:
+        with profiling.Profiler() as p:
+            p.attach(c)
+            p.attach(c2)
+            assert profiling.active == 2
+            c.execute("INSERT INTO t5 VALUES('abc')")
+            c2.execute("SELECT 3").fetchall()
+            p.detach(c2)
+            c2.execute("SELECT 4").fetchall()
+        assert profiling.active == 0
+        # c is still traced, but ignored
+        c.execute("SELECT 5").fetchall()
+        s = by_sql(p)
+        assert "INSERT INTO t5 VALUES('abc')" in s and "SELECT 3" in s
+        assert "SELECT 4" not in s and "SELECT 5" not in s
+    finally:
+        p.detach(c)
+        c2.close()
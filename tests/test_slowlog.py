@@ -0,0 +1,81 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import re
+import sqlite3
+import time
+
+import pytest
+
+import sqlitefts as fts
+from sqlitefts import fts5
+from sqlitefts.slowlog import SlowLog
+
+
+class SleepyTokenizer(fts5.FTS5Tokenizer):
+    """sleeps 50ms for text starting with "slow" """
+
+    _p = re.compile(r"\w+", re.UNICODE)
+
+    def tokenize(self, text, flags=None):
+        if text.startswith("slow"):
+            time.sleep(0.05)
+        for m in self._p.finditer(text):
+            s, e = m.span()
+            p = len(text[:s].encode("utf-8"))
+            yield text[s:e], p, p + len(text[s:e].encode("utf-8"))
+
+
+@pytest.fixture
+def c():
+    c = sqlite3.connect(":memory:")
+    yield c
+    c.close()
+
+
+def insert_rows(c, table):
+    with c:
+        c.executemany(
+            "INSERT INTO {} VALUES(?)".format(table),
+            [["fast"], ["slow あいう " + "x" * 100], ["fast again"]],
+        )
+
+
+def test_fts5(c):
+    slow = []
+    log = SlowLog(threshold_ms=30, size=2, sample_bytes=12, on_slow=slow.append)
+    tm = fts5.make_fts5_tokenizer(SleepyTokenizer(), slow_log=log)
+    assert fts5.register_tokenizer(c, "s", tm)
+    c.execute("CREATE VIRTUAL TABLE t USING FTS5(w, tokenize=s)")
+    insert_rows(c, "t")
+    assert len(log) == 1 and log.count == 1
+    e = log.entries()[0]
+    assert slow == [e]
+    assert e.kind == "document" and e.flags == fts5.FTS5_TOKENIZE_DOCUMENT
+    assert e.seconds >= 0.03
+    assert e.nbytes == len("slow あいう ".encode("utf-8")) + 100
+    assert e.ntokens == 3
+    # a character cut at the end is dropped
+    assert e.sample == "slow あい"
+    # the stack ends with the caller executing the statement
+    assert "insert_rows" in e.stack[-1] and "sqlitefts" not in e.stack[-1]
+    c.execute("SELECT * FROM t WHERE t MATCH 'fast'").fetchall()
+    assert log.count == 1
+    for _ in range(3):
+        c.execute("SELECT * FROM t WHERE t MATCH 'slow OR fast'").fetchall()
+    assert log.count == 4 and len(log) == 2
+    assert [e.kind for e in log.entries()] == ["query", "query"]
+    log.clear()
+    assert len(log) == 0 and log.count == 0
+
+
+def test_fts3(c):
+    log = SlowLog(threshold_ms=30, stack=False)
+    tm = fts.make_tokenizer_module(SleepyTokenizer(), slow_log=log)
+    fts.register_tokenizer(c, "s", tm)
+    c.execute("CREATE VIRTUAL TABLE t USING FTS4(w, tokenize=s)")
+    insert_rows(c, "t")
+    (e,) = log.entries()
+    assert e.kind == "fts3" and e.flags is None
+    assert e.ntokens == 3 and e.stack is None
+    assert e.sample.startswith("slow あいう x")
@@ -0,0 +1,93 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import json
+import re
+import sqlite3
+
+import pytest
+
+import sqlitefts as fts
+from sqlitefts import fts5, stats
+
+
+class SimpleTokenizer(fts5.FTS5Tokenizer):
+    _p = re.compile(r"\w+", re.UNICODE)
+
+    def tokenize(self, text, flags=None):
+        for m in self._p.finditer(text):
+            s, e = m.span()
+            t = text[s:e].lower()
+            l = len(t.encode("utf-8"))
+            p = len(text[:s].encode("utf-8"))
+            yield t, p, p + l
+
+
+@pytest.fixture
+def c():
+    c = sqlite3.connect(":memory:")
+    yield c
+    c.close()
+
+
+def test_kind_of():
+    assert stats.kind_of(None) == "fts3"
+    assert stats.kind_of(fts5.FTS5_TOKENIZE_DOCUMENT) == "document"
+    assert stats.kind_of(fts5.FTS5_TOKENIZE_QUERY) == "query"
+    q = fts5.FTS5_TOKENIZE_QUERY | fts5.FTS5_TOKENIZE_PREFIX
+    assert stats.kind_of(q) == "prefix"
+    assert stats.kind_of(fts5.FTS5_TOKENIZE_AUX) == "aux"
+
+
+def test_fts5(c):
+    s = stats.TokenizerStats("test_fts5")
+    tm = fts5.make_fts5_tokenizer(SimpleTokenizer(), stats=s)
+    assert fts5.register_tokenizer(c, "s", tm)
+    c.execute("CREATE VIRTUAL TABLE t USING FTS5(w, tokenize=s)")
+    with c:
+        c.executemany("INSERT INTO t VALUES(?)", [["abc def"], ["ghi あいう"]])
+    assert c.execute("SELECT rowid FROM t WHERE t MATCH 'abc'").fetchall() == [(1,)]
+    r = c.execute("SELECT highlight(t, 0, '[', ']') FROM t WHERE t MATCH 'gh*'")
+    assert r.fetchall() == [("[ghi] あいう",)]
+    r = s.snapshot()
+    assert set(r) == {"document", "query", "prefix", "aux"}
+    assert r["document"]["calls"] == 2
+    assert r["document"]["tokens"] == 4
+    assert r["document"]["bytes"] == len("abc defghi あいう".encode("utf-8"))
+    assert r["query"]["calls"] == 1 and r["query"]["tokens"] == 1
+    assert r["aux"]["tokens"] == 2
+    for k in r.values():
+        assert k["tokenize_seconds"] > 0 and k["xtoken_seconds"] > 0
+        assert sum(n for _, n in k["histogram"]) == k["calls"]
+    s.reset()
+    assert s.snapshot() == {}
+
+
+def test_fts3(c):
+    s = stats.TokenizerStats("test_fts3")
+    fts.register_tokenizer(c, "s", fts.make_tokenizer_module(SimpleTokenizer(), stats=s))
+    c.execute("CREATE VIRTUAL TABLE t USING FTS4(w, tokenize=s)")
+    with c:
+        c.executemany("INSERT INTO t VALUES(?)", [["abc def"], ["ghi"]])
+    assert c.execute("SELECT rowid FROM t WHERE t MATCH 'ghi'").fetchall() == [(2,)]
+    r = s.snapshot()
+    assert list(r) == ["fts3"]
+    assert r["fts3"]["calls"] == 3
+    assert r["fts3"]["tokens"] == 4
+    assert r["fts3"]["bytes"] == 13
+    assert r["fts3"]["xtoken_seconds"] == 0
+
+
+def test_sql_function(c):
+    s = stats.TokenizerStats("test_sql")
+    tm = fts5.make_fts5_tokenizer(SimpleTokenizer(), stats=s)
+    assert fts5.register_tokenizer(c, "s", tm)
+    stats.register_function(c)
+    c.execute("CREATE VIRTUAL TABLE t USING FTS5(w, tokenize=s)")
+    c.execute("INSERT INTO t VALUES('abc')")
+    r = json.loads(c.execute("SELECT sqlitefts_stats()").fetchone()[0])
+    assert r["test_sql"]["document"]["calls"] == 1
+    r = c.execute("SELECT sqlitefts_stats('test_sql')").fetchone()[0]
+    assert json.loads(r) == s.snapshot()
+    r = c.execute("SELECT sqlitefts_stats('nothing')").fetchone()[0]
+    assert json.loads(r) is None
@@ -0,0 +1,129 @@
+# coding: utf-8
+from __future__ import print_function, unicode_literals
+
+import re
+import sqlite3
+import threading
+
+import pytest
+
+import sqlitefts as fts
+from sqlitefts import fts5
+
+
+class SimpleTokenizer(fts5.FTS5Tokenizer):
+    _p = re.compile(r"\w+", re.UNICODE)
+
+    def __init__(self, made=None):
+        self.thread = threading.current_thread()
+        self.deleted = False
+        if made is not None:
+            made.append(self)
+
+    def tokenize(self, text, flags=None):
+        assert self.thread is threading.current_thread()
+        for m in self._p.finditer(text):
+            s, e = m.span()
+            t = text[s:e].lower()
+            l = len(t.encode("utf-8"))
+            p = len(text[:s].encode("utf-8"))
+            yield t, p, p + l
+
+    def on_delete(self):
+        self.deleted = True
+
+
+def run_threads(f, n=4):
+    errors = []
+
+    def run():
+        try:
+            f()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+
+def test_per_thread_fts5():
+    made = []
+    tm = fts5.make_fts5_tokenizer(
+        lambda ctx, args: SimpleTokenizer(made), per_thread=True
+    )
+    c = sqlite3.connect(":memory:", check_same_thread=False)
+    try:
+        fts5.register_tokenizer(c, "s", tm)
+        c.execute("CREATE VIRTUAL TABLE t USING FTS5(w, tokenize=s)")
+        assert len(made) == 1
+        lock = threading.Lock()
+
+        def insert():
+            with lock:
+                c.execute("INSERT INTO t VALUES('Abc def')")
+
+        run_threads(insert)
+        assert len(made) == 5
+        r = c.execute("SELECT count(*) FROM t WHERE t MATCH 'abc'").fetchone()
+        assert r == (4,)
+        assert len(made) == 5
+    finally:
+        c.close()
+    assert all(t.deleted for t in made)
+
+
+def test_per_thread_fts3():
+    made = []
+    tm = fts.make_tokenizer_module(
+        lambda args: SimpleTokenizer(made), per_thread=True
+    )
+    c = sqlite3.connect(":memory:", check_same_thread=False)
+    try:
+        fts.register_tokenizer(c, "s", tm)
+        c.execute("CREATE VIRTUAL TABLE t USING FTS4(w, tokenize=s)")
+        lock = threading.Lock()
+
+        def insert():
+            with lock:
+                c.execute("INSERT INTO t VALUES('Abc def')")
+
+        run_threads(insert)
+        assert len(made) == 5
+    finally:
+        c.close()
+
+
+def test_per_thread_requires_factory():
+    with pytest.raises(TypeError):
+        fts5.make_fts5_tokenizer(SimpleTokenizer(), per_thread=True)
+    with pytest.raises(TypeError):
+        fts.make_tokenizer_module(SimpleTokenizer(), per_thread=True)
+
+
+def test_connections_in_threads():
+    tm = fts5.make_fts5_tokenizer(
+        lambda ctx, args: SimpleTokenizer(), per_thread=True
+    )
+    tm3 = fts.make_tokenizer_module(lambda args: SimpleTokenizer(), per_thread=True)
+
+    def index():
+        c = sqlite3.connect(":memory:")
+        try:
+            fts5.register_tokenizer(c, "s", tm)
+            fts.register_tokenizer(c, "s", tm3)
+            c.execute("CREATE VIRTUAL TABLE t5 USING FTS5(w, tokenize=s)")
+            c.execute("CREATE VIRTUAL TABLE t3 USING FTS4(w, tokenize=s)")
+            for i in range(100):
+                c.execute("INSERT INTO t5 VALUES(?)", ["abc {}".format(i % 10)])
+                c.execute("INSERT INTO t3 VALUES(?)", ["abc {}".format(i % 10)])
+            for t in ("t5", "t3"):
+                r = c.execute("SELECT count(*) FROM {0} WHERE {0} MATCH '3'".format(t))
+                assert r.fetchone() == (10,)
+        finally:
+            c.close()
+
+    run_threads(index, 8)